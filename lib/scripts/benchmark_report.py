@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmarks do gerador de relatórios Excel
+
+Uso:
+    python benchmark_report.py styles [--rows 200000]
+    python benchmark_report.py backend [--rows 200000]
+    python benchmark_report.py compression [--rows 200000]
+    python benchmark_report.py suite [--rows 200000] [--seed 42] [--output resultados.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import openpyxl
+
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+
+import excel_report_generator as gen
+
+
+def _reception_rows(n):
+    """Linhas sintéticas de Receção"""
+    return [
+        {
+            'turbinaId': f'T{i % 300:03d}',
+            'componentId': f'Componente {i % 19}',
+            'vui': f'VUI{i:07d}',
+            'serialNumber': f'SN{i:08d}',
+            'itemNumber': f'IT{i % 500:04d}',
+            'dataDescarga': f'{1 + i % 28:02d}/{1 + i % 12:02d}/2024',
+            'horaDescarga': f'{8 + i % 10:02d}:{i % 60:02d}',
+        }
+        for i in range(n)
+    ]
+
+
+def _legacy_reception_sheet(wb, items):
+    """Receção como era escrita antes do registo de estilos: objetos novos em cada célula"""
+    ws = wb.create_sheet('Receção')
+    headers = ['Turbina', 'Componente', 'VUI', 'Nº Série', 'Item Number', 'Data Descarga', 'Hora Descarga']
+    widths = [15, 20, 18, 18, 18, 15, 15]
+    fields = ['turbinaId', 'componentId', 'vui', 'serialNumber', 'itemNumber', 'dataDescarga', 'horaDescarga']
+    for col, (header_text, width) in enumerate(zip(headers, widths), 1):
+        cell = ws.cell(row=1, column=col)
+        cell.value = header_text
+        cell.font = Font(name='Arial', size=10, bold=True, color=gen.COLORS['white'])
+        cell.fill = PatternFill(start_color=gen.COLORS['subheader'], end_color=gen.COLORS['subheader'], fill_type='solid')
+        cell.border = gen.BORDER_ALL
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+        ws.column_dimensions[get_column_letter(col)].width = width
+    for row_idx, item in enumerate(items, start=2):
+        for col, field in enumerate(fields, 1):
+            ws.cell(row=row_idx, column=col, value=item.get(field, '')).border = gen.BORDER_ALL
+        for col in range(1, 8):
+            ws.cell(row=row_idx, column=col).alignment = Alignment(horizontal='center', vertical='center')
+    return ws
+
+
+def bench_styles(rows):
+    """Custo por linha da sheet de Receção: alocação por célula vs. estilos partilhados"""
+    items = _reception_rows(rows)
+    spec = next(s for s in gen.PHASE_SHEETS if s['key'] == 'recepcao')
+    variants = [
+        ('antes (Font/Alignment por célula)', lambda: _legacy_reception_sheet(Workbook(), items)),
+        ('depois (registo de estilos)', lambda: gen._add_phase_sheet(Workbook(), spec, items, 'Benchmark')),
+        ('depois (streaming)', lambda: gen._stream_phase_sheet(Workbook(write_only=True), spec, items, 'Benchmark')),
+    ]
+    print(f"\nReceção com {rows} linhas (construção + gravação)")
+    for name, build in variants:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            ws = build()
+            built = time.perf_counter() - start
+            ws.parent.save(os.path.join(tmp, 'bench.xlsx'))
+            elapsed = time.perf_counter() - start
+        print(f"  {name:<38} {built:7.2f} s + {elapsed - built:6.2f} s  {elapsed / rows * 1e6:8.2f} µs/linha")
+
+
+def bench_backend(rows):
+    """Receção escrita pelo openpyxl (write-only) vs. XML escrito diretamente (backend 'direct')"""
+    items = _reception_rows(rows)
+    spec = next(s for s in gen.PHASE_SHEETS if s['key'] == 'recepcao')
+    
+    def _openpyxl(path):
+        wb = Workbook(write_only=True)
+        gen._stream_phase_sheet(wb, spec, items, 'Benchmark')
+        wb.save(path)
+    
+    def _direct(path):
+        wb = Workbook(write_only=True)
+        gen._attach_direct_sheet(wb, spec, items, 'Benchmark')
+        gen._save_workbook(wb, path)
+    
+    print(f"\nReceção com {rows} linhas (construção + gravação)")
+    for name, write in [('openpyxl (write-only)', _openpyxl), ('direct', _direct)]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.xlsx')
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                write(path)
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(path)
+        print(f"  {name:<24} {elapsed:7.2f} s  {elapsed / rows * 1e6:8.2f} µs/linha  {size / 1024:10.0f} KiB")
+
+
+COMPRESSION_SIZES = (1000, 10000, 100000)
+
+
+def bench_compression(rows):
+    """Tempo de gravação vs. tamanho do ficheiro para cada nível de compressão (1k, 10k, 100k linhas)"""
+    phase_keys = [spec['key'] for spec in gen.PHASE_SHEETS if spec['key'] in gen.PHASE_KEYS]
+    for size in [n for n in COMPRESSION_SIZES if n <= rows] or [rows]:
+        data_by_phase = {key: _reception_rows(size // len(phase_keys)) for key in phase_keys}
+        print(f"\nProjeto sintético com {size} linhas ({len(phase_keys)} fases)")
+        for compression in gen.COMPRESSION_LEVELS:
+            timings = {}
+            with tempfile.TemporaryDirectory() as tmp:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    gen.generate_excel_report('Benchmark', data_by_phase, phase_keys, os.path.join(tmp, 'bench.xlsx'),
+                                              complete_report=False, backend='direct',
+                                              compression=compression, timings=timings)
+            print(f"  {compression:<8} gravação {timings['saveMs'] / 1000:7.2f} s  {timings['sizeBytes'] / 1024:10.0f} KiB")
+
+
+# ═════════════════════════════════════════════════════════════════
+# DADOS SINTÉTICOS (REPRODUTÍVEIS PELA SEED)
+# ═════════════════════════════════════════════════════════════════
+
+SYNTHETIC_COMPONENTS = ['Torre 1', 'Torre 2', 'Torre 3', 'Nacelle', 'Hub', 'Pá A', 'Pá B', 'Pá C']
+SYNTHETIC_STATUSES = ['Concluído', 'Concluído', 'Em Progresso', 'Planeado', 'completed']
+SYNTHETIC_OBSERVATIONS = ['', '', '', '', 'Problema aberto no flange', 'Crítico: fissura na pá',
+                          'Atenção ao torque', 'Resolvido', 'ok']
+SYNTHETIC_CRANES = ['LR1750', 'LR11000', 'LTM1500', 'CC2800']
+SYNTHETIC_TIPOS = ['trabalho'] * 6 + ['paragem'] * 3 + ['mobilizacao', 'transferencia', 'desmobilizacao']
+SYNTHETIC_MOTIVOS = ['wind', 'wind', 'mechanical', 'waiting_components', 'safety', '']
+
+
+def _synthetic_time(rng):
+    return f"{rng.randint(6, 17):02d}:{rng.choice((0, 15, 30, 45)):02d}"
+
+
+def _synthetic_duration(rng):
+    """Duração nos vários formatos que a app envia (ou vazia: calculada do início ao fim)"""
+    hours = rng.randint(0, 9)
+    minutes = rng.choice((0, 15, 25, 30, 40))
+    return rng.choice([
+        f"{hours}h {minutes}m" if minutes else f"{hours}h",
+        f"{minutes or 30}m",
+        f"{hours + minutes / 60:.2f}",
+        f"{hours:02d}:{minutes:02d}",
+        '',
+    ])
+
+
+def synthetic_data_by_phase(turbines, components=len(SYNTHETIC_COMPONENTS), crane_logs=12, seed=42, start=date(2024, 1, 8)):
+    """
+    data_by_phase sintético: `turbines` turbinas × `components` componentes em cada fase de
+    componentes, uma linha de torque por componente e `crane_logs` registos de grua por turbina
+    (tipo, motivo e durações variados). A mesma seed dá sempre os mesmos dados.
+    """
+    rng = random.Random(seed)
+    data = {key: [] for key in gen.PHASE_KEYS + gen.CRANE_PHASE_KEYS}
+    component_phases = [key for key in gen.PHASE_KEYS if key != 'torqueTensionamento']
+    for t in range(turbines):
+        turbine_id = f'T{t + 1:03d}'
+        # Cada turbina arranca uns dias depois da anterior e passa pelas fases por ordem
+        day = start + timedelta(days=t * 2 + rng.randint(0, 3))
+        for phase_index, phase_key in enumerate(component_phases):
+            for c in range(components):
+                planned = day + timedelta(days=phase_index * 7 + c // 3)
+                actual = planned + timedelta(days=rng.choice((-2, -1, 0, 0, 0, 1, 2, 5, 12)))
+                finish = actual + timedelta(days=rng.choice((0, 0, 1)))
+                data[phase_key].append({
+                    'turbinaId': turbine_id,
+                    'componentId': SYNTHETIC_COMPONENTS[c % len(SYNTHETIC_COMPONENTS)],
+                    'vui': f'VUI{rng.randrange(10 ** 7):07d}',
+                    'serialNumber': f'SN{rng.randrange(10 ** 8):08d}',
+                    'itemNumber': f'IT{rng.randrange(500):04d}',
+                    'dataDescarga': actual.strftime('%d/%m/%Y'),
+                    'horaDescarga': _synthetic_time(rng),
+                    'dataInicio': actual.strftime('%d/%m/%Y'),
+                    'horaInicio': _synthetic_time(rng),
+                    'dataFim': finish.strftime('%d/%m/%Y'),
+                    'horaFim': _synthetic_time(rng),
+                    'dataPlaneada': planned.isoformat(),
+                    'dataReal': actual.isoformat(),
+                    'status': rng.choice(SYNTHETIC_STATUSES),
+                    'observacoes': rng.choice(SYNTHETIC_OBSERVATIONS),
+                })
+        for c in range(components):
+            data['torqueTensionamento'].append({
+                'turbina': turbine_id,
+                'componente': SYNTHETIC_COMPONENTS[c % len(SYNTHETIC_COMPONENTS)],
+                'parafusos': rng.choice((48, 64, 96, 128)),
+                'torque': rng.choice((1200, 2500, 4100)),
+                'status': rng.choice(SYNTHETIC_STATUSES),
+                'inspetor': rng.choice(('JS', 'MR', 'AC')),
+                'data': (day + timedelta(days=30)).isoformat(),
+                'observacoes': rng.choice(SYNTHETIC_OBSERVATIONS),
+            })
+        for n in range(crane_logs):
+            tipo = rng.choice(SYNTHETIC_TIPOS)
+            log_day = (day + timedelta(days=n // 4)).strftime('%d/%m/%Y')
+            data['gruasPads' if n % 3 else 'gruasGerais'].append({
+                'turbinaId': turbine_id,
+                'gruaModelo': rng.choice(SYNTHETIC_CRANES),
+                'descricao': f'Elevação {n + 1}',
+                'tipo': tipo,
+                'dataInicio': log_day,
+                'horaInicio': _synthetic_time(rng),
+                'dataFim': log_day,
+                'horaFim': f"{rng.randint(18, 23):02d}:00",
+                'duracao': _synthetic_duration(rng),
+                'motivo': rng.choice(SYNTHETIC_MOTIVOS) if tipo == 'paragem' else '',
+                'origem': f'Pad {t + 1}',
+                'destino': f'Pad {t + 2}',
+                'observacoes': rng.choice(SYNTHETIC_OBSERVATIONS),
+            })
+    return data
+
+
+# ═════════════════════════════════════════════════════════════════
+# SUITE: TEMPO E MEMÓRIA DE CADA BUILDER
+# ═════════════════════════════════════════════════════════════════
+
+# Número de turbinas de cada escala da suite
+SUITE_SCALES = (10, 100, 500, 2000)
+
+
+def _suite_builders(data, tmp):
+    """(nome, função) de cada passo do relatório completo, pela ordem de generate_excel_report"""
+    state = {}
+
+    def _aggregate():
+        state['aggregates'] = gen.ReportAggregates.from_data(data)
+
+    def _workbook():
+        wb = state['wb'] = Workbook()
+        wb.remove(wb.active)
+
+    steps = [
+        ('ReportAggregates.from_data', _aggregate),
+        ('Workbook', _workbook),
+        ('_create_cover_sheet', lambda: gen._create_cover_sheet(state['wb'], 'Benchmark')),
+        ('_create_executive_summary_v2', lambda: gen._create_executive_summary_v2(state['wb'], 'Benchmark', state['aggregates'])),
+        ('_create_dashboard_v3', lambda: gen._create_dashboard_v3(state['wb'], 'Benchmark', state['aggregates'])),
+        ('_add_deviation_analysis_sheet', lambda: gen._add_deviation_analysis_sheet(state['wb'], state['aggregates'])),
+        ('_add_crane_analysis_sheet', lambda: gen._add_crane_analysis_sheet(state['wb'], state['aggregates'])),
+        ('_add_crane_concurrency_sheet', lambda: gen._add_crane_concurrency_sheet(state['wb'], state['aggregates'])),
+        ('_add_critical_observations_sheet', lambda: gen._add_critical_observations_sheet(state['wb'], state['aggregates'])),
+        ('_add_turbine_drilldown_sheet', lambda: gen._add_turbine_drilldown_sheet(state['wb'], state['aggregates'])),
+    ]
+    for spec in gen.PHASE_SHEETS:
+        if data.get(spec['key']):
+            steps.append((f"_add_phase_sheet[{spec['key']}]",
+                          lambda spec=spec: gen._add_phase_sheet(state['wb'], spec, data[spec['key']], 'Benchmark')))
+    steps.append(('wb.save', lambda: state['wb'].save(os.path.join(tmp, 'bench.xlsx'))))
+    return steps
+
+
+def _run_suite_pass(data, profile_memory):
+    """Correr todos os builders num workbook novo; devolve {nome: medições} (tempo ou pico de memória)"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, build in _suite_builders(data, tmp):
+            if profile_memory:
+                tracemalloc.start()
+            wall, cpu = time.perf_counter(), time.process_time()
+            with contextlib.redirect_stdout(io.StringIO()):
+                build()
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            if profile_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                results[name] = {'peakKiB': round(peak / 1024, 1)}
+            else:
+                results[name] = {'wallMs': round(wall * 1000, 2), 'cpuMs': round(cpu * 1000, 2)}
+    return results
+
+
+def bench_suite(rows, seed=42, output=None):
+    """
+    Relatório completo com dados sintéticos em várias escalas (SUITE_SCALES turbinas, até `rows`
+    linhas): tempo (wall e CPU) de cada builder numa passagem e o pico de memória (tracemalloc)
+    noutra, para o tracemalloc não pesar nos tempos. Com output, grava os resultados em JSON.
+    """
+    results = []
+    for turbines in SUITE_SCALES:
+        data = synthetic_data_by_phase(turbines, seed=seed)
+        total_rows = sum(len(records) for records in data.values())
+        if total_rows > rows and results:
+            break
+        timings = _run_suite_pass(data, profile_memory=False)
+        memory = _run_suite_pass(data, profile_memory=True)
+        print(f"\n{turbines} turbinas ({total_rows} linhas)")
+        for name, measured in timings.items():
+            measured.update(memory[name])
+            print(f"  {name:<42} {measured['wallMs']:10.1f} ms  {measured['cpuMs']:10.1f} ms CPU  {measured['peakKiB']:10.0f} KiB")
+            results.append({'turbines': turbines, 'rows': total_rows, 'builder': name, **measured})
+    
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'benchmark': 'suite',
+                'seed': seed,
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'openpyxl': openpyxl.__version__,
+                'results': results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {output}")
+    return results
+
+
+BENCHMARKS = {
+    'styles': bench_styles,
+    'backend': bench_backend,
+    'compression': bench_compression,
+    'suite': bench_suite,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42, help='seed dos dados sintéticos (suite)')
+    parser.add_argument('--output', help='ficheiro JSON com os resultados (suite)')
+    args = parser.parse_args()
+    if args.benchmark == 'suite':
+        bench_suite(args.rows, args.seed, args.output)
+    else:
+        BENCHMARKS[args.benchmark](args.rows)
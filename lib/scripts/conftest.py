@@ -0,0 +1,2 @@
+# test_dashboard_layout.py é um script manual (gera um ficheiro ao ser importado), não um teste pytest
+collect_ignore = ['test_dashboard_layout.py']
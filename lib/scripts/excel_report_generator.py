@@ -8,18 +8,57 @@ Generates professional Excel reports with multiple phases, advanced analytics, a
 import sys
 import json
 import io
-from datetime import datetime, timedelta
+import itertools
+import math
+import mmap
+import re
+import argparse
+import codecs
+import contextlib
+import cProfile
+import hashlib
+import heapq
+import os
+import pickle
+import shutil
+import signal
+import struct
+import time
+import tempfile
+import threading
+import traceback
+import tracemalloc
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from copy import copy
+from functools import lru_cache
+from bisect import bisect_left
+import weakref
+from datetime import datetime, timedelta, timezone
 from collections import defaultdict
+from queue import Queue
 
-# Ensure UTF-8 encoding for stdout on Windows
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele a timeline é agrupada só com a biblioteca padrão
+    np = None
 
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ERROR_CODES, ILLEGAL_CHARACTERS_RE
+from openpyxl.utils.exceptions import IllegalCharacterError
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 from openpyxl.chart import BarChart, BarChart3D, PieChart, PieChart3D, LineChart, Reference
 from openpyxl.formatting.rule import ColorScaleRule, CellIsRule, DataBarRule
 from openpyxl.styles import colors
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.styles.stylesheet import write_stylesheet
+from openpyxl.packaging.relationship import RelationshipList
+from openpyxl.writer.excel import ExcelWriter
+from openpyxl.xml.functions import tostring
+import openpyxl
 
 # ═════════════════════════════════════════════════════════════════
 # CONSTANTES DE CORES E ESTILOS
@@ -52,6 +91,74 @@ BORDER_ALL = Border(
     bottom=Side(style='thin')
 )
 
+# ═════════════════════════════════════════════════════════════════
+# REGISTO DE ESTILOS PARTILHADOS
+# ═════════════════════════════════════════════════════════════════
+
+# Fontes, preenchimentos e alinhamentos são criados uma única vez por combinação de
+# argumentos e aplicados por referência; o openpyxl deduplica-os pelo hash, por isso
+# reutilizar o mesmo objeto evita alocar e comparar estilos iguais célula a célula.
+
+@lru_cache(maxsize=None)
+def _font(**kwargs):
+    """Font partilhada para os argumentos dados"""
+    return Font(**kwargs)
+
+@lru_cache(maxsize=None)
+def _fill(color):
+    """Preenchimento sólido partilhado para uma cor"""
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+@lru_cache(maxsize=None)
+def _alignment(**kwargs):
+    """Alignment partilhado para os argumentos dados"""
+    return Alignment(**kwargs)
+
+# Combinações usadas célula a célula nas sheets grandes
+STYLES = {
+    'project_title': {'font': _font(name='Arial', size=12, bold=True, color=COLORS['white']),
+                      'fill': _fill(COLORS['header']),
+                      'alignment': _alignment(horizontal='center', vertical='center', wrap_text=True)},
+    'sheet_title': {'font': _font(name='Arial', size=11, bold=True, color=COLORS['white']),
+                    'fill': _fill(COLORS['subheader']),
+                    'alignment': _alignment(horizontal='center', vertical='center', wrap_text=True)},
+    'footer': {'font': _font(name='Arial', size=8, italic=True, color=COLORS['dark_gray']),
+               'fill': _fill(COLORS['light_gray']),
+               'alignment': _alignment(horizontal='right', vertical='center')},
+    'data': {'border': BORDER_ALL},
+    'data_center': {'border': BORDER_ALL,
+                    'alignment': _alignment(horizontal='center', vertical='center')},
+}
+
+# Estilos já registados em cada workbook: nome -> StyleArray com os índices da stylesheet
+_WORKBOOK_STYLES = weakref.WeakKeyDictionary()
+
+def _cell_style(wb, font=None, fill=None, border=None, alignment=None):
+    """Registar uma combinação de estilos na stylesheet do workbook e devolver o StyleArray"""
+    style = StyleArray()
+    if font is not None:
+        style.fontId = wb._fonts.add(font)
+    if fill is not None:
+        style.fillId = wb._fills.add(fill)
+    if border is not None:
+        style.borderId = wb._borders.add(border)
+    if alignment is not None:
+        style.alignmentId = wb._alignments.add(alignment)
+    return style
+
+def _named_style(wb, name):
+    """StyleArray de um estilo de STYLES, registado uma vez por workbook"""
+    cache = _WORKBOOK_STYLES.setdefault(wb, {})
+    style = cache.get(name)
+    if style is None:
+        style = cache[name] = _cell_style(wb, **STYLES[name])
+    return style
+
+def _apply_style(cell, style):
+    """Aplicar um StyleArray pré-registado a uma célula (cópia, para não partilhar o array)"""
+    cell._style = copy(style)
+    return cell
+
 # ═════════════════════════════════════════════════════════════════
 # FUNÇÕES AUXILIARES DE TRADUÇÃO
 # ═════════════════════════════════════════════════════════════════
@@ -132,21 +239,6 @@ def get_status_icon(status):
     else:
         return '⊘'
 
-def parse_duration(duration_value):
-    """Parse duration value, handling formats like '2h', '2.5', etc."""
-    if not duration_value:
-        return 0
-    
-    try:
-        # Convert to string first
-        duration_str = str(duration_value).strip().lower()
-        # Remove 'h' or 'hora' suffixes
-        duration_str = duration_str.replace('h', '').replace('hora', '').strip()
-        # Convert to float
-        return float(duration_str) if duration_str else 0
-    except (ValueError, TypeError):
-        return 0
-
 def parse_percentage(percentage_value):
     """Parse percentage value, handling formats like '50%', '50', etc."""
     if percentage_value is None:
@@ -160,6 +252,867 @@ def parse_percentage(percentage_value):
     except (ValueError, TypeError):
         return 0
 
+# ═════════════════════════════════════════════════════════════════
+# DATAS (CONVERSÃO MEMORIZADA)
+# ═════════════════════════════════════════════════════════════════
+
+# Muitos componentes partilham a mesma data: cada texto distinto é convertido uma vez
+_DATE_CACHE_SIZE = 8192
+
+def _parse_date(value):
+    """Converter data ('YYYY-MM-DD' ou 'DD/MM/YYYY', com ou sem hora) para datetime, ou None"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return _parse_date_text(value if isinstance(value, str) else str(value))
+
+@lru_cache(maxsize=_DATE_CACHE_SIZE)
+def _parse_date_text(text):
+    """Conversão de um texto de data; formatos fixos por fatiamento, strptime só como recurso"""
+    text = text.strip()[:10]
+    if len(text) == 10 and text.isascii():
+        try:
+            if text[4] == '-' and text[7] == '-' and (text[:4] + text[5:7] + text[8:]).isdigit():
+                return datetime(int(text[:4]), int(text[5:7]), int(text[8:]))
+            if text[2] == '/' and text[5] == '/' and (text[:2] + text[3:5] + text[6:]).isdigit():
+                return datetime(int(text[6:]), int(text[3:5]), int(text[:2]))
+        except ValueError:
+            return None
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+def _parse_date_column(values):
+    """Converter uma coluna inteira de datas; cada valor distinto é convertido uma única vez"""
+    memo = {}
+    parsed = []
+    for value in values:
+        try:
+            date_value = memo[value]
+        except KeyError:
+            date_value = memo[value] = _parse_date(value)
+        except TypeError:
+            date_value = _parse_date(value)
+        parsed.append(date_value)
+    return parsed
+
+# ═════════════════════════════════════════════════════════════════
+# DURAÇÕES (EM HORAS)
+# ═════════════════════════════════════════════════════════════════
+
+# Formatos aceites: '2.5', '2,5h', '3h 25m', '1h30', '40m', '1 hora 30 min', '02:30'
+# (report_service.dart envia '3h 25m', '3h' ou '40m')
+_DURATION_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number>\d+(?:[.,]\d+)?)
+      | (?P<clock_hours>\d+):(?P<clock_minutes>\d{1,2})
+      | (?:(?P<hours>\d+(?:[.,]\d+)?)\s*(?:h|hrs?|horas?|hours?)\.?)?\s*
+        (?:(?P<minutes>\d+(?:[.,]\d+)?)\s*(?:m|mins?|minutos?|minutes?)?\.?)?
+    )\s*""", re.IGNORECASE | re.VERBOSE)
+_TIME_PATTERN = re.compile(r'\s*(\d{1,2}):(\d{2})(?::(\d{2}))?')
+_DURATION_CACHE_SIZE = 4096
+
+def parse_duration(duration_value):
+    """Parse duration value in hours, handling formats like '2h', '2.5', '3h 25m', '40m', etc."""
+    if not duration_value:
+        return 0
+    if isinstance(duration_value, (int, float)) and not isinstance(duration_value, bool):
+        return float(duration_value)
+    return _parse_duration_text(str(duration_value))
+
+@lru_cache(maxsize=_DURATION_CACHE_SIZE)
+def _parse_duration_text(text):
+    match = _DURATION_PATTERN.fullmatch(text)
+    if match is None:
+        return 0
+    number, clock_hours, clock_minutes, hours, minutes = match.group(
+        'number', 'clock_hours', 'clock_minutes', 'hours', 'minutes')
+    if number is not None:
+        return float(number.replace(',', '.'))
+    if clock_hours is not None:
+        return int(clock_hours) + int(clock_minutes) / 60
+    if hours is None and minutes is None:
+        return 0
+    return (float(hours.replace(',', '.')) if hours else 0) + (float(minutes.replace(',', '.')) / 60 if minutes else 0)
+
+def _parse_duration_column(values):
+    """Converter uma coluna inteira de durações; cada valor distinto é convertido uma única vez"""
+    memo = {}
+    parsed = []
+    for value in values:
+        try:
+            hours = memo[value]
+        except KeyError:
+            hours = memo[value] = parse_duration(value)
+        except TypeError:
+            hours = parse_duration(value)
+        parsed.append(hours)
+    return parsed
+
+@lru_cache(maxsize=_DURATION_CACHE_SIZE)
+def _parse_time_text(text):
+    """Hora 'HH:MM' (ou 'HH:MM:SS') em horas decimais, ou None"""
+    match = _TIME_PATTERN.match(text)
+    if match is None:
+        return None
+    hour, minute, second = match.groups()
+    return int(hour) + int(minute) / 60 + (int(second) / 3600 if second else 0)
+
+def _interval_hours(start_date, start_time, end_date, end_time):
+    """Duração em horas entre início e fim (datas já convertidas, horas em texto); 0 se faltar uma data"""
+    if start_date is None or end_date is None:
+        return 0
+    hours = (end_date - start_date).total_seconds() / 3600
+    if end_time:
+        hours += _parse_time_text(str(end_time)) or 0
+    if start_time:
+        hours -= _parse_time_text(str(start_time)) or 0
+    return hours if hours > 0 else 0
+
+# ═════════════════════════════════════════════════════════════════
+# FORMATO COLUNAR DE ENTRADA
+# ═════════════════════════════════════════════════════════════════
+
+# Payload colunar (format='columnar'), gerado por report_service.dart:
+#   {"format": "columnar", "strings": ["T01", "Concluído", ...],
+#    "dataByPhase": {"recepcao": {"keys": ["turbinaId", "vui", ...],
+#                                 "columns": [[0, 0, 1, ...], ["V1", "V2", ...], ...],
+#                                 "encoded": ["turbinaId"]}}}
+# As colunas em 'encoded' guardam índices para 'strings' (dicionário partilhado).
+
+class ColumnarRecord:
+    """
+    Vista de uma linha de ColumnarPhase com a interface de leitura de um dict; None numa coluna
+    marca um campo que o registo não tinha (o encoder colunar preenche assim as chaves em falta)
+    """
+
+    __slots__ = ('_phase', '_index')
+
+    def __init__(self, phase, index):
+        self._phase = phase
+        self._index = index
+
+    def get(self, key, default=None):
+        column = self._phase.columns.get(key)
+        if column is None:
+            return default
+        value = column[self._index]
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self._phase.columns[key][self._index]
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        column = self._phase.columns.get(key)
+        return column is not None and column[self._index] is not None
+
+    def get_date(self, key):
+        """Valor do campo já convertido para datetime (ou None)"""
+        column = self._phase.date_column(key)
+        return column[self._index] if column is not None else None
+
+    def get_duration(self):
+        """Duração do registo em horas"""
+        return self._phase.duration_column()[self._index]
+
+class ColumnarPhase:
+    """Registos de uma fase guardados por coluna, já descodificados do dicionário de strings"""
+
+    def __init__(self, keys, columns):
+        self.keys = list(keys)
+        self.columns = dict(zip(self.keys, columns))
+        self._length = len(columns[0]) if columns else 0
+        self._date_columns = {}
+        self._durations = None
+
+    @classmethod
+    def decode(cls, phase_payload, strings):
+        """Construir a fase a partir do payload colunar"""
+        encoded = set(phase_payload.get('encoded', []))
+        columns = []
+        for key, column in zip(phase_payload['keys'], phase_payload['columns']):
+            if key in encoded:
+                column = [strings[idx] if idx is not None else None for idx in column]
+            columns.append(column)
+        return cls(phase_payload['keys'], columns)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield ColumnarRecord(self, index)
+
+    def column(self, key, default=None):
+        """Coluna completa de um campo (valor por omissão onde o registo não tem o campo)"""
+        column = self.columns.get(key)
+        if column is None:
+            return [default] * self._length
+        if default is not None and None in column:
+            return [default if value is None else value for value in column]
+        return column
+
+    def date_column(self, key):
+        """Coluna de um campo convertida para datetime, de uma só vez (None se o campo não existir)"""
+        if key not in self.columns:
+            return None
+        column = self._date_columns.get(key)
+        if column is None:
+            column = self._date_columns[key] = _parse_date_column(self.columns[key])
+        return column
+
+    def duration_column(self):
+        """Duração de cada registo em horas: 'duracao' convertida em lote ou, se vazia, início → fim"""
+        if self._durations is None:
+            raw = self.column('duracao')
+            durations = _parse_duration_column(raw)
+            missing = [index for index, value in enumerate(raw) if not value]
+            if missing and 'dataInicio' in self.columns and 'dataFim' in self.columns:
+                starts, ends = self.date_column('dataInicio'), self.date_column('dataFim')
+                start_times, end_times = self.column('horaInicio'), self.column('horaFim')
+                for index in missing:
+                    durations[index] = _interval_hours(starts[index], start_times[index], ends[index], end_times[index])
+            self._durations = durations
+        return self._durations
+
+def decode_columnar_payload(input_data):
+    """Converter dataByPhase colunar em {fase: ColumnarPhase}; payloads por linha passam inalterados"""
+    if input_data.get('format') != 'columnar':
+        return input_data['dataByPhase']
+    strings = input_data.get('strings', [])
+    return {
+        phase_key: ColumnarPhase.decode(phase_payload, strings) if isinstance(phase_payload, dict) else phase_payload
+        for phase_key, phase_payload in input_data['dataByPhase'].items()
+    }
+
+# ═════════════════════════════════════════════════════════════════
+# UTILIZAÇÃO DE GRUAS (INTERVALOS E SWEEP-LINE)
+# ═════════════════════════════════════════════════════════════════
+
+# Cada registo de grua vira um intervalo (início, fim) em horas desde a data ordinal 1,
+# a partir de dataInicio/horaInicio e dataFim/horaFim (sem fim, início + duracao).
+# Por grua, os intervalos são unidos (sobreposições contadas uma vez); a frota é
+# percorrida com uma sweep-line sobre os intervalos de trabalho já unidos de cada grua.
+
+def _hours_since_epoch(date_value, time_value):
+    """Instante em horas desde a data ordinal 1 (data já convertida, hora em texto), ou None"""
+    if date_value is None:
+        return None
+    hours = date_value.toordinal() * 24
+    if time_value:
+        hours += _parse_time_text(str(time_value)) or 0
+    return hours
+
+def _record_interval(item):
+    """Intervalo (início, fim) de um registo de grua em horas, ou None se não tiver início ou duração"""
+    start = _hours_since_epoch(_record_date(item, 'dataInicio'), item.get('horaInicio'))
+    if start is None:
+        return None
+    end = _hours_since_epoch(_record_date(item, 'dataFim'), item.get('horaFim'))
+    if end is None or end <= start:
+        end = start + _record_duration(item)
+    return (start, end) if end > start else None
+
+def _epoch_hours_to_datetime(hours):
+    """Inverso de _hours_since_epoch"""
+    days, rest = divmod(hours, 24)
+    return datetime.fromordinal(int(days)) + timedelta(hours=rest)
+
+def _merge_intervals(intervals):
+    """
+    União de intervalos (início, fim): (lista ordenada de intervalos disjuntos, registos que
+    começam antes do fim dos anteriores)
+    """
+    merged = []
+    overlapping = 0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is not None and start < current_end:
+            overlapping += 1
+            if end > current_end:
+                current_end = end
+            continue
+        if current_end is not None:
+            merged.append((current_start, current_end))
+        current_start, current_end = start, end
+    if current_end is not None:
+        merged.append((current_start, current_end))
+    return merged, overlapping
+
+class CraneUtilization:
+    """Utilização de uma grua a partir dos seus intervalos (todos os tipos e só trabalho)"""
+
+    def __init__(self, intervals, work_intervals):
+        merged, self.overlapping_events = _merge_intervals(intervals)
+        self.work_intervals, _ = _merge_intervals(work_intervals)
+        self.events = len(intervals)
+        self.logged_hours = sum(end - start for start, end in merged)
+        self.overlap_hours = sum(end - start for start, end in intervals) - self.logged_hours
+        self.work_hours = sum(end - start for start, end in self.work_intervals)
+        self.first_start = merged[0][0] if merged else None
+        self.last_end = merged[-1][1] if merged else None
+        self.span_hours = (self.last_end - self.first_start) if merged else 0
+        self.idle_hours = self.span_hours - self.logged_hours
+        self.utilization = (self.work_hours / self.span_hours * 100) if self.span_hours > 0 else 0
+
+class FleetConcurrency:
+    """
+    Sweep-line sobre os intervalos de trabalho unidos de cada grua: horas com k gruas a trabalhar
+    em simultâneo (level_hours[k]), pico e quando começa, e horas sem nenhuma grua a trabalhar
+    entre o primeiro início e o último fim
+    """
+
+    def __init__(self, work_intervals_by_crane):
+        starts = sorted(start for intervals in work_intervals_by_crane for start, _ in intervals)
+        ends = sorted(end for intervals in work_intervals_by_crane for _, end in intervals)
+        self.level_hours = [0.0]
+        self.peak = 0
+        self.peak_start = None
+        self.span_hours = (ends[-1] - starts[0]) if starts else 0
+        
+        # Fins antes de inícios no mesmo instante: intervalos consecutivos não são simultâneos
+        level = 0
+        previous = starts[0] if starts else None
+        i = j = 0
+        while i < len(starts):
+            if ends[j] <= starts[i]:
+                instant, delta = ends[j], -1
+                j += 1
+            else:
+                instant, delta = starts[i], 1
+                i += 1
+            if instant > previous:
+                self.level_hours[level] += instant - previous
+                previous = instant
+            level += delta
+            if level == len(self.level_hours):
+                self.level_hours.append(0.0)
+            if level > self.peak:
+                self.peak, self.peak_start = level, instant
+        for instant in ends[j:]:
+            if instant > previous:
+                self.level_hours[level] += instant - previous
+                previous = instant
+            level -= 1
+        
+        self.idle_hours = self.level_hours[0]
+        self.busy_hours = self.span_hours - self.idle_hours
+
+# ═════════════════════════════════════════════════════════════════
+# TIMELINE (DIA, SEMANA ISO, MÊS) E CURVA S
+# ═════════════════════════════════════════════════════════════════
+
+# A agregação conta registos por dia (ordinal da data); os períodos maiores são agrupados a
+# partir dos dias distintos, de uma só vez (com NumPy datetime64, se estiver instalado). Cada
+# período é identificado pelo ordinal do seu primeiro dia: a segunda-feira da semana ISO ou o
+# dia 1 do mês, o que mantém semanas de anos diferentes separadas.
+
+TIMELINE_GRANULARITIES = ('day', 'week', 'month')
+# Linhas da timeline no dashboard (39-52, antes da secção de gruas)
+TIMELINE_MAX_POINTS = 14
+_UNIX_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+MONTH_LABELS = {
+    'pt': ('Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez'),
+    'en': ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'),
+}
+
+def _period_start(ordinal, granularity):
+    """Ordinal do primeiro dia do período (dia, semana ISO ou mês) que contém o dia"""
+    if granularity == 'week':
+        return ordinal - (ordinal - 1) % 7
+    if granularity == 'month':
+        return datetime.fromordinal(ordinal).replace(day=1).toordinal()
+    return ordinal
+
+def _next_period(start, granularity):
+    """Ordinal do primeiro dia do período seguinte"""
+    if granularity == 'week':
+        return start + 7
+    if granularity == 'month':
+        first = datetime.fromordinal(start)
+        return (first.replace(year=first.year + 1, month=1) if first.month == 12
+                else first.replace(month=first.month + 1)).toordinal()
+    return start + 1
+
+def timeline_granularity(first_day, last_day, max_points=TIMELINE_MAX_POINTS):
+    """Período mais fino (dia, semana, mês) com que o intervalo de datas cabe em max_points períodos"""
+    for granularity in TIMELINE_GRANULARITIES[:-1]:
+        first = _period_start(first_day, granularity)
+        last = _period_start(last_day, granularity)
+        if (last - first) // (7 if granularity == 'week' else 1) + 1 <= max_points:
+            return granularity
+    return TIMELINE_GRANULARITIES[-1]
+
+def _bucket_days(day_counts, granularity):
+    """{início do período: contagem} a partir de {ordinal do dia: contagem}"""
+    if np is not None and granularity != 'day':
+        days = np.fromiter(day_counts.keys(), dtype=np.int64, count=len(day_counts))
+        counts = np.fromiter(day_counts.values(), dtype=np.int64, count=len(day_counts))
+        if granularity == 'week':
+            starts = days - (days - 1) % 7
+        else:
+            months = (days - _UNIX_EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]')
+            starts = months.astype('datetime64[D]').astype(np.int64) + _UNIX_EPOCH_ORDINAL
+        unique_starts, inverse = np.unique(starts, return_inverse=True)
+        totals = np.bincount(inverse, weights=counts)
+        return dict(zip(unique_starts.tolist(), totals.astype(np.int64).tolist()))
+    buckets = defaultdict(int)
+    for day, count in day_counts.items():
+        buckets[_period_start(day, granularity)] += count
+    return buckets
+
+def bucket_timeline(day_counts, granularity):
+    """
+    [(início do período, contagem, acumulado)] por ordem, com os períodos vazios entre o primeiro e
+    o último; o acumulado é a curva S
+    """
+    if not day_counts:
+        return []
+    buckets = _bucket_days(day_counts, granularity)
+    start, last = min(buckets), max(buckets)
+    rows = []
+    cumulative = 0
+    while start <= last:
+        count = buckets.get(start, 0)
+        cumulative += count
+        rows.append((start, count, cumulative))
+        start = _next_period(start, granularity)
+    return rows
+
+def timeline_label(start, granularity, lang='pt'):
+    """Rótulo de um período: data do dia, ano-semana ISO ou mês abreviado e ano"""
+    first = datetime.fromordinal(start)
+    if granularity == 'week':
+        iso_year, iso_week, _ = first.isocalendar()
+        return f"{iso_year}-{'S' if lang == 'pt' else 'W'}{iso_week:02d}"
+    if granularity == 'month':
+        return f"{MONTH_LABELS.get(lang, MONTH_LABELS['en'])[first.month - 1]} {first.year}"
+    return first.strftime('%Y-%m-%d')
+
+# ═════════════════════════════════════════════════════════════════
+# AGREGAÇÃO DE MÉTRICAS (UMA ÚNICA PASSAGEM PELOS DADOS)
+# ═════════════════════════════════════════════════════════════════
+
+# Fases de instalação (contam para o estado das turbinas) e fases de gruas
+PHASE_KEYS = ['recepcao', 'preparacao', 'preAssemblagem', 'assemblagem', 'torqueTensionamento', 'fasesFinal']
+CRANE_PHASE_KEYS = ['gruasPads', 'gruasGerais']
+
+COMPLETED_STATUSES = ('concluído', 'concluido', 'completed', 'complete')
+IN_PROGRESS_STATUSES = ('em_progresso', 'em progresso', 'in_progress', 'in progress')
+WORK_TIPOS = ('trabalho', 'work')
+STOP_TIPOS = ('paragem', 'parada', 'stoppage', 'stop')
+
+# Campos de data usados na timeline, por ordem de preferência
+TIMELINE_DATE_FIELDS = ['dataReal', 'dataAtual', 'dataFim', 'dataConclusao', 'dataInstalacao', 'data']
+
+def _normalize_status(value):
+    """Normalizar status/tipo para comparação"""
+    return str(value or '').strip().lower()
+
+def _record_date(item, key):
+    """Data de um campo de um registo; nos registos colunares a coluna é convertida em lote"""
+    if isinstance(item, ColumnarRecord):
+        return item.get_date(key)
+    return _parse_date(item.get(key))
+
+def _record_duration(item):
+    """Duração de um registo em horas; sem 'duracao', calculada de dataInicio/horaInicio a dataFim/horaFim"""
+    if isinstance(item, ColumnarRecord):
+        return item.get_duration()
+    value = item.get('duracao')
+    if value:
+        return parse_duration(value)
+    return _interval_hours(_parse_date(item.get('dataInicio')), item.get('horaInicio'),
+                           _parse_date(item.get('dataFim')), item.get('horaFim'))
+
+def _turbine_id(item):
+    """ID da turbina de um registo (turbinaId, turbina, numero ou id)"""
+    return item.get('turbinaId') or item.get('turbina') or item.get('numero') or item.get('id')
+
+# Palavras-chave das observações de campo (pt/en), procuradas como palavras inteiras (ou no plural,
+# com 's') sem distinguir maiúsculas: 'reopened' ou 'problematic' não contam. As letras acentuadas
+# aceitam também a forma sem acento. A categoria é a primeira de OBSERVATION_CATEGORIES encontrada
+OBSERVATION_KEYWORDS = {
+    'critical': ('crítico', 'crítica', 'critical'),
+    'problem': ('problema', 'problem'),
+    'attention': ('atenção', 'attention'),
+    'open': ('aberto', 'aberta', 'open'),
+}
+OBSERVATION_CATEGORIES = (('critical', '⚠️ Crítico'), ('problem', '🔴 Problema'), ('attention', '🟡 Atenção'))
+_OBSERVATION_CACHE_SIZE = 8192
+
+_ACCENT_FOLD = str.maketrans('áàâãéèêíìóòôõúùüç', 'aaaaeeeiioooouuuc')
+
+def _compile_observation_pattern(keywords):
+    """
+    Uma única regex com todas as palavras-chave (para texto em minúsculas), as mais longas primeiro;
+    o grupo 1 é a palavra encontrada, sem o 's' do plural
+    """
+    words = sorted({word.lower() for group in keywords.values() for word in group}, key=len, reverse=True)
+    return re.compile(r'\b(' + '|'.join(
+        ''.join(f'[{char.translate(_ACCENT_FOLD)}{char}]' if char.translate(_ACCENT_FOLD) != char else re.escape(char)
+                for char in word)
+        for word in words) + r')s?\b')
+
+def _accent_variants(word):
+    """Todas as grafias de uma palavra com e sem cada um dos seus acentos"""
+    options = [(char, char.translate(_ACCENT_FOLD)) if char.translate(_ACCENT_FOLD) != char else (char,) for char in word]
+    return {''.join(chars) for chars in itertools.product(*options)}
+
+_OBSERVATION_PATTERN = _compile_observation_pattern(OBSERVATION_KEYWORDS)
+# Texto encontrado pela regex -> chave de OBSERVATION_KEYWORDS
+_OBSERVATION_KEYS = {variant: key for key, group in OBSERVATION_KEYWORDS.items()
+                     for word in group for variant in _accent_variants(word.lower())}
+
+@lru_cache(maxsize=_OBSERVATION_CACHE_SIZE)
+def _classify_observation(obs):
+    """Categoria e status do texto de uma observação de campo, numa única passagem"""
+    return _observation_result(frozenset(map(_OBSERVATION_KEYS.__getitem__, _OBSERVATION_PATTERN.findall(obs.lower()))))
+
+@lru_cache(maxsize=None)
+def _observation_result(found):
+    """(categoria, status) para o conjunto de chaves encontradas num texto"""
+    category = next((label for key, label in OBSERVATION_CATEGORIES if key in found), 'ℹ️ Info')
+    return category, ('Aberto' if 'open' in found else 'Resolvido')
+
+def _crane_hours_by_tipo():
+    return {'trabalho': 0, 'mobilizacao': 0, 'paragem': 0}
+
+def _motivo_totals():
+    return {'count': 0, 'duracao': 0}
+
+class DeviationStats:
+    """
+    Distribuição de desvios em dias (inteiros), guardada como contagem por valor: percentis exatos
+    em tempo linear no número de desvios (só os valores distintos são ordenados, uma vez até ao
+    próximo add)
+    """
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.total = 0
+        self._cumulative = None
+
+    def add(self, days):
+        self.counts[days] += 1
+        self.total += 1
+        self._cumulative = None
+
+    def percentile(self, pct):
+        """Percentil pelo método do rank mais próximo (None sem desvios)"""
+        if not self.total:
+            return None
+        if self._cumulative is None:
+            values = sorted(self.counts)
+            self._cumulative = (values, list(itertools.accumulate(self.counts[days] for days in values)))
+        values, cumulative = self._cumulative
+        rank = max(1, math.ceil(pct / 100 * self.total))
+        return values[min(bisect_left(cumulative, rank), len(values) - 1)]
+
+    @property
+    def worst(self):
+        """Maior atraso (ou o menor adiantamento, se nenhum registo está atrasado)"""
+        return max(self.counts) if self.total else None
+
+    @property
+    def late(self):
+        return sum(count for days, count in self.counts.items() if days > 0)
+
+class TurbinePhase:
+    """Registos de uma turbina numa fase: posições na fase, contagens por status e última data"""
+    __slots__ = ('rows', 'with_status', 'completed', 'in_progress', 'last_date')
+
+    def __init__(self):
+        self.rows = []
+        self.with_status = 0
+        self.completed = 0
+        self.in_progress = 0
+        self.last_date = None
+
+    def add(self, row, status, date_value=None):
+        self.rows.append(row)
+        if status:
+            self.with_status += 1
+            if status in COMPLETED_STATUSES:
+                self.completed += 1
+            elif status in IN_PROGRESS_STATUSES:
+                self.in_progress += 1
+        if date_value and (self.last_date is None or date_value > self.last_date):
+            self.last_date = date_value
+
+    @property
+    def status(self):
+        """Status da turbina na fase: 'completed' se todos os registos com status estão concluídos,
+        'in_progress' se algum está concluído ou em progresso, 'planned' nos restantes; None sem status"""
+        if not self.with_status:
+            return None
+        if self.completed == self.with_status:
+            return 'completed'
+        if self.completed or self.in_progress:
+            return 'in_progress'
+        return 'planned'
+
+class TurbineIndex:
+    """
+    Índice turbina → fase → TurbinePhase, pela ordem de PHASE_KEYS. A fase atual de cada turbina
+    é a última fase (na ordem do processo) em que tem registos com status, e o seu status é o dessa
+    fase; uma fase concluída antes da última fase com registos (na ordem de PHASE_KEYS) conta como
+    'in_progress', quer as fases vazias venham no payload quer não. Sem status em nenhuma fase,
+    a fase atual é a última com registos e o status 'planned'.
+    """
+
+    def __init__(self, phases):
+        self.by_turbine = {}
+        final_phase = None
+        for phase_key in PHASE_KEYS:
+            phase = phases.get(phase_key)
+            if phase is None or not phase.total:
+                continue
+            final_phase = phase_key
+            for turbine_id, entry in phase.turbines.items():
+                self.by_turbine.setdefault(turbine_id, {})[phase_key] = entry
+        
+        # turbina -> (fase atual, status), resolvido uma vez
+        self.current = {}
+        self.status_counts = {'completed': 0, 'in_progress': 0, 'planned': 0}
+        for turbine_id, by_phase in self.by_turbine.items():
+            current_phase = next((key for key in reversed(by_phase) if by_phase[key].with_status), None)
+            if current_phase is None:
+                current = (next(reversed(by_phase)), 'planned')
+            else:
+                status = by_phase[current_phase].status
+                if status == 'completed' and current_phase != final_phase:
+                    status = 'in_progress'
+                current = (current_phase, status)
+            self.current[turbine_id] = current
+            self.status_counts[current[1]] += 1
+
+    def __len__(self):
+        return len(self.by_turbine)
+
+    def __contains__(self, turbine_id):
+        return turbine_id in self.by_turbine
+
+    def current_phase(self, turbine_id):
+        return self.current[turbine_id][0]
+
+    def status(self, turbine_id):
+        return self.current[turbine_id][1]
+
+    def phase(self, turbine_id, phase_key):
+        """TurbinePhase de uma turbina numa fase (None se não tem registos)"""
+        return self.by_turbine.get(turbine_id, {}).get(phase_key)
+
+    def turbines(self):
+        """IDs das turbinas por ordem natural (T2 antes de T10)"""
+        return sorted(self.by_turbine, key=_natural_key)
+
+def _natural_key(value):
+    """Chave de ordenação natural: números dentro do texto comparados como números"""
+    return [(0, int(part), '') if part.isdigit() else (1, 0, part.lower())
+            for part in re.split(r'(\d+)', str(value)) if part]
+
+class PhaseAggregates:
+    """Métricas de uma fase, acumuladas registo a registo"""
+
+    def __init__(self, phase_key):
+        self.phase_key = phase_key
+        self.total = 0
+        self.concluded = 0
+        self.turbines = {}
+        self.timeline = defaultdict(int)
+        self.deviations = []
+        self.observations = []
+        self.crane_stats = defaultdict(_crane_hours_by_tipo)
+        self.motivo_stats = defaultdict(_motivo_totals)
+        self.work_hours = 0.0
+        self.stop_hours = 0.0
+        self.crane_intervals = defaultdict(list)
+        self.crane_work_intervals = defaultdict(list)
+
+    @classmethod
+    def from_records(cls, phase_key, records):
+        """Agregar os registos de uma fase (listas inválidas contam como vazias)"""
+        agg = cls(phase_key)
+        if isinstance(records, (list, ColumnarPhase)):
+            for item in records:
+                agg.add(item)
+        return agg
+
+    def add(self, item):
+        """Acumular um registo"""
+        self.total += 1
+        status = _normalize_status(item.get('status'))
+        if status in COMPLETED_STATUSES:
+            self.concluded += 1
+        
+        # Timeline por dia (agrupada em semanas ou meses no fim)
+        for field in TIMELINE_DATE_FIELDS:
+            date_value = _record_date(item, field)
+            if date_value:
+                self.timeline[date_value.toordinal()] += 1
+                break
+        
+        # Registos de cada turbina nesta fase (posição na fase, status e data)
+        if self.phase_key in PHASE_KEYS:
+            turbine_id = _turbine_id(item)
+            if turbine_id:
+                entry = self.turbines.get(turbine_id)
+                if entry is None:
+                    entry = self.turbines[turbine_id] = TurbinePhase()
+                entry.add(self.total - 1, status, date_value)
+        
+        # Desvios planeado vs real
+        planned_field = 'dataPlaneada' if 'dataPlaneada' in item else 'dataPrevista'
+        actual_field = 'dataReal' if 'dataReal' in item else 'dataAtual'
+        planned_date = item.get(planned_field, '')
+        actual_date = item.get(actual_field, '')
+        if planned_date and actual_date:
+            planned = _record_date(item, planned_field)
+            actual = _record_date(item, actual_field)
+            if planned and actual:
+                deviation_days = (actual - planned).days
+                self.deviations.append({
+                    'turbine': _turbine_id(item) or '',
+                    'phase_key': self.phase_key,
+                    'planned': planned_date,
+                    'actual': actual_date,
+                    'deviation': deviation_days,
+                    'status': 'No plan' if deviation_days == 0 else ('Adiantado' if deviation_days < 0 else 'Atrasado'),
+                })
+        
+        # Observações de campo
+        obs = item.get('observacoes', '')
+        if obs:
+            category, obs_status = _classify_observation(obs if isinstance(obs, str) else str(obs))
+            self.observations.append({
+                # Sem 'data' fica None: a data do dia é posta ao escrever a sheet, para que
+                # os agregados em cache não fiquem com a data em que foram calculados
+                'data': item.get('data'),
+                'turbine': item.get('turbina', item.get('numero', '')),
+                'phase_key': self.phase_key,
+                'category': category,
+                'description': obs,
+                'status': obs_status,
+            })
+        
+        # Gruas
+        if self.phase_key in CRANE_PHASE_KEYS:
+            tipo = item.get('tipo', '')
+            duracao = _record_duration(item)
+            modelo = item.get('gruaModelo', 'Desconhecida')
+            if tipo in ('trabalho', 'mobilizacao', 'paragem'):
+                self.crane_stats[modelo][tipo] += duracao
+            if tipo == 'paragem':
+                motivo = self.motivo_stats[item.get('motivo', 'Não especificado')]
+                motivo['count'] += 1
+                motivo['duracao'] += duracao
+            tipo = _normalize_status(tipo)
+            if tipo in WORK_TIPOS:
+                self.work_hours += duracao
+            elif tipo in STOP_TIPOS:
+                self.stop_hours += duracao
+            
+            # Intervalo real do registo, para uniões e concorrência
+            interval = _record_interval(item)
+            if interval is not None:
+                self.crane_intervals[modelo].append(interval)
+                if tipo in WORK_TIPOS:
+                    self.crane_work_intervals[modelo].append(interval)
+
+class ReportAggregates:
+    """Todas as métricas das sheets de resumo, calculadas numa única passagem por data_by_phase"""
+
+    def __init__(self, phases):
+        # phases: phase_key -> PhaseAggregates, pela ordem de data_by_phase
+        self.phases = phases
+        empty = PhaseAggregates(None)
+        
+        # Turbinas únicas, com a fase atual e o status resolvidos pela ordem do processo
+        self.turbines = TurbineIndex(phases)
+        self.total_turbines = len(self.turbines)
+        self.completed_turbines = self.turbines.status_counts['completed']
+        self.in_progress_turbines = self.turbines.status_counts['in_progress']
+        self.planned_turbines = self.total_turbines - self.completed_turbines - self.in_progress_turbines
+        self.completion_rate = (self.completed_turbines / self.total_turbines * 100) if self.total_turbines > 0 else 0
+        
+        # Progresso por fase: (fase, total, concluídos, %)
+        self.phase_progress = []
+        for phase_key in PHASE_KEYS:
+            phase = phases.get(phase_key, empty)
+            pct = (phase.concluded / phase.total * 100) if phase.total > 0 else 0
+            self.phase_progress.append((phase_key, phase.total, phase.concluded, pct))
+        
+        # Timeline: (início do período, contagem, acumulado), com o período escolhido pela duração
+        timeline = defaultdict(int)
+        for phase in phases.values():
+            for day, count in phase.timeline.items():
+                timeline[day] += count
+        self.timeline_days = timeline
+        self.timeline_granularity = timeline_granularity(min(timeline), max(timeline)) if timeline else 'week'
+        self.timeline = bucket_timeline(timeline, self.timeline_granularity)
+        
+        # Gruas: Pads primeiro, depois Gerais
+        self.work_hours = 0.0
+        self.stop_hours = 0.0
+        self.crane_stats = defaultdict(_crane_hours_by_tipo)
+        self.motivo_stats = defaultdict(_motivo_totals)
+        for phase_key in CRANE_PHASE_KEYS:
+            phase = phases.get(phase_key, empty)
+            self.work_hours += phase.work_hours
+            self.stop_hours += phase.stop_hours
+            for modelo, stats in phase.crane_stats.items():
+                for tipo, hours in stats.items():
+                    self.crane_stats[modelo][tipo] += hours
+            for motivo, stats in phase.motivo_stats.items():
+                self.motivo_stats[motivo]['count'] += stats['count']
+                self.motivo_stats[motivo]['duracao'] += stats['duracao']
+        
+        # Utilização por grua (intervalos das duas fases de gruas) e concorrência da frota
+        intervals = defaultdict(list)
+        work_intervals = defaultdict(list)
+        for phase_key in CRANE_PHASE_KEYS:
+            phase = phases.get(phase_key, empty)
+            for modelo, crane_intervals in phase.crane_intervals.items():
+                intervals[modelo].extend(crane_intervals)
+            for modelo, crane_intervals in phase.crane_work_intervals.items():
+                work_intervals[modelo].extend(crane_intervals)
+        self.crane_utilization = {
+            modelo: CraneUtilization(crane_intervals, work_intervals.get(modelo, []))
+            for modelo, crane_intervals in intervals.items()
+        }
+        self.fleet = FleetConcurrency([crane.work_intervals for crane in self.crane_utilization.values()])
+        
+        self.has_crane_data = any(phases.get(key, empty).total for key in CRANE_PHASE_KEYS)
+        
+        # Desvios e observações, pela ordem das fases em data_by_phase
+        self.deviations = [dev for phase in phases.values() for dev in phase.deviations]
+        
+        # Distribuição dos desvios por fase, por turbina e no total
+        self.deviation_stats = DeviationStats()
+        self.deviation_stats_by_phase = defaultdict(DeviationStats)
+        self.deviation_stats_by_turbine = defaultdict(DeviationStats)
+        for dev in self.deviations:
+            self.deviation_stats.add(dev['deviation'])
+            self.deviation_stats_by_phase[dev['phase_key']].add(dev['deviation'])
+            self.deviation_stats_by_turbine[dev['turbine']].add(dev['deviation'])
+        self.observations = [obs for phase in phases.values() for obs in phase.observations]
+
+    @classmethod
+    def from_data(cls, data_by_phase):
+        """Percorrer data_by_phase uma única vez"""
+        return cls({
+            phase_key: PhaseAggregates.from_records(phase_key, records)
+            for phase_key, records in data_by_phase.items()
+        })
+
 # ═════════════════════════════════════════════════════════════════
 # CRIAÇÃO DE COVER SHEET
 # ═════════════════════════════════════════════════════════════════
@@ -178,18 +1131,18 @@ def _create_cover_sheet(wb, project_name, language='pt'):
     ws.merge_cells('B2:C2')
     title_cell = ws['B2']
     title_cell.value = '🏗️ AS-BUILT'
-    title_cell.font = Font(name='Arial', size=20, bold=True, color=COLORS['header'])
-    title_cell.alignment = Alignment(horizontal='center', vertical='center')
+    title_cell.font = _font(name='Arial', size=20, bold=True, color=COLORS['header'])
+    title_cell.alignment = _alignment(horizontal='center', vertical='center')
     
     # Subtítulo
     ws.merge_cells('B3:C3')
     subtitle_cell = ws['B3']
     subtitle_cell.value = 'Relatório de Instalação de Turbinas' if language == 'pt' else 'Wind Turbine Installation Report'
-    subtitle_cell.font = Font(name='Arial', size=12, color=COLORS['dark_gray'])
-    subtitle_cell.alignment = Alignment(horizontal='center', vertical='center')
+    subtitle_cell.font = _font(name='Arial', size=12, color=COLORS['dark_gray'])
+    subtitle_cell.alignment = _alignment(horizontal='center', vertical='center')
     
     ws['B4'].value = '─' * 50
-    ws['B4'].alignment = Alignment(horizontal='center')
+    ws['B4'].alignment = _alignment(horizontal='center')
     
     current_row = 6
     
@@ -197,16 +1150,16 @@ def _create_cover_sheet(wb, project_name, language='pt'):
     ws.merge_cells(f'B{current_row}:C{current_row}')
     project_cell = ws[f'B{current_row}']
     project_cell.value = project_name
-    project_cell.font = Font(name='Arial', size=18, bold=True, color=COLORS['white'])
-    project_cell.fill = PatternFill(start_color=COLORS['header'], end_color=COLORS['header'], fill_type='solid')
-    project_cell.alignment = Alignment(horizontal='center', vertical='center')
+    project_cell.font = _font(name='Arial', size=18, bold=True, color=COLORS['white'])
+    project_cell.fill = _fill(COLORS['header'])
+    project_cell.alignment = _alignment(horizontal='center', vertical='center')
     ws.row_dimensions[current_row].height = 35
     
     current_row += 2
     
     # Data do Relatório
-    label_font = Font(name='Arial', size=10, bold=True, color=COLORS['dark_gray'])
-    info_font = Font(name='Arial', size=11, color=COLORS['header'])
+    label_font = _font(name='Arial', size=10, bold=True, color=COLORS['dark_gray'])
+    info_font = _font(name='Arial', size=11, color=COLORS['header'])
     
     ws[f'B{current_row}'].value = 'Data do Relatório:' if language == 'pt' else 'Report Date:'
     ws[f'B{current_row}'].font = label_font
@@ -219,7 +1172,7 @@ def _create_cover_sheet(wb, project_name, language='pt'):
 # CRIAÇÃO DE EXECUTIVE SUMMARY
 # ═════════════════════════════════════════════════════════════════
 
-def _create_executive_summary_v2(wb, project_name, data_by_phase, language='pt'):
+def _create_executive_summary_v2(wb, project_name, aggregates, language='pt'):
     """Criar sheet de resumo executivo com KPIs"""
     
     ws = wb.create_sheet('Resumo Executivo', 1)
@@ -232,37 +1185,14 @@ def _create_executive_summary_v2(wb, project_name, data_by_phase, language='pt')
     ws.merge_cells('B1:G1')
     header = ws['B1']
     header.value = 'RESUMO EXECUTIVO' if language == 'pt' else 'EXECUTIVE SUMMARY'
-    header.font = Font(name='Arial', size=14, bold=True, color=COLORS['white'])
-    header.fill = PatternFill(start_color=COLORS['header'], end_color=COLORS['header'], fill_type='solid')
-    header.alignment = Alignment(horizontal='center', vertical='center')
-    
-    # Calcular KPIs baseado em turbinas únicas
-    turbine_ids = set()
-    turbine_status = {}
-    
-    # Coletar turbinas únicas e seus status de todas as fases relevantes
-    phase_keys = ['recepcao', 'preparacao', 'preAssemblagem', 'assemblagem', 'torqueTensionamento', 'fasesFinal']
-    
-    for phase_key in phase_keys:
-        phase_data = data_by_phase.get(phase_key, [])
-        if isinstance(phase_data, list):
-            for item in phase_data:
-                # Tentar obter ID da turbina (pode ser turbinaId, turbina, numero, etc.)
-                turbine_id = item.get('turbinaId') or item.get('turbina') or item.get('numero') or item.get('id')
-                if turbine_id:
-                    turbine_ids.add(turbine_id)
-                    # Atualizar status da turbina (último status encontrado)
-                    status = item.get('status', '').lower().strip()
-                    if status:
-                        turbine_status[turbine_id] = status
-    
-    total_turbines = len(turbine_ids) if turbine_ids else 0
-    
-    # Contar turbinas concluídas
-    completed_turbines = sum(1 for status in turbine_status.values() 
-                             if status in ('concluído', 'concluido', 'completed', 'complete'))
-    
-    completion_rate = (completed_turbines / total_turbines * 100) if total_turbines > 0 else 0
+    header.font = _font(name='Arial', size=14, bold=True, color=COLORS['white'])
+    header.fill = _fill(COLORS['header'])
+    header.alignment = _alignment(horizontal='center', vertical='center')
+    
+    # KPIs baseados em turbinas únicas (pré-calculados)
+    total_turbines = aggregates.total_turbines
+    completed_turbines = aggregates.completed_turbines
+    completion_rate = aggregates.completion_rate
     
     # KPIs Table
     row = 3
@@ -272,9 +1202,9 @@ def _create_executive_summary_v2(wb, project_name, data_by_phase, language='pt')
     for col, header_text in enumerate(headers, 1):
         cell = ws.cell(row=row, column=col+1)
         cell.value = header_text
-        cell.font = Font(name='Arial', size=10, bold=True, color=COLORS['white'])
-        cell.fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.font = _font(name='Arial', size=10, bold=True, color=COLORS['white'])
+        cell.fill = _fill(COLORS['subheader'])
+        cell.alignment = _alignment(horizontal='center', vertical='center')
         cell.border = BORDER_ALL
     
     row += 1
@@ -298,13 +1228,13 @@ def _create_executive_summary_v2(wb, project_name, data_by_phase, language='pt')
     status_cell = ws.cell(row=row, column=5)
     if completion_rate >= 100:
         status_cell.value = '✅'
-        status_cell.fill = PatternFill(start_color=COLORS['success'], end_color=COLORS['success'], fill_type='solid')
+        status_cell.fill = _fill(COLORS['success'])
     elif completion_rate >= 80:
         status_cell.value = '🟡'
-        status_cell.fill = PatternFill(start_color=COLORS['caution'], end_color=COLORS['caution'], fill_type='solid')
+        status_cell.fill = _fill(COLORS['caution'])
     else:
         status_cell.value = '⚠️'
-        status_cell.fill = PatternFill(start_color=COLORS['warning'], end_color=COLORS['warning'], fill_type='solid')
+        status_cell.fill = _fill(COLORS['warning'])
     
     for col in range(2, 6):
         ws.cell(row=row, column=col).border = BORDER_ALL
@@ -327,7 +1257,7 @@ def _create_executive_summary_v2(wb, project_name, data_by_phase, language='pt')
 # CRIAÇÃO DE DASHBOARD COM GRÁFICOS
 # ═════════════════════════════════════════════════════════════════
 
-def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
+def _create_dashboard_v3(wb, project_name, aggregates, language='pt'):
     """Dashboard com layout fixo: tabelas à esquerda (A-D), gráficos à direita (F+)"""
     
     ws = wb.create_sheet('Dashboard', 2)
@@ -345,105 +1275,37 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
     ws.merge_cells('A1:O1')
     header = ws['A1']
     header.value = f'DASHBOARD - {project_name}'
-    header.font = Font(name='Arial', size=14, bold=True, color=COLORS['white'])
-    header.fill = PatternFill(start_color=COLORS['header'], end_color=COLORS['header'], fill_type='solid')
-    header.alignment = Alignment(horizontal='center', vertical='center')
+    header.font = _font(name='Arial', size=14, bold=True, color=COLORS['white'])
+    header.fill = _fill(COLORS['header'])
+    header.alignment = _alignment(horizontal='center', vertical='center')
     ws.row_dimensions[1].height = 25
     
-    def _normalize_status(value):
-        return str(value or '').strip().lower()
-    
-    def _parse_date(value):
-        if not value:
-            return None
-        if isinstance(value, datetime):
-            return value
-        text = str(value).strip()
-        for fmt in ('%Y-%m-%d', '%d/%m/%Y'):
-            try:
-                return datetime.strptime(text[:10], fmt)
-            except Exception:
-                continue
-        return None
-    
     # ═══════════════════════════════════════════════════════════════════════
-    # COLETAR TODOS OS DADOS
+    # DADOS PRÉ-CALCULADOS
     # ═══════════════════════════════════════════════════════════════════════
     
+    total_turbines = aggregates.total_turbines
+    completed_turbines = aggregates.completed_turbines
+    in_progress_turbines = aggregates.in_progress_turbines
+    planned_turbines = aggregates.planned_turbines
+    completion_rate = aggregates.completion_rate
+    
     # Fases - sempre 6 fases
-    phase_keys = ['recepcao', 'preparacao', 'preAssemblagem', 'assemblagem', 'torqueTensionamento', 'fasesFinal']
-    phase_rows = []
-    
-    # Coletar turbinas únicas e seus status
-    turbine_ids = set()
-    turbine_status = {}
-    
-    # Primeiro, coletar todas as turbinas únicas
-    for phase_key in phase_keys:
-        phase_data = data_by_phase.get(phase_key, [])
-        if isinstance(phase_data, list):
-            for item in phase_data:
-                turbine_id = item.get('turbinaId') or item.get('turbina') or item.get('numero') or item.get('id')
-                if turbine_id:
-                    turbine_ids.add(turbine_id)
-                    status = _normalize_status(item.get('status'))
-                    if status:
-                        turbine_status[turbine_id] = status
-    
-    total_turbines = len(turbine_ids) if turbine_ids else 0
-    
-    # Contar turbinas por status
-    completed_turbines = sum(1 for status in turbine_status.values() 
-                             if status in ('concluído', 'concluido', 'completed', 'complete'))
-    in_progress_turbines = sum(1 for status in turbine_status.values() 
-                               if status in ('em_progresso', 'em progresso', 'in_progress', 'in progress'))
-    planned_turbines = total_turbines - completed_turbines - in_progress_turbines
-    
-    # Calcular dados por fase (número de componentes/itens em cada fase)
-    for phase_key in phase_keys:
-        phase_data = data_by_phase.get(phase_key, [])
-        total = len(phase_data) if isinstance(phase_data, list) else 0
-        concluded = 0
-        if isinstance(phase_data, list):
-            for item in phase_data:
-                status = _normalize_status(item.get('status'))
-                if status in ('concluído', 'concluido', 'completed', 'complete'):
-                    concluded += 1
-        pct = (concluded / total * 100) if total > 0 else 0
-        phase_rows.append((translate_phase(phase_key, language), total, concluded, pct))
-    
-    completion_rate = (completed_turbines / total_turbines * 100) if total_turbines > 0 else 0
-    
-    # Timeline de instalação
-    timeline_counts = defaultdict(int)
-    date_fields = ['dataReal', 'dataAtual', 'dataFim', 'dataConclusao', 'dataInstalacao', 'data']
-    for phase_data in data_by_phase.values():
-        if isinstance(phase_data, list):
-            for item in phase_data:
-                date_value = None
-                for field in date_fields:
-                    date_value = _parse_date(item.get(field))
-                    if date_value:
-                        break
-                if date_value:
-                    year, week, _ = date_value.isocalendar()
-                    label = f"Semana {week}" if language == 'pt' else f"Week {week}"
-                    timeline_counts[label] += 1
-    
-    timeline_rows = sorted(timeline_counts.items(), key=lambda x: int(x[0].split()[-1]))
+    phase_rows = [(translate_phase(phase_key, language), total, concluded, pct)
+                  for phase_key, total, concluded, pct in aggregates.phase_progress]
+    
+    # Timeline de instalação (períodos mais recentes, se não couberem todos) e curva S acumulada
+    granularity = aggregates.timeline_granularity
+    timeline_rows = [(timeline_label(start, granularity, language), count, cumulative)
+                     for start, count, cumulative in aggregates.timeline[-TIMELINE_MAX_POINTS:]]
     if not timeline_rows:
-        timeline_rows = [('Semana 1' if language == 'pt' else 'Week 1', 0)]
+        # Sem datas: um período vazio (o atual), com o mesmo formato de rótulo
+        current = _period_start(datetime.now().toordinal(), granularity)
+        timeline_rows = [(timeline_label(current, granularity, language), 0, 0)]
     
     # Gruas - trabalho vs paragens
-    work_hours = 0.0
-    stop_hours = 0.0
-    for item in data_by_phase.get('gruasPads', []) + data_by_phase.get('gruasGerais', []):
-        tipo = _normalize_status(item.get('tipo'))
-        duracao = parse_duration(item.get('duracao'))
-        if tipo in ('trabalho', 'work'):
-            work_hours += duracao
-        elif tipo in ('paragem', 'parada', 'stoppage', 'stop'):
-            stop_hours += duracao
+    work_hours = aggregates.work_hours
+    stop_hours = aggregates.stop_hours
     
     # ═══════════════════════════════════════════════════════════════════════
     # SECÇÃO 1: PROGRESSO POR FASE (Linhas 3-10)
@@ -453,18 +1315,18 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
     ws.merge_cells(f'A{row}:D{row}')
     title = ws[f'A{row}']
     title.value = 'PROGRESSO POR FASE' if language == 'pt' else 'PROGRESS BY PHASE'
-    title.font = Font(name='Arial', size=11, bold=True, color=COLORS['header'])
-    title.alignment = Alignment(horizontal='left', vertical='center')
+    title.font = _font(name='Arial', size=11, bold=True, color=COLORS['header'])
+    title.alignment = _alignment(horizontal='left', vertical='center')
     
     row = 4
     headers = ['Fase', 'Total', 'Concluídos', '%'] if language == 'pt' else ['Phase', 'Total', 'Completed', '%']
     for col, hdr in enumerate(headers, 1):
         cell = ws.cell(row=row, column=col)
         cell.value = hdr
-        cell.font = Font(bold=True, color=COLORS['white'], size=10)
-        cell.fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
+        cell.font = _font(bold=True, color=COLORS['white'], size=10)
+        cell.fill = _fill(COLORS['subheader'])
         cell.border = BORDER_ALL
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.alignment = _alignment(horizontal='center', vertical='center')
     
     # Cores para as fases - MESMA ORDEM que o Excel aplica nos gráficos
     phase_color_palette = [
@@ -482,14 +1344,14 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
         color = phase_color_palette[i % len(phase_color_palette)]
         cell_name = ws.cell(row=row, column=1, value=phase_name)
         cell_name.border = BORDER_ALL
-        cell_name.fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
-        cell_name.font = Font(color=COLORS['white'], bold=True)
+        cell_name.fill = _fill(color)
+        cell_name.font = _font(color=COLORS['white'], bold=True)
         
         ws.cell(row=row, column=2, value=total).border = BORDER_ALL
         ws.cell(row=row, column=3, value=concluded).border = BORDER_ALL
         ws.cell(row=row, column=4, value=f"{pct:.0f}%").border = BORDER_ALL
         for col in range(1, 5):
-            ws.cell(row=row, column=col).alignment = Alignment(horizontal='center', vertical='center')
+            ws.cell(row=row, column=col).alignment = _alignment(horizontal='center', vertical='center')
     
     # Gráfico de barras (sem título)
     chart1 = BarChart()
@@ -517,18 +1379,18 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
     ws.merge_cells(f'A{row}:D{row}')
     title = ws[f'A{row}']
     title.value = 'STATUS DAS TURBINAS' if language == 'pt' else 'TURBINE STATUS'
-    title.font = Font(name='Arial', size=11, bold=True, color=COLORS['header'])
-    title.alignment = Alignment(horizontal='left', vertical='center')
+    title.font = _font(name='Arial', size=11, bold=True, color=COLORS['header'])
+    title.alignment = _alignment(horizontal='left', vertical='center')
     
     row = 21
     status_headers = ['Status', 'Quantidade'] if language == 'pt' else ['Status', 'Count']
     for col, hdr in enumerate(status_headers, 1):
         cell = ws.cell(row=row, column=col)
         cell.value = hdr
-        cell.font = Font(bold=True, color=COLORS['white'], size=10)
-        cell.fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
+        cell.font = _font(bold=True, color=COLORS['white'], size=10)
+        cell.fill = _fill(COLORS['subheader'])
         cell.border = BORDER_ALL
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.alignment = _alignment(horizontal='center', vertical='center')
     
     status_data = [
         ('Finalizadas' if language == 'pt' else 'Completed', completed_turbines),
@@ -548,12 +1410,12 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
         # Aplicar cor à célula do status (mesma cor que aparecerá no gráfico)
         cell_status = ws.cell(row=row, column=1, value=status_name)
         cell_status.border = BORDER_ALL
-        cell_status.fill = PatternFill(start_color=status_colors[i], end_color=status_colors[i], fill_type='solid')
-        cell_status.font = Font(color=COLORS['white'], bold=True)
-        cell_status.alignment = Alignment(horizontal='center', vertical='center')
+        cell_status.fill = _fill(status_colors[i])
+        cell_status.font = _font(color=COLORS['white'], bold=True)
+        cell_status.alignment = _alignment(horizontal='center', vertical='center')
         
         ws.cell(row=row, column=2, value=count).border = BORDER_ALL
-        ws.cell(row=row, column=2).alignment = Alignment(horizontal='center', vertical='center')
+        ws.cell(row=row, column=2).alignment = _alignment(horizontal='center', vertical='center')
     
     # Gráfico de pizza 3D (sem título e sem legenda)
     chart2 = PieChart3D()
@@ -577,18 +1439,18 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
     ws.merge_cells(f'A{row}:D{row}')
     title = ws[f'A{row}']
     title.value = 'TIMELINE DE INSTALAÇÃO' if language == 'pt' else 'INSTALLATION TIMELINE'
-    title.font = Font(name='Arial', size=11, bold=True, color=COLORS['header'])
-    title.alignment = Alignment(horizontal='left', vertical='center')
+    title.font = _font(name='Arial', size=11, bold=True, color=COLORS['header'])
+    title.alignment = _alignment(horizontal='left', vertical='center')
     
     row = 38
-    timeline_headers = ['Período', 'Turbinas'] if language == 'pt' else ['Period', 'Turbines']
+    timeline_headers = ['Período', 'Turbinas', 'Acumulado'] if language == 'pt' else ['Period', 'Turbines', 'Cumulative']
     for col, hdr in enumerate(timeline_headers, 1):
         cell = ws.cell(row=row, column=col)
         cell.value = hdr
-        cell.font = Font(bold=True, color=COLORS['white'], size=10)
-        cell.fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
+        cell.font = _font(bold=True, color=COLORS['white'], size=10)
+        cell.fill = _fill(COLORS['subheader'])
         cell.border = BORDER_ALL
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.alignment = _alignment(horizontal='center', vertical='center')
     
     timeline_start = 39
     # Cores para timeline - MESMA ORDEM que o Excel aplica no gráfico de linha
@@ -601,18 +1463,20 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
         COLORS['excel_orange']     # Semana 6 - Laranja
     ]
     
-    for i, (period, count) in enumerate(timeline_rows):
+    for i, (period, count, cumulative) in enumerate(timeline_rows):
         row = timeline_start + i
         # Aplicar cor à célula do período (mesma cor que aparecerá no gráfico)
         color = timeline_color_palette[i % len(timeline_color_palette)]
         cell_period = ws.cell(row=row, column=1, value=period)
         cell_period.border = BORDER_ALL
-        cell_period.fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
-        cell_period.font = Font(color=COLORS['white'], bold=True)
-        cell_period.alignment = Alignment(horizontal='center', vertical='center')
+        cell_period.fill = _fill(color)
+        cell_period.font = _font(color=COLORS['white'], bold=True)
+        cell_period.alignment = _alignment(horizontal='center', vertical='center')
         
         ws.cell(row=row, column=2, value=count).border = BORDER_ALL
-        ws.cell(row=row, column=2).alignment = Alignment(horizontal='center', vertical='center')
+        ws.cell(row=row, column=2).alignment = _alignment(horizontal='center', vertical='center')
+        ws.cell(row=row, column=3, value=cumulative).border = BORDER_ALL
+        ws.cell(row=row, column=3).alignment = _alignment(horizontal='center', vertical='center')
     
     timeline_end = timeline_start + len(timeline_rows) - 1
     
@@ -627,6 +1491,14 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
     cats3 = Reference(ws, min_col=1, min_row=timeline_start, max_row=timeline_end)
     chart3.add_data(data3, titles_from_data=False)
     chart3.set_categories(cats3)
+    
+    # Curva S no eixo secundário
+    s_curve = LineChart()
+    s_curve.add_data(Reference(ws, min_col=3, min_row=timeline_start, max_row=timeline_end), titles_from_data=False)
+    s_curve.y_axis.axId = 200
+    s_curve.y_axis.title = ''
+    s_curve.y_axis.crosses = 'max'
+    chart3 += s_curve
     chart3.height = 7
     chart3.width = 14
     ws.add_chart(chart3, 'F37')
@@ -639,18 +1511,18 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
     ws.merge_cells(f'A{row}:D{row}')
     title = ws[f'A{row}']
     title.value = 'GRUAS - TRABALHO vs PARAGENS' if language == 'pt' else 'CRANES - WORK vs STOPPAGES'
-    title.font = Font(name='Arial', size=11, bold=True, color=COLORS['header'])
-    title.alignment = Alignment(horizontal='left', vertical='center')
+    title.font = _font(name='Arial', size=11, bold=True, color=COLORS['header'])
+    title.alignment = _alignment(horizontal='left', vertical='center')
     
     row = 55
     gruas_headers = ['Tipo', 'Horas'] if language == 'pt' else ['Type', 'Hours']
     for col, hdr in enumerate(gruas_headers, 1):
         cell = ws.cell(row=row, column=col)
         cell.value = hdr
-        cell.font = Font(bold=True, color=COLORS['white'], size=10)
-        cell.fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
+        cell.font = _font(bold=True, color=COLORS['white'], size=10)
+        cell.fill = _fill(COLORS['subheader'])
         cell.border = BORDER_ALL
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.alignment = _alignment(horizontal='center', vertical='center')
     
     gruas_data = [
         ('Trabalho' if language == 'pt' else 'Work', round(work_hours, 2)),
@@ -668,12 +1540,12 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
         # Aplicar cor à célula do tipo (mesma cor que aparecerá no gráfico)
         cell_tipo = ws.cell(row=row, column=1, value=label)
         cell_tipo.border = BORDER_ALL
-        cell_tipo.fill = PatternFill(start_color=gruas_colors[i], end_color=gruas_colors[i], fill_type='solid')
-        cell_tipo.font = Font(color=COLORS['white'], bold=True)
-        cell_tipo.alignment = Alignment(horizontal='center', vertical='center')
+        cell_tipo.fill = _fill(gruas_colors[i])
+        cell_tipo.font = _font(color=COLORS['white'], bold=True)
+        cell_tipo.alignment = _alignment(horizontal='center', vertical='center')
         
         ws.cell(row=row, column=2, value=hours).border = BORDER_ALL
-        ws.cell(row=row, column=2).alignment = Alignment(horizontal='center', vertical='center')
+        ws.cell(row=row, column=2).alignment = _alignment(horizontal='center', vertical='center')
     
     # Gráfico de barras (sem título)
     chart4 = BarChart()
@@ -701,18 +1573,18 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
     ws.merge_cells(f'A{row}:D{row}')
     title = ws[f'A{row}']
     title.value = 'KPIs PRINCIPAIS' if language == 'pt' else 'MAIN KPIs'
-    title.font = Font(name='Arial', size=11, bold=True, color=COLORS['header'])
-    title.alignment = Alignment(horizontal='left', vertical='center')
+    title.font = _font(name='Arial', size=11, bold=True, color=COLORS['header'])
+    title.alignment = _alignment(horizontal='left', vertical='center')
     
     row = 72
     kpi_headers = ['KPI', 'Valor', 'Meta', 'Status'] if language == 'pt' else ['KPI', 'Value', 'Target', 'Status']
     for col, hdr in enumerate(kpi_headers, 1):
         cell = ws.cell(row=row, column=col)
         cell.value = hdr
-        cell.font = Font(bold=True, color=COLORS['white'], size=10)
-        cell.fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
+        cell.font = _font(bold=True, color=COLORS['white'], size=10)
+        cell.fill = _fill(COLORS['subheader'])
         cell.border = BORDER_ALL
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.alignment = _alignment(horizontal='center', vertical='center')
     
     efficiency = (work_hours / (work_hours + stop_hours) * 100) if (work_hours + stop_hours) > 0 else 0
     kpis = [
@@ -734,9 +1606,9 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
         color = kpi_color_palette[i % len(kpi_color_palette)]
         cell_kpi = ws.cell(row=row, column=1, value=kpi_name)
         cell_kpi.border = BORDER_ALL
-        cell_kpi.fill = PatternFill(start_color=color, end_color=color, fill_type='solid')
-        cell_kpi.font = Font(color=COLORS['white'], bold=True)
-        cell_kpi.alignment = Alignment(horizontal='center', vertical='center')
+        cell_kpi.fill = _fill(color)
+        cell_kpi.font = _font(color=COLORS['white'], bold=True)
+        cell_kpi.alignment = _alignment(horizontal='center', vertical='center')
         
         ws.cell(row=row, column=2, value=f"{value:.0f}%").border = BORDER_ALL
         ws.cell(row=row, column=3, value=f"{target}%").border = BORDER_ALL
@@ -744,7 +1616,7 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
         status_cell.value = '✅' if value >= target else '❌'
         status_cell.border = BORDER_ALL
         for col in range(2, 5):
-            ws.cell(row=row, column=col).alignment = Alignment(horizontal='center', vertical='center')
+            ws.cell(row=row, column=col).alignment = _alignment(horizontal='center', vertical='center')
     
     print(f"✓ Dashboard: {completed_turbines}/{total_turbines} turbinas ({completion_rate:.0f}%), {len(timeline_rows)} períodos")
 
@@ -752,8 +1624,11 @@ def _create_dashboard_v3(wb, project_name, data_by_phase, language='pt'):
 # CRIAÇÃO DE ANÁLISE DE DESVIOS
 # ═════════════════════════════════════════════════════════════════
 
-def _add_deviation_analysis_sheet(wb, data_by_phase, language='pt'):
-    """Criar sheet de análise de desvios (Planned vs Actual)"""
+# Turbinas listadas no resumo de desvios (as de maior P90)
+DEVIATION_WORST_TURBINES = 20
+
+def _add_deviation_analysis_sheet(wb, aggregates, language='pt'):
+    """Criar sheet de análise de desvios (Planned vs Actual): percentis por fase e turbina, depois o detalhe"""
     
     ws = wb.create_sheet('Análise de Desvios' if language == 'pt' else 'Deviation Analysis')
     
@@ -765,71 +1640,92 @@ def _add_deviation_analysis_sheet(wb, data_by_phase, language='pt'):
     ws.merge_cells('A1:F1')
     header = ws['A1']
     header.value = '📈 ANÁLISE DE DESVIOS' if language == 'pt' else '📈 DEVIATION ANALYSIS'
-    header.font = Font(name='Arial', size=12, bold=True, color=COLORS['white'])
-    header.fill = PatternFill(start_color=COLORS['header'], end_color=COLORS['header'], fill_type='solid')
-    header.alignment = Alignment(horizontal='center', vertical='center')
+    header.font = _font(name='Arial', size=12, bold=True, color=COLORS['white'])
+    header.fill = _fill(COLORS['header'])
+    header.alignment = _alignment(horizontal='center', vertical='center')
     
-    # Cabeçalhos das colunas
+    # Resumo: P50/P90/P99 e pior desvio por fase (com o total) e nas turbinas mais atrasadas
+    phase_rows = [(translate_phase(phase_key, language), aggregates.deviation_stats_by_phase[phase_key])
+                  for phase_key in dict.fromkeys(dev['phase_key'] for dev in aggregates.deviations)]
+    phase_rows.append(('Total', aggregates.deviation_stats))
+    turbine_rows = heapq.nsmallest(DEVIATION_WORST_TURBINES, aggregates.deviation_stats_by_turbine.items(),
+                                   key=lambda item: (-item[1].percentile(90), -item[1].worst, str(item[0])))
+    
+    row = 3
+    if language == 'pt':
+        sections = [('Desvios por Fase (dias)', 'Fase', phase_rows),
+                    (f'Turbinas com Maior Desvio (top {DEVIATION_WORST_TURBINES}, dias)', 'Turbina', turbine_rows)]
+    else:
+        sections = [('Deviations by Phase (days)', 'Phase', phase_rows),
+                    (f'Most Delayed Turbines (top {DEVIATION_WORST_TURBINES}, days)', 'Turbine', turbine_rows)]
+    for title, label, stats_rows in sections:
+        ws.merge_cells(f'A{row}:F{row}')
+        section_header = ws[f'A{row}']
+        section_header.value = title
+        section_header.font = _font(name='Arial', size=11, bold=True, color=COLORS['white'])
+        section_header.fill = _fill(COLORS['subheader'])
+        section_header.alignment = _alignment(horizontal='center')
+        row += 1
+        
+        stats_headers = [label, 'Registos' if language == 'pt' else 'Records', 'P50', 'P90', 'P99',
+                         'Pior' if language == 'pt' else 'Worst']
+        for col, header_text in enumerate(stats_headers, 1):
+            cell = ws.cell(row=row, column=col)
+            cell.value = header_text
+            cell.font = _font(name='Arial', size=10, bold=True)
+            cell.fill = _fill(COLORS['info'])
+            cell.alignment = _alignment(horizontal='center', vertical='center')
+            cell.border = BORDER_ALL
+        row += 1
+        
+        for name, stats in stats_rows:
+            values = [name, stats.total, stats.percentile(50), stats.percentile(90), stats.percentile(99), stats.worst]
+            for col, value in enumerate(values, 1):
+                cell = ws.cell(row=row, column=col)
+                cell.value = value
+                cell.border = BORDER_ALL
+                if col > 1:
+                    cell.alignment = _alignment(horizontal='center')
+                if col > 2 and value is not None and value > 0:
+                    cell.fill = _fill(COLORS['warning'])
+            row += 1
+        row += 1
+    
+    # Cabeçalhos das colunas do detalhe
+    detail_row = row
     headers = ['Turbina', 'Fase', 'Planeado', 'Real', 'Desvio (dias)', 'Status']
     for col, header_text in enumerate(headers, 1):
-        cell = ws.cell(row=2, column=col)
+        cell = ws.cell(row=detail_row, column=col)
         cell.value = header_text
-        cell.font = Font(name='Arial', size=10, bold=True, color=COLORS['white'])
-        cell.fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.font = _font(name='Arial', size=10, bold=True, color=COLORS['white'])
+        cell.fill = _fill(COLORS['subheader'])
+        cell.alignment = _alignment(horizontal='center', vertical='center')
         cell.border = BORDER_ALL
     
-    # Coletar dados de desvios
-    row = 3
-    deviations = []
-    
-    for phase_key, phase_data in data_by_phase.items():
-        if phase_data and isinstance(phase_data, list):
-            for item in phase_data:
-                turbine_name = item.get('turbina', item.get('numero', ''))
-                planned_date = item.get('dataPlaneada', item.get('dataPrevista', ''))
-                actual_date = item.get('dataReal', item.get('dataAtual', ''))
-                
-                if planned_date and actual_date:
-                    try:
-                        # Converter para datetime (simplificado)
-                        planned = datetime.strptime(str(planned_date)[:10], '%Y-%m-%d') if isinstance(planned_date, str) else planned_date
-                        actual = datetime.strptime(str(actual_date)[:10], '%Y-%m-%d') if isinstance(actual_date, str) else actual_date
-                        
-                        deviation_days = (actual - planned).days
-                        status = 'No plan' if deviation_days == 0 else ('Adiantado' if deviation_days < 0 else 'Atrasado')
-                        
-                        deviations.append({
-                            'turbine': turbine_name,
-                            'phase': translate_phase(phase_key, language),
-                            'planned': planned_date,
-                            'actual': actual_date,
-                            'deviation': deviation_days,
-                            'status': status
-                        })
-                    except:
-                        pass
+    # Desvios pré-calculados
+    row = detail_row + 1
+    deviations = aggregates.deviations
     
     # Escrever dados
     for dev in sorted(deviations, key=lambda x: x['turbine']):
         ws.cell(row=row, column=1).value = dev['turbine']
-        ws.cell(row=row, column=2).value = dev['phase']
+        ws.cell(row=row, column=2).value = translate_phase(dev['phase_key'], language)
         ws.cell(row=row, column=3).value = str(dev['planned'])
         ws.cell(row=row, column=4).value = str(dev['actual'])
         
         deviation_cell = ws.cell(row=row, column=5)
         deviation_cell.value = dev['deviation']
-        deviation_cell.alignment = Alignment(horizontal='center')
+        deviation_cell.alignment = _alignment(horizontal='center')
         
         # Conditional formatting para desvios
         if dev['deviation'] > 0:
-            deviation_cell.fill = PatternFill(start_color=COLORS['warning'], end_color=COLORS['warning'], fill_type='solid')
+            deviation_cell.fill = _fill(COLORS['warning'])
         elif dev['deviation'] < 0:
-            deviation_cell.fill = PatternFill(start_color=COLORS['caution'], end_color=COLORS['caution'], fill_type='solid')
+            deviation_cell.fill = _fill(COLORS['caution'])
         
         status_cell = ws.cell(row=row, column=6)
         status_cell.value = dev['status']
-        status_cell.alignment = Alignment(horizontal='center')
+        status_cell.alignment = _alignment(horizontal='center')
         
         for col in range(1, 7):
             ws.cell(row=row, column=col).border = BORDER_ALL
@@ -837,71 +1733,60 @@ def _add_deviation_analysis_sheet(wb, data_by_phase, language='pt'):
         row += 1
     
     # Auto-filtro
-    if row > 3:
-        ws.auto_filter.ref = f"A2:F{row-1}"
+    if row > detail_row + 1:
+        ws.auto_filter.ref = f"A{detail_row}:F{row-1}"
     
-    # Freeze panes
-    ws.freeze_panes = 'A3'
+    # Freeze panes (até ao cabeçalho do detalhe, abaixo do resumo)
+    ws.freeze_panes = f'A{detail_row + 1}'
     
-    print(f"✓ Deviation analysis sheet created with {len(deviations)} deviations")
+    p90 = aggregates.deviation_stats.percentile(90)
+    print(f"✓ Deviation analysis sheet created with {len(deviations)} deviations (P90 {p90 if p90 is not None else '-'} days)")
 
 # ═════════════════════════════════════════════════════════════════
 # CRIAÇÃO DE ANÁLISE DE GRUAS
 # ═════════════════════════════════════════════════════════════════
 
-def _add_crane_analysis_sheet(wb, gruas_pads_data, gruas_gerais_data, language='pt'):
+def _add_crane_analysis_sheet(wb, aggregates, language='pt'):
     """Criar sheet de análise detalhada de utilização de gruas"""
     
     ws = wb.create_sheet('Gruas - Análise' if language == 'pt' else 'Cranes - Analysis')
     
-    for col in range(1, 10):
+    for col in range(1, 14):
         ws.column_dimensions[get_column_letter(col)].width = 18
     
     # Header
-    ws.merge_cells('A1:I1')
+    ws.merge_cells('A1:M1')
     header = ws['A1']
     header.value = '🏗️ ANÁLISE DE UTILIZAÇÃO DE GRUAS' if language == 'pt' else '🏗️ CRANE UTILIZATION ANALYSIS'
-    header.font = Font(name='Arial', size=12, bold=True, color=COLORS['white'])
-    header.fill = PatternFill(start_color=COLORS['header'], end_color=COLORS['header'], fill_type='solid')
-    header.alignment = Alignment(horizontal='center', vertical='center')
+    header.font = _font(name='Arial', size=12, bold=True, color=COLORS['white'])
+    header.fill = _fill(COLORS['header'])
+    header.alignment = _alignment(horizontal='center', vertical='center')
     
     # Section 1: Resumo de Gruas
     row = 3
-    ws.merge_cells(f'A{row}:I{row}')
+    ws.merge_cells(f'A{row}:M{row}')
     section_header = ws[f'A{row}']
     section_header.value = 'Resumo de Utilização por Grua' if language == 'pt' else 'Crane Utilization Summary'
-    section_header.font = Font(name='Arial', size=11, bold=True, color=COLORS['white'])
-    section_header.fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-    section_header.alignment = Alignment(horizontal='center')
+    section_header.font = _font(name='Arial', size=11, bold=True, color=COLORS['white'])
+    section_header.fill = _fill(COLORS['subheader'])
+    section_header.alignment = _alignment(horizontal='center')
     
     row += 1
     
     # Cabeçalhos
-    headers = ['Grua', 'Trabalho (h)', 'Mobiliz. (h)', 'Paragens (h)', 'Total (h)', 'Eficiência %', 'Status', 'Observações', 'META']
+    headers = ['Grua', 'Trabalho (h)', 'Mobiliz. (h)', 'Paragens (h)', 'Total (h)', 'Eficiência %', 'Status', 'Observações', 'META',
+               'Ocupação Real (h)', 'Sobreposições (h)', 'Inativo (h)', 'Utilização %']
     for col, header_text in enumerate(headers, 1):
         cell = ws.cell(row=row, column=col)
         cell.value = header_text
-        cell.font = Font(name='Arial', size=9, bold=True, color=COLORS['white'])
-        cell.fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.font = _font(name='Arial', size=9, bold=True, color=COLORS['white'])
+        cell.fill = _fill(COLORS['subheader'])
+        cell.alignment = _alignment(horizontal='center', vertical='center')
         cell.border = BORDER_ALL
     
-    # Agregar dados de gruas
-    crane_stats = defaultdict(lambda: {'trabalho': 0, 'mobilizacao': 0, 'paragem': 0})
-    
-    for grua_list in [gruas_pads_data, gruas_gerais_data]:
-        if grua_list:
-            for grua in grua_list:
-                modelo = grua.get('gruaModelo', 'Desconhecida')
-                tipo = grua.get('tipo', '')
-                duracao = parse_duration(grua.get('duracao'))
-                
-                if tipo == 'trabalho':
-                    crane_stats[modelo]['trabalho'] += duracao
-                elif tipo == 'mobilizacao':
-                    crane_stats[modelo]['mobilizacao'] += duracao
-                elif tipo == 'paragem':
-                    crane_stats[modelo]['paragem'] += duracao
+    # Dados de gruas pré-agregados por modelo; utilização a partir dos intervalos reais
+    crane_stats = aggregates.crane_stats
+    crane_utilization = aggregates.crane_utilization
     
     row += 1
     
@@ -923,35 +1808,48 @@ def _add_crane_analysis_sheet(wb, gruas_pads_data, gruas_gerais_data, language='
         
         efic_cell = ws.cell(row=row, column=6)
         efic_cell.value = f"{eficiencia:.1f}%"
-        efic_cell.alignment = Alignment(horizontal='center')
+        efic_cell.alignment = _alignment(horizontal='center')
         
         # Conditional formatting para eficiência
         if eficiencia >= meta_eficiencia:
-            efic_cell.fill = PatternFill(start_color=COLORS['success'], end_color=COLORS['success'], fill_type='solid')
+            efic_cell.fill = _fill(COLORS['success'])
         elif eficiencia >= 70:
-            efic_cell.fill = PatternFill(start_color=COLORS['caution'], end_color=COLORS['caution'], fill_type='solid')
+            efic_cell.fill = _fill(COLORS['caution'])
         else:
-            efic_cell.fill = PatternFill(start_color=COLORS['warning'], end_color=COLORS['warning'], fill_type='solid')
+            efic_cell.fill = _fill(COLORS['warning'])
         
         status_cell = ws.cell(row=row, column=7)
         status_cell.value = '✅' if eficiencia >= meta_eficiencia else ('⚠️' if eficiencia >= 70 else '❌')
-        status_cell.alignment = Alignment(horizontal='center')
+        status_cell.alignment = _alignment(horizontal='center')
         
         ws.cell(row=row, column=8).value = 'OK' if eficiencia >= meta_eficiencia else 'Revisar'
         ws.cell(row=row, column=9).value = f"{meta_eficiencia}%"
         
-        for col in range(1, 10):
+        # Ocupação sem contar sobreposições, horas sobrepostas, inativo entre registos, trabalho / período
+        utilization = crane_utilization.get(crane_name)
+        if utilization is not None:
+            ws.cell(row=row, column=10).value = round(utilization.logged_hours, 2)
+            overlap_cell = ws.cell(row=row, column=11)
+            overlap_cell.value = round(utilization.overlap_hours, 2)
+            if utilization.overlapping_events:
+                overlap_cell.fill = _fill(COLORS['caution'])
+            ws.cell(row=row, column=12).value = round(utilization.idle_hours, 2)
+            util_cell = ws.cell(row=row, column=13)
+            util_cell.value = f"{utilization.utilization:.1f}%"
+            util_cell.alignment = _alignment(horizontal='center')
+        
+        for col in range(1, 14):
             ws.cell(row=row, column=col).border = BORDER_ALL
         
         row += 1
     
     # Section 2: Motivos de Paragem
     row += 2
-    ws.merge_cells(f'A{row}:I{row}')
+    ws.merge_cells(f'A{row}:M{row}')
     section_header = ws[f'A{row}']
     section_header.value = 'Análise de Motivos de Paragem' if language == 'pt' else 'Stoppage Reasons Analysis'
-    section_header.font = Font(name='Arial', size=11, bold=True, color=COLORS['white'])
-    section_header.fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
+    section_header.font = _font(name='Arial', size=11, bold=True, color=COLORS['white'])
+    section_header.fill = _fill(COLORS['subheader'])
     
     row += 1
     
@@ -960,22 +1858,13 @@ def _add_crane_analysis_sheet(wb, gruas_pads_data, gruas_gerais_data, language='
     for col, header_text in enumerate(motivo_headers, 1):
         cell = ws.cell(row=row, column=col)
         cell.value = header_text
-        cell.font = Font(name='Arial', size=9, bold=True, color=COLORS['white'])
-        cell.fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-        cell.alignment = Alignment(horizontal='center')
+        cell.font = _font(name='Arial', size=9, bold=True, color=COLORS['white'])
+        cell.fill = _fill(COLORS['subheader'])
+        cell.alignment = _alignment(horizontal='center')
         cell.border = BORDER_ALL
     
-    # Agregar motivos
-    motivo_stats = defaultdict(lambda: {'count': 0, 'duracao': 0})
-    
-    for grua_list in [gruas_pads_data, gruas_gerais_data]:
-        if grua_list:
-            for grua in grua_list:
-                if grua.get('tipo') == 'paragem':
-                    motivo = grua.get('motivo', 'Não especificado')
-                    duracao = parse_duration(grua.get('duracao'))
-                    motivo_stats[motivo]['count'] += 1
-                    motivo_stats[motivo]['duracao'] += duracao
+    # Motivos de paragem pré-agregados
+    motivo_stats = aggregates.motivo_stats
     
     row += 1
     
@@ -989,7 +1878,7 @@ def _add_crane_analysis_sheet(wb, gruas_pads_data, gruas_gerais_data, language='
         pct_cell = ws.cell(row=row, column=4)
         pct = (stats['duracao'] / total_paragem_time * 100) if total_paragem_time > 0 else 0
         pct_cell.value = f"{pct:.1f}%"
-        pct_cell.alignment = Alignment(horizontal='center')
+        pct_cell.alignment = _alignment(horizontal='center')
         
         for col in range(1, 5):
             ws.cell(row=row, column=col).border = BORDER_ALL
@@ -997,18 +1886,100 @@ def _add_crane_analysis_sheet(wb, gruas_pads_data, gruas_gerais_data, language='
         row += 1
     
     # Auto-filtro na primeira seção
-    ws.auto_filter.ref = f"A4:I{row-len(motivo_stats)-3}"
+    ws.auto_filter.ref = f"A4:M{row-len(motivo_stats)-3}"
     
     # Freeze panes
     ws.freeze_panes = 'A3'
     
     print(f"✓ Crane analysis sheet created")
 
+def _add_crane_concurrency_sheet(wb, aggregates, language='pt'):
+    """Criar sheet de concorrência da frota: horas com k gruas a trabalhar em simultâneo"""
+    
+    ws = wb.create_sheet('Gruas - Concorrência' if language == 'pt' else 'Cranes - Concurrency')
+    fleet = aggregates.fleet
+    
+    for col in range(1, 4):
+        ws.column_dimensions[get_column_letter(col)].width = 28
+    
+    # Header
+    ws.merge_cells('A1:C1')
+    header = ws['A1']
+    header.value = '🏗️ CONCORRÊNCIA DA FROTA DE GRUAS' if language == 'pt' else '🏗️ CRANE FLEET CONCURRENCY'
+    header.font = _font(name='Arial', size=12, bold=True, color=COLORS['white'])
+    header.fill = _fill(COLORS['header'])
+    header.alignment = _alignment(horizontal='center', vertical='center')
+    
+    # Resumo da frota
+    peak_start = _epoch_hours_to_datetime(fleet.peak_start).strftime('%Y-%m-%d %H:%M') if fleet.peak_start is not None else '-'
+    if language == 'pt':
+        summary = [
+            ('Período Analisado (h)', round(fleet.span_hours, 2)),
+            ('Horas com Gruas a Trabalhar', round(fleet.busy_hours, 2)),
+            ('Horas sem Gruas a Trabalhar', round(fleet.idle_hours, 2)),
+            ('Pico de Gruas em Simultâneo', fleet.peak),
+            ('Início do Pico', peak_start),
+        ]
+    else:
+        summary = [
+            ('Analysed Period (h)', round(fleet.span_hours, 2)),
+            ('Hours with Cranes Working', round(fleet.busy_hours, 2)),
+            ('Hours with No Crane Working', round(fleet.idle_hours, 2)),
+            ('Peak Simultaneous Cranes', fleet.peak),
+            ('Peak Start', peak_start),
+        ]
+    row = 3
+    for label, value in summary:
+        label_cell = ws.cell(row=row, column=1)
+        label_cell.value = label
+        label_cell.font = _font(name='Arial', size=10, bold=True)
+        label_cell.fill = _fill(COLORS['info'])
+        label_cell.border = BORDER_ALL
+        value_cell = ws.cell(row=row, column=2)
+        value_cell.value = value
+        value_cell.alignment = _alignment(horizontal='center')
+        value_cell.border = BORDER_ALL
+        row += 1
+    
+    # Distribuição: horas com k gruas em simultâneo
+    row += 1
+    header_row = row
+    headers = (['Gruas em Simultâneo', 'Horas', '% do Período'] if language == 'pt'
+               else ['Simultaneous Cranes', 'Hours', '% of Period'])
+    for col, header_text in enumerate(headers, 1):
+        cell = ws.cell(row=row, column=col)
+        cell.value = header_text
+        cell.font = _font(name='Arial', size=10, bold=True, color=COLORS['white'])
+        cell.fill = _fill(COLORS['subheader'])
+        cell.alignment = _alignment(horizontal='center', vertical='center')
+        cell.border = BORDER_ALL
+    
+    row += 1
+    for level, hours in enumerate(fleet.level_hours):
+        ws.cell(row=row, column=1).value = level
+        ws.cell(row=row, column=2).value = round(hours, 2)
+        pct_cell = ws.cell(row=row, column=3)
+        pct = (hours / fleet.span_hours * 100) if fleet.span_hours > 0 else 0
+        pct_cell.value = f"{pct:.1f}%"
+        if level == fleet.peak and level > 0:
+            for col in range(1, 4):
+                ws.cell(row=row, column=col).fill = _fill(COLORS['caution'])
+        for col in range(1, 4):
+            cell = ws.cell(row=row, column=col)
+            cell.alignment = _alignment(horizontal='center')
+            cell.border = BORDER_ALL
+        row += 1
+    
+    # Freeze panes
+    ws.freeze_panes = f'A{header_row + 1}'
+    
+    print(f"✓ Crane concurrency sheet created (peak {fleet.peak} cranes, {fleet.idle_hours:.1f}h idle)")
+
 # ═════════════════════════════════════════════════════════════════
 # CRIAÇÃO DE OBSERVAÇÕES CRÍTICAS
 # ═════════════════════════════════════════════════════════════════
 
-def _add_critical_observations_sheet(wb, data_by_phase, language='pt'):
+def _add_critical_observations_sheet(wb, aggregates, language='pt'):
     """Criar sheet de observações críticas e problemas"""
     
     ws = wb.create_sheet('Observações Críticas' if language == 'pt' else 'Critical Observations')
@@ -1020,56 +1991,43 @@ def _add_critical_observations_sheet(wb, data_by_phase, language='pt'):
     ws.merge_cells('A1:F1')
     header = ws['A1']
     header.value = '⚠️ OBSERVAÇÕES CRÍTICAS' if language == 'pt' else '⚠️ CRITICAL OBSERVATIONS'
-    header.font = Font(name='Arial', size=12, bold=True, color=COLORS['white'])
-    header.fill = PatternFill(start_color=COLORS['header'], end_color=COLORS['header'], fill_type='solid')
-    header.alignment = Alignment(horizontal='center', vertical='center')
+    header.font = _font(name='Arial', size=12, bold=True, color=COLORS['white'])
+    header.fill = _fill(COLORS['header'])
+    header.alignment = _alignment(horizontal='center', vertical='center')
     
     # Cabeçalhos
     headers = ['Data', 'Turbina', 'Fase', 'Categoria', 'Descrição', 'Status']
     for col, header_text in enumerate(headers, 1):
         cell = ws.cell(row=2, column=col)
         cell.value = header_text
-        cell.font = Font(name='Arial', size=10, bold=True, color=COLORS['white'])
-        cell.fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-        cell.alignment = Alignment(horizontal='center', vertical='center')
+        cell.font = _font(name='Arial', size=10, bold=True, color=COLORS['white'])
+        cell.fill = _fill(COLORS['subheader'])
+        cell.alignment = _alignment(horizontal='center', vertical='center')
         cell.border = BORDER_ALL
     
-    # Coletar observações
-    observations = []
-    
-    for phase_key, phase_data in data_by_phase.items():
-        if phase_data and isinstance(phase_data, list):
-            for item in phase_data:
-                obs = item.get('observacoes', '')
-                if obs:
-                    observations.append({
-                        'data': item.get('data', datetime.now().strftime('%Y-%m-%d')),
-                        'turbine': item.get('turbina', item.get('numero', '')),
-                        'phase': translate_phase(phase_key, language),
-                        'category': '⚠️ Crítico' if 'crítico' in str(obs).lower() else ('🔴 Problema' if 'problema' in str(obs).lower() else ('🟡 Atenção' if 'atenção' in str(obs).lower() else 'ℹ️ Info')),
-                        'description': obs,
-                        'status': 'Aberto' if 'aberto' in str(obs).lower() else 'Resolvido'
-                    })
+    # Observações pré-classificadas; as que não têm data ficam com a de hoje
+    observations = aggregates.observations
+    today = datetime.now().strftime('%Y-%m-%d')
     
     # Escrever dados
     row = 3
-    for obs in sorted(observations, key=lambda x: x['data'], reverse=True):
-        ws.cell(row=row, column=1).value = obs['data']
+    for obs in sorted(observations, key=lambda x: today if x['data'] is None else x['data'], reverse=True):
+        ws.cell(row=row, column=1).value = today if obs['data'] is None else obs['data']
         ws.cell(row=row, column=2).value = obs['turbine']
-        ws.cell(row=row, column=3).value = obs['phase']
+        ws.cell(row=row, column=3).value = translate_phase(obs['phase_key'], language)
         ws.cell(row=row, column=4).value = obs['category']
         ws.cell(row=row, column=5).value = obs['description']
         
         status_cell = ws.cell(row=row, column=6)
         status_cell.value = obs['status']
-        status_cell.alignment = Alignment(horizontal='center')
+        status_cell.alignment = _alignment(horizontal='center')
         
         # Colorir conforme status
         if 'Crítico' in obs['category']:
             for col in range(1, 7):
-                ws.cell(row=row, column=col).fill = PatternFill(start_color=COLORS['warning'], end_color=COLORS['warning'], fill_type='solid')
+                ws.cell(row=row, column=col).fill = _fill(COLORS['warning'])
         elif 'Problema' in obs['category']:
-            ws.cell(row=row, column=4).fill = PatternFill(start_color=COLORS['caution'], end_color=COLORS['caution'], fill_type='solid')
+            ws.cell(row=row, column=4).fill = _fill(COLORS['caution'])
         
         for col in range(1, 7):
             ws.cell(row=row, column=col).border = BORDER_ALL
@@ -1086,502 +2044,2221 @@ def _add_critical_observations_sheet(wb, data_by_phase, language='pt'):
     print(f"✓ Critical observations sheet created with {len(observations)} observations")
 
 # ═════════════════════════════════════════════════════════════════
-# FUNÇÕES AUXILIARES PARA FASES
+# CRIAÇÃO DE ACOMPANHAMENTO POR TURBINA
 # ═════════════════════════════════════════════════════════════════
 
-def _add_project_header(ws, project_name, sheet_name, language='pt'):
-    """Adicionar cabeçalho de projeto a uma sheet"""
-    # Insert rows at top
-    ws.insert_rows(1, 3)
-    
-    # Configurar altura das linhas de header
-    ws.row_dimensions[1].height = 24
-    ws.row_dimensions[2].height = 20
-    
-    # Título
-    ws.merge_cells('A1:Z1')
-    title = ws['A1']
-    title.value = project_name
-    title.font = Font(name='Arial', size=12, bold=True, color=COLORS['white'])
-    title.fill = PatternFill(start_color=COLORS['header'], end_color=COLORS['header'], fill_type='solid')
-    title.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    
-    # Nome da sheet
-    ws.merge_cells('A2:Z2')
-    sheet_title = ws['A2']
-    sheet_title.value = sheet_name
-    sheet_title.font = Font(name='Arial', size=11, bold=True, color=COLORS['white'])
-    sheet_title.fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-    sheet_title.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-
-def _add_footer(ws, language='pt'):
-    """Adicionar rodapé a uma sheet"""
-    last_row = ws.max_row + 2
-    ws.merge_cells(f'A{last_row}:Z{last_row}')
-    footer = ws[f'A{last_row}']
-    footer.value = f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"
-    footer.font = Font(name='Arial', size=8, italic=True, color=COLORS['dark_gray'])
-    footer.alignment = Alignment(horizontal='right', vertical='center')
-    footer.fill = PatternFill(start_color=COLORS['light_gray'], end_color=COLORS['light_gray'], fill_type='solid')
-
-def _add_auto_filters(ws, header_row, num_cols):
-    """Adicionar auto-filtros a uma sheet"""
-    start_col = get_column_letter(1)
-    end_col = get_column_letter(num_cols)
-    ws.auto_filter.ref = f"{start_col}{header_row}:{end_col}{ws.max_row}"
-    ws.freeze_panes = f"A{header_row + 1}"
+TURBINE_STATUS_LABELS = {
+    'pt': {'completed': 'Concluída', 'in_progress': 'Em Progresso', 'planned': 'Planeada'},
+    'en': {'completed': 'Completed', 'in_progress': 'In Progress', 'planned': 'Planned'},
+}
 
-# ═════════════════════════════════════════════════════════════════
-# FUNÇÕES PARA ADICIONAR SHEETS DE FASES
-# ═════════════════════════════════════════════════════════════════
+TURBINE_STATUS_COLORS = {'completed': COLORS['success'], 'in_progress': COLORS['caution'], 'planned': COLORS['info']}
 
-def _add_recepcao_sheet(wb, recepcao_data, lang='pt'):
-    """Adicionar sheet de Receção"""
-    ws = wb.create_sheet('Receção' if lang == 'pt' else 'Reception')
-    
-    border = BORDER_ALL
-    header_fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-    header_font = Font(name='Arial', size=10, bold=True, color=COLORS['white'])
+def _add_turbine_drilldown_sheet(wb, aggregates, language='pt'):
+    """Criar sheet com uma linha por turbina: fase atual, status e registos concluídos por fase"""
     
-    # Cabeçalhos
-    headers = ['Turbina', 'Componente', 'VUI', 'Nº Série', 'Item Number', 'Data Descarga', 'Hora Descarga']
-    widths = [15, 20, 18, 18, 18, 15, 15]
+    ws = wb.create_sheet('Turbinas' if language == 'pt' else 'Turbines')
+    index = aggregates.turbines
+    num_cols = 4 + len(PHASE_KEYS)
+    last_col = get_column_letter(num_cols)
     
-    for col, (header_text, width) in enumerate(zip(headers, widths), 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = header_text
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        ws.column_dimensions[get_column_letter(col)].width = width
+    # Configurar larguras
+    ws.column_dimensions['A'].width = 15
+    ws.column_dimensions['B'].width = 24
+    ws.column_dimensions['C'].width = 16
+    for col in range(4, num_cols):
+        ws.column_dimensions[get_column_letter(col)].width = 18
+    ws.column_dimensions[last_col].width = 14
     
-    # Dados
-    for row_idx, item in enumerate(recepcao_data, start=2):
-        ws.cell(row=row_idx, column=1, value=item.get('turbinaId', '')).border = border
-        ws.cell(row=row_idx, column=2, value=item.get('componentId', '')).border = border
-        ws.cell(row=row_idx, column=3, value=item.get('vui', '')).border = border
-        ws.cell(row=row_idx, column=4, value=item.get('serialNumber', '')).border = border
-        ws.cell(row=row_idx, column=5, value=item.get('itemNumber', '')).border = border
-        ws.cell(row=row_idx, column=6, value=item.get('dataDescarga', '')).border = border
-        ws.cell(row=row_idx, column=7, value=item.get('horaDescarga', '')).border = border
-        
-        # Alinhamento
-        for col in range(1, 8):
-            ws.cell(row=row_idx, column=col).alignment = Alignment(horizontal='center', vertical='center')
-    
-    print(f"✓ Reception sheet created with {len(recepcao_data)} items")
-
-def _add_preparacao_sheet(wb, preparacao_data, lang='pt'):
-    """Adicionar sheet de Preparação"""
-    ws = wb.create_sheet('Preparação' if lang == 'pt' else 'Preparation')
+    # Header
+    ws.merge_cells(f'A1:{last_col}1')
+    header = ws['A1']
+    header.value = '🌀 ACOMPANHAMENTO POR TURBINA' if language == 'pt' else '🌀 TURBINE DRILL-DOWN'
+    header.font = _font(name='Arial', size=12, bold=True, color=COLORS['white'])
+    header.fill = _fill(COLORS['header'])
+    header.alignment = _alignment(horizontal='center', vertical='center')
+    
+    # Cabeçalhos das colunas: por fase, registos concluídos / registos
+    if language == 'pt':
+        headers = ['Turbina', 'Fase Atual', 'Status']
+    else:
+        headers = ['Turbine', 'Current Phase', 'Status']
+    headers += [translate_phase(phase_key, language) for phase_key in PHASE_KEYS]
+    headers.append('Última Data' if language == 'pt' else 'Last Date')
+    for col, header_text in enumerate(headers, 1):
+        cell = ws.cell(row=2, column=col)
+        cell.value = header_text
+        cell.font = _font(name='Arial', size=10, bold=True, color=COLORS['white'])
+        cell.fill = _fill(COLORS['subheader'])
+        cell.alignment = _alignment(horizontal='center', vertical='center', wrap_text=True)
+        cell.border = BORDER_ALL
     
-    border = BORDER_ALL
-    header_fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-    header_font = Font(name='Arial', size=10, bold=True, color=COLORS['white'])
+    # Estilos registados uma vez; cada célula recebe só o StyleArray
+    data_style = _named_style(wb, 'data')
+    center_style = _named_style(wb, 'data_center')
+    status_styles = {
+        status: _cell_style(wb, fill=_fill(color), border=BORDER_ALL,
+                            alignment=_alignment(horizontal='center', vertical='center'))
+        for status, color in TURBINE_STATUS_COLORS.items()
+    }
+    status_labels = TURBINE_STATUS_LABELS.get(language, TURBINE_STATUS_LABELS['en'])
+    phase_names = {phase_key: translate_phase(phase_key, language) for phase_key in PHASE_KEYS}
+    
+    # Escrever dados (fase atual e status já resolvidos no índice)
+    row = 3
+    for turbine_id in index.turbines():
+        current_phase, status = index.current[turbine_id]
+        by_phase = index.by_turbine[turbine_id]
+        _apply_style(ws.cell(row=row, column=1, value=turbine_id), data_style)
+        _apply_style(ws.cell(row=row, column=2, value=phase_names[current_phase]), data_style)
+        _apply_style(ws.cell(row=row, column=3, value=status_labels[status]), status_styles[status])
+        last_date = None
+        for col, phase_key in enumerate(PHASE_KEYS, 4):
+            entry = by_phase.get(phase_key)
+            value = None
+            if entry is not None:
+                value = f"{entry.completed}/{len(entry.rows)}"
+                if entry.last_date and (last_date is None or entry.last_date > last_date):
+                    last_date = entry.last_date
+            _apply_style(ws.cell(row=row, column=col, value=value), center_style)
+        _apply_style(ws.cell(row=row, column=num_cols, value=last_date.strftime('%Y-%m-%d') if last_date else None),
+                     center_style)
+        row += 1
     
-    headers = ['Turbina', 'Componente', 'VUI', 'Nº Série', 'Item Number', 'Data Início', 'Hora Início', 'Data Fim', 'Hora Fim']
-    widths = [15, 20, 18, 18, 18, 15, 12, 15, 12]
+    # Auto-filtro
+    if row > 3:
+        ws.auto_filter.ref = f"A2:{last_col}{row-1}"
     
-    for col, (header_text, width) in enumerate(zip(headers, widths), 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = header_text
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        ws.column_dimensions[get_column_letter(col)].width = width
-    
-    for row_idx, item in enumerate(preparacao_data, start=2):
-        ws.cell(row=row_idx, column=1, value=item.get('turbinaId', '')).border = border
-        ws.cell(row=row_idx, column=2, value=item.get('componentId', '')).border = border
-        ws.cell(row=row_idx, column=3, value=item.get('vui', '')).border = border
-        ws.cell(row=row_idx, column=4, value=item.get('serialNumber', '')).border = border
-        ws.cell(row=row_idx, column=5, value=item.get('itemNumber', '')).border = border
-        ws.cell(row=row_idx, column=6, value=item.get('dataInicio', '')).border = border
-        ws.cell(row=row_idx, column=7, value=item.get('horaInicio', '')).border = border
-        ws.cell(row=row_idx, column=8, value=item.get('dataFim', '')).border = border
-        ws.cell(row=row_idx, column=9, value=item.get('horaFim', '')).border = border
-        
-        # Alinhamento
-        for col in range(1, 10):
-            ws.cell(row=row_idx, column=col).alignment = Alignment(horizontal='center', vertical='center')
+    # Freeze panes
+    ws.freeze_panes = 'B3'
     
-    print(f"✓ Preparation sheet created with {len(preparacao_data)} items")
+    print(f"✓ Turbine drill-down sheet created with {len(index)} turbines")
 
-def _add_pre_assemblagem_sheet(wb, pre_data, lang='pt'):
-    """Adicionar sheet de Pré-Assemblagem"""
-    ws = wb.create_sheet('Pré-Assemblagem' if lang == 'pt' else 'Pre-Assembly')
-    
-    border = BORDER_ALL
-    header_fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-    header_font = Font(name='Arial', size=10, bold=True, color=COLORS['white'])
+# ═════════════════════════════════════════════════════════════════
+# DEFINIÇÃO DAS SHEETS DE FASES
+# ═════════════════════════════════════════════════════════════════
+
+# Linhas reservadas no topo de cada sheet de fase: título do projeto (1),
+# nome da sheet (2), linha vazia (3) e cabeçalhos das colunas (4)
+PHASE_HEADER_ROW = 4
+
+_COMPONENT_COLUMNS = [
+    ('Turbina', 'turbinaId', 15),
+    ('Componente', 'componentId', 20),
+    ('VUI', 'vui', 18),
+    ('Nº Série', 'serialNumber', 18),
+    ('Item Number', 'itemNumber', 18),
+    ('Data Início', 'dataInicio', 15),
+    ('Hora Início', 'horaInicio', 12),
+    ('Data Fim', 'dataFim', 15),
+    ('Hora Fim', 'horaFim', 12),
+]
+
+_GRUAS_COLUMNS = [
+    ('Modelo', 'gruaModelo', 14),
+    ('Descrição', 'descricao', 16),
+    ('Tipo', 'tipo', 12, translate_tipo),
+    ('Data Início', 'dataInicio', 14),
+    ('Hora Início', 'horaInicio', 12),
+    ('Data Fim', 'dataFim', 14),
+    ('Hora Fim', 'horaFim', 12),
+    ('Duração (h)', 'duracao', 12),
+    ('Motivo', 'motivo', 14, translate_motivo),
+    ('Origem', 'origem', 14),
+    ('Destino', 'destino', 14),
+    ('Observações', 'observacoes', 20),
+]
+
+# Ordem das sheets de fases no relatório. Cada coluna é (cabeçalho, campo, largura[, tradução]).
+# As sheets de gruas não dependem de selectedPhases: aparecem sempre que há dados.
+PHASE_SHEETS = [
+    {
+        'key': 'recepcao',
+        'title': {'pt': 'Receção', 'en': 'Reception'},
+        'label': 'Reception',
+        'columns': [
+            ('Turbina', 'turbinaId', 15),
+            ('Componente', 'componentId', 20),
+            ('VUI', 'vui', 18),
+            ('Nº Série', 'serialNumber', 18),
+            ('Item Number', 'itemNumber', 18),
+            ('Data Descarga', 'dataDescarga', 15),
+            ('Hora Descarga', 'horaDescarga', 15),
+        ],
+        'header_font_size': 10,
+        'header_align': True,
+        'header_wrap': False,
+        'center_data': True,
+        'requires_selection': True,
+    },
+    {
+        'key': 'preparacao',
+        'title': {'pt': 'Preparação', 'en': 'Preparation'},
+        'label': 'Preparation',
+        'columns': _COMPONENT_COLUMNS,
+        'header_font_size': 10,
+        'header_align': True,
+        'header_wrap': False,
+        'center_data': True,
+        'requires_selection': True,
+    },
+    {
+        'key': 'preAssemblagem',
+        'title': {'pt': 'Pré-Assemblagem', 'en': 'Pre-Assembly'},
+        'label': 'Pre-Assembly',
+        'columns': _COMPONENT_COLUMNS,
+        'header_font_size': 10,
+        'header_align': True,
+        'header_wrap': False,
+        'center_data': True,
+        'requires_selection': True,
+    },
+    {
+        'key': 'assemblagem',
+        'title': {'pt': 'Assemblagem', 'en': 'Assembly'},
+        'label': 'Assembly',
+        'columns': _COMPONENT_COLUMNS,
+        'header_font_size': 10,
+        'header_align': True,
+        'header_wrap': False,
+        'center_data': True,
+        'requires_selection': True,
+    },
+    {
+        'key': 'torqueTensionamento',
+        'title': {'pt': 'Torque & Tensionamento', 'en': 'Torque & Tensioning'},
+        'label': 'Torque',
+        'columns': [
+            ('Número', 'turbina', 12),
+            ('Componente', 'componente', 15),
+            ('Parafusos', 'parafusos', 12),
+            ('Torque (Nm)', 'torque', 15),
+            ('Status', 'status', 12),
+            ('Inspetor', 'inspetor', 15),
+            ('Data', 'data', 12),
+            ('Observações', 'observacoes', 25),
+        ],
+        'header_font_size': 10,
+        'header_align': False,
+        'header_wrap': False,
+        'center_data': False,
+        'requires_selection': True,
+    },
+    {
+        'key': 'fasesFinal',
+        'title': {'pt': 'Fases Finais', 'en': 'Final Phases'},
+        'label': 'Final phases',
+        'columns': _COMPONENT_COLUMNS,
+        'header_font_size': 10,
+        'header_align': True,
+        'header_wrap': False,
+        'center_data': True,
+        'requires_selection': True,
+    },
+    {
+        'key': 'gruasPads',
+        'title': {'pt': 'Gruas - Pads', 'en': 'Gruas - Pads'},
+        'label': 'Gruas - Pads',
+        'columns': _GRUAS_COLUMNS,
+        'header_font_size': 9,
+        'header_align': True,
+        'header_wrap': True,
+        'center_data': False,
+        'requires_selection': False,
+    },
+    {
+        'key': 'gruasGerais',
+        'title': {'pt': 'Gruas - Gerais', 'en': 'Gruas - Gerais'},
+        'label': 'Gruas - Gerais',
+        'columns': _GRUAS_COLUMNS,
+        'header_font_size': 9,
+        'header_align': True,
+        'header_wrap': True,
+        'center_data': False,
+        'requires_selection': False,
+    },
+]
+
+def _phase_cell_values(item, columns, lang):
+    """Extrair os valores de uma linha de fase, pela ordem das colunas"""
+    values = []
+    for column in columns:
+        value = item.get(column[1], '')
+        if len(column) > 3:
+            value = column[3](value, lang)
+        values.append(value)
+    return values
+
+def _phase_rows(items, columns, lang, sheet=None):
+    """
+    Linhas de valores de uma fase; em formato colunar percorre as colunas diretamente.
+    Com sheet, reporta o progresso (e verifica o cancelamento) a cada PROGRESS_CHUNK_ROWS linhas.
+    """
+    if sheet is not None and _ACTIVE_PROGRESS is not None:
+        yield from _with_row_progress(_phase_rows(items, columns, lang), sheet, len(items))
+        return
+    if not isinstance(items, ColumnarPhase):
+        for item in items:
+            yield _phase_cell_values(item, columns, lang)
+        return
+    
+    data = []
+    for column in columns:
+        values = items.column(column[1], '')
+        if len(column) > 3:
+            # Traduzir cada valor distinto uma única vez
+            translate, cache = column[3], {}
+            values = [cache[v] if v in cache else cache.setdefault(v, translate(v, lang)) for v in values]
+        data.append(values)
+    for row in zip(*data):
+        yield list(row)
+
+# ═════════════════════════════════════════════════════════════════
+# FUNÇÕES AUXILIARES PARA FASES
+# ═════════════════════════════════════════════════════════════════
+
+def _add_project_header(ws, project_name, sheet_name, language='pt'):
+    """Adicionar cabeçalho de projeto a uma sheet (linhas 1-2, reservadas antes dos dados)"""
+    wb = ws.parent
     
-    headers = ['Turbina', 'Componente', 'VUI', 'Nº Série', 'Item Number', 'Data Início', 'Hora Início', 'Data Fim', 'Hora Fim']
-    widths = [15, 20, 18, 18, 18, 15, 12, 15, 12]
+    # Configurar altura das linhas de header
+    ws.row_dimensions[1].height = 24
+    ws.row_dimensions[2].height = 20
     
-    for col, (header_text, width) in enumerate(zip(headers, widths), 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = header_text
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        ws.column_dimensions[get_column_letter(col)].width = width
-    
-    for row_idx, item in enumerate(pre_data, start=2):
-        ws.cell(row=row_idx, column=1, value=item.get('turbinaId', '')).border = border
-        ws.cell(row=row_idx, column=2, value=item.get('componentId', '')).border = border
-        ws.cell(row=row_idx, column=3, value=item.get('vui', '')).border = border
-        ws.cell(row=row_idx, column=4, value=item.get('serialNumber', '')).border = border
-        ws.cell(row=row_idx, column=5, value=item.get('itemNumber', '')).border = border
-        ws.cell(row=row_idx, column=6, value=item.get('dataInicio', '')).border = border
-        ws.cell(row=row_idx, column=7, value=item.get('horaInicio', '')).border = border
-        ws.cell(row=row_idx, column=8, value=item.get('dataFim', '')).border = border
-        ws.cell(row=row_idx, column=9, value=item.get('horaFim', '')).border = border
-        
-        # Alinhamento
-        for col in range(1, 10):
-            ws.cell(row=row_idx, column=col).alignment = Alignment(horizontal='center', vertical='center')
+    # Título
+    ws.merge_cells('A1:Z1')
+    _apply_style(ws.cell(row=1, column=1, value=project_name), _named_style(wb, 'project_title'))
     
-    print(f"✓ Pre-Assembly sheet created with {len(pre_data)} items")
+    # Nome da sheet
+    ws.merge_cells('A2:Z2')
+    _apply_style(ws.cell(row=2, column=1, value=sheet_name), _named_style(wb, 'sheet_title'))
 
-def _add_assemblagem_sheet(wb, assemblagem_data, lang='pt'):
-    """Adicionar sheet de Assemblagem"""
-    ws = wb.create_sheet('Assemblagem' if lang == 'pt' else 'Assembly')
+def _add_footer(ws, language='pt', row=None):
+    """Adicionar rodapé a uma sheet (por omissão, duas linhas abaixo da última)"""
+    last_row = row if row is not None else ws.max_row + 2
+    ws.merge_cells(f'A{last_row}:Z{last_row}')
+    footer = ws.cell(row=last_row, column=1, value=f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+    _apply_style(footer, _named_style(ws.parent, 'footer'))
+
+def _add_auto_filters(ws, header_row, num_cols, last_row=None):
+    """Adicionar auto-filtros a uma sheet"""
+    start_col = get_column_letter(1)
+    end_col = get_column_letter(num_cols)
+    if last_row is None:
+        last_row = ws.max_row
+    ws.auto_filter.ref = f"{start_col}{header_row}:{end_col}{last_row}"
+    ws.freeze_panes = f"A{header_row + 1}"
+
+# ═════════════════════════════════════════════════════════════════
+# FUNÇÕES PARA ADICIONAR SHEETS DE FASES
+# ═════════════════════════════════════════════════════════════════
+
+def _phase_header_style(wb, spec):
+    """StyleArray dos cabeçalhos de coluna de uma sheet de fase"""
+    alignment = None
+    if spec['header_align']:
+        alignment = _alignment(horizontal='center', vertical='center', wrap_text=spec['header_wrap'] or None)
+    return _cell_style(
+        wb,
+        font=_font(name='Arial', size=spec['header_font_size'], bold=True, color=COLORS['white']),
+        fill=_fill(COLORS['subheader']),
+        border=BORDER_ALL,
+        alignment=alignment,
+    )
+
+def _add_phase_sheet(wb, spec, items, project_name, lang='pt'):
+    """Adicionar sheet de fase: cabeçalho de projeto, colunas, dados e rodapé numa só passagem"""
+    sheet_name = spec['title'][lang if lang in spec['title'] else 'pt']
+    ws = wb.create_sheet(sheet_name)
+    columns = spec['columns']
     
-    border = BORDER_ALL
-    header_fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-    header_font = Font(name='Arial', size=10, bold=True, color=COLORS['white'])
+    _add_project_header(ws, project_name, sheet_name, lang)
     
-    headers = ['Turbina', 'Componente', 'VUI', 'Nº Série', 'Item Number', 'Data Início', 'Hora Início', 'Data Fim', 'Hora Fim']
-    widths = [15, 20, 18, 18, 18, 15, 12, 15, 12]
+    # Cabeçalhos
+    header_style = _phase_header_style(wb, spec)
+    for col, column in enumerate(columns, 1):
+        _apply_style(ws.cell(row=PHASE_HEADER_ROW, column=col, value=column[0]), header_style)
+        ws.column_dimensions[get_column_letter(col)].width = column[2]
     
-    for col, (header_text, width) in enumerate(zip(headers, widths), 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = header_text
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        ws.column_dimensions[get_column_letter(col)].width = width
-    
-    for row_idx, item in enumerate(assemblagem_data, start=2):
-        ws.cell(row=row_idx, column=1, value=item.get('turbinaId', '')).border = border
-        ws.cell(row=row_idx, column=2, value=item.get('componentId', '')).border = border
-        ws.cell(row=row_idx, column=3, value=item.get('vui', '')).border = border
-        ws.cell(row=row_idx, column=4, value=item.get('serialNumber', '')).border = border
-        ws.cell(row=row_idx, column=5, value=item.get('itemNumber', '')).border = border
-        ws.cell(row=row_idx, column=6, value=item.get('dataInicio', '')).border = border
-        ws.cell(row=row_idx, column=7, value=item.get('horaInicio', '')).border = border
-        ws.cell(row=row_idx, column=8, value=item.get('dataFim', '')).border = border
-        ws.cell(row=row_idx, column=9, value=item.get('horaFim', '')).border = border
-        
-        # Alinhamento
-        for col in range(1, 10):
-            ws.cell(row=row_idx, column=col).alignment = Alignment(horizontal='center', vertical='center')
+    # Dados
+    data_style = _named_style(wb, 'data_center' if spec['center_data'] else 'data')
+    for row_idx, values in enumerate(_phase_rows(items, columns, lang, spec['key']), start=PHASE_HEADER_ROW + 1):
+        for col, value in enumerate(values, 1):
+            ws.cell(row=row_idx, column=col, value=value)._style = copy(data_style)
     
-    print(f"✓ Assembly sheet created with {len(assemblagem_data)} items")
+    last_row = PHASE_HEADER_ROW + len(items)
+    _add_auto_filters(ws, PHASE_HEADER_ROW, len(columns), last_row)
+    _add_footer(ws, lang, last_row + 2)
+    
+    print(f"✓ {spec['label']} sheet created with {len(items)} items")
+    return ws
 
-def _add_torque_sheet(wb, torque_data, lang='pt'):
-    """Adicionar sheet de Torque & Tensioning"""
-    ws = wb.create_sheet('Torque & Tensionamento' if lang == 'pt' else 'Torque & Tensioning')
+def _stream_phase_sheet(wb, spec, items, project_name, lang='pt', index=None):
+    """Escrever sheet de fase num workbook write-only, linha a linha, sem manter células em memória"""
+    sheet_name = spec['title'][lang if lang in spec['title'] else 'pt']
+    ws = wb.create_sheet(sheet_name, index)
+    columns = spec['columns']
+    last_row = PHASE_HEADER_ROW + len(items)
+    footer_row = last_row + 2
+    
+    # Dimensões, painéis, merges e filtros têm de ser definidos antes da primeira linha
+    for col, column in enumerate(columns, 1):
+        ws.column_dimensions[get_column_letter(col)].width = column[2]
+    ws.row_dimensions[1].height = 24
+    ws.row_dimensions[2].height = 20
+    ws.merged_cells.add('A1:Z1')
+    ws.merged_cells.add('A2:Z2')
+    ws.merged_cells.add(f'A{footer_row}:Z{footer_row}')
+    ws.auto_filter.ref = f"A{PHASE_HEADER_ROW}:{get_column_letter(len(columns))}{last_row}"
+    ws.freeze_panes = f"A{PHASE_HEADER_ROW + 1}"
+    
+    def _styled(value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        cell._style = copy(style)
+        return cell
+    
+    # Cabeçalho do projeto
+    ws.append([_styled(project_name, _named_style(wb, 'project_title'))])
+    ws.append([_styled(sheet_name, _named_style(wb, 'sheet_title'))])
+    ws.append([])
     
-    border = BORDER_ALL
-    header_fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-    header_font = Font(name='Arial', size=10, bold=True, color=COLORS['white'])
+    # Cabeçalhos das colunas
+    header_style = _phase_header_style(wb, spec)
+    ws.append([_styled(column[0], header_style) for column in columns])
     
-    headers = ['Número', 'Componente', 'Parafusos', 'Torque (Nm)', 'Status', 'Inspetor', 'Data', 'Observações']
-    widths = [12, 15, 12, 15, 12, 15, 12, 25]
+    # Dados
+    data_style = _named_style(wb, 'data_center' if spec['center_data'] else 'data')
+    for values in _phase_rows(items, columns, lang, spec['key']):
+        ws.append([_styled(value, data_style) for value in values])
     
-    for col, (header_text, width) in enumerate(zip(headers, widths), 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = header_text
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border
-        ws.column_dimensions[get_column_letter(col)].width = width
-    
-    for row_idx, item in enumerate(torque_data, start=2):
-        ws.cell(row=row_idx, column=1, value=item.get('turbina', '')).border = border
-        ws.cell(row=row_idx, column=2, value=item.get('componente', '')).border = border
-        ws.cell(row=row_idx, column=3, value=item.get('parafusos', '')).border = border
-        ws.cell(row=row_idx, column=4, value=item.get('torque', '')).border = border
-        ws.cell(row=row_idx, column=5, value=item.get('status', '')).border = border
-        ws.cell(row=row_idx, column=6, value=item.get('inspetor', '')).border = border
-        ws.cell(row=row_idx, column=7, value=item.get('data', '')).border = border
-        ws.cell(row=row_idx, column=8, value=item.get('observacoes', '')).border = border
-    
-    print(f"✓ Torque sheet created with {len(torque_data)} items")
-
-def _add_fases_finais_sheet(wb, fases_data, lang='pt'):
-    """Adicionar sheet de Fases Finais"""
-    ws = wb.create_sheet('Fases Finais' if lang == 'pt' else 'Final Phases')
-    
-    border = BORDER_ALL
-    header_fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-    header_font = Font(name='Arial', size=10, bold=True, color=COLORS['white'])
-    
-    headers = ['Turbina', 'Componente', 'VUI', 'Nº Série', 'Item Number', 'Data Início', 'Hora Início', 'Data Fim', 'Hora Fim']
-    widths = [15, 20, 18, 18, 18, 15, 12, 15, 12]
-    
-    for col, (header_text, width) in enumerate(zip(headers, widths), 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = header_text
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        ws.column_dimensions[get_column_letter(col)].width = width
-    
-    for row_idx, item in enumerate(fases_data, start=2):
-        ws.cell(row=row_idx, column=1, value=item.get('turbinaId', '')).border = border
-        ws.cell(row=row_idx, column=2, value=item.get('componentId', '')).border = border
-        ws.cell(row=row_idx, column=3, value=item.get('vui', '')).border = border
-        ws.cell(row=row_idx, column=4, value=item.get('serialNumber', '')).border = border
-        ws.cell(row=row_idx, column=5, value=item.get('itemNumber', '')).border = border
-        ws.cell(row=row_idx, column=6, value=item.get('dataInicio', '')).border = border
-        ws.cell(row=row_idx, column=7, value=item.get('horaInicio', '')).border = border
-        ws.cell(row=row_idx, column=8, value=item.get('dataFim', '')).border = border
-        ws.cell(row=row_idx, column=9, value=item.get('horaFim', '')).border = border
-        
-        # Alinhamento
-        for col in range(1, 10):
-            ws.cell(row=row_idx, column=col).alignment = Alignment(horizontal='center', vertical='center')
+    # Rodapé
+    ws.append([])
+    ws.append([_styled(f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", _named_style(wb, 'footer'))])
     
-    print(f"✓ Final phases sheet created with {len(fases_data)} items")
+    print(f"✓ {spec['label']} sheet streamed with {len(items)} items")
+    return ws
+
+def _copy_sheet_to_write_only(src, dst):
+    """Copiar uma sheet já construída em memória (capa, resumo, análises) para uma sheet write-only"""
+    for key, dim in src.column_dimensions.items():
+        if dim.width:
+            dst.column_dimensions[key].width = dim.width
+    for idx, dim in src.row_dimensions.items():
+        if dim.height:
+            dst.row_dimensions[idx].height = dim.height
+    for merged in src.merged_cells.ranges:
+        dst.merged_cells.add(str(merged))
+    if src.auto_filter.ref:
+        dst.auto_filter.ref = src.auto_filter.ref
+    if src.freeze_panes:
+        dst.freeze_panes = src.freeze_panes
+    for chart in src._charts:
+        dst.add_chart(chart)
+
+    # Cada combinação de estilos da origem é registada no workbook de destino uma única vez
+    styles = {}
+    for row in src.iter_rows(min_row=1, max_row=src.max_row):
+        cells = []
+        for cell in row:
+            if cell.value is None and not cell.has_style:
+                cells.append(None)
+                continue
+            out = WriteOnlyCell(dst, value=cell.value)
+            if cell.has_style:
+                key = tuple(cell._style)
+                style = styles.get(key)
+                if style is None:
+                    out.font = copy(cell.font)
+                    out.fill = copy(cell.fill)
+                    out.border = copy(cell.border)
+                    out.alignment = copy(cell.alignment)
+                    out.number_format = cell.number_format
+                    styles[key] = copy(out._style)
+                else:
+                    out._style = copy(style)
+            cells.append(out)
+        dst.append(cells)
+
+# ═════════════════════════════════════════════════════════════════
+# INTERNOS DO OPENPYXL (ADAPTADOR)
+# ═════════════════════════════════════════════════════════════════
+
+# O backend 'direct', a cache e os processos escrevem o XML das sheets de fase por fora do
+# openpyxl e precisam de partes internas do openpyxl 3.1 (ids dos estilos na stylesheet, o zip e
+# o manifest do ExcelWriter, o ficheiro temporário de uma sheet write-only). Todos esses acessos passam por estas funções: com uma versão do
+# openpyxl que não os tenha, _check_openpyxl_internals() falha com uma mensagem clara em vez de
+# um AttributeError a meio do relatório (test_report_sheet_xml.py compara o XML com o do openpyxl).
+
+# Sheets cujo XML não é escrito pelo openpyxl: worksheet -> ('direct', write, linhas) ou
+# ('cached', caminho do XML, posição da data do rodapé)
+_SHEET_SOURCES = weakref.WeakKeyDictionary()
+
+@lru_cache(maxsize=None)
+def _check_openpyxl_internals():
+    """Confirmar, uma vez por processo, que o openpyxl instalado tem os internos usados aqui"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    writer = ExcelWriter(wb, zipfile.ZipFile(io.BytesIO(), 'w'))
+    closed = wb.create_sheet()
+    closed.close()
+    sheet_file = getattr(getattr(closed, '_writer', None), 'out', None)
+    if sheet_file is not None:
+        closed._writer.cleanup()
+    missing = [name for name, present in (
+        ('Workbook._cell_styles.add', callable(getattr(getattr(wb, '_cell_styles', None), 'add', None))),
+        ('ExcelWriter._archive', isinstance(getattr(writer, '_archive', None), zipfile.ZipFile)),
+        ('ExcelWriter.manifest', callable(getattr(getattr(writer, 'manifest', None), 'append', None))),
+        ('Worksheet._drawing/_rels', hasattr(ws, '_drawing') and hasattr(ws, '_rels')),
+        ('WriteOnlyWorksheet._writer.out', isinstance(sheet_file, str)),
+    ) if not present]
+    if missing:
+        raise RuntimeError(f"openpyxl {openpyxl.__version__} sem {', '.join(missing)}: o backend 'direct', "
+                           f"a cache de sheets e os processos precisam do openpyxl 3.1")
+
+def _add_cell_style(wb, style):
+    """Índice (cellXfs) de um StyleArray na stylesheet do workbook, registado se ainda não existir"""
+    _check_openpyxl_internals()
+    return wb._cell_styles.add(style)
+
+def _set_sheet_writer(ws, write, rows):
+    """Ao gravar, o XML da sheet é escrito por write(out) em vez de pelo openpyxl"""
+    _SHEET_SOURCES[ws] = ('direct', write, rows)
+
+def _set_cached_sheet(ws, xml_path, footer_offset):
+    """Ao gravar, o XML da sheet é copiado de xml_path, com a data do rodapé em footer_offset"""
+    _SHEET_SOURCES[ws] = ('cached', xml_path, footer_offset)
+
+def _sheet_source(ws):
+    """Origem do XML de uma sheet escrita por fora do openpyxl, ou None"""
+    return _SHEET_SOURCES.get(ws)
+
+@contextlib.contextmanager
+def _write_only_sheet_file(ws):
+    """Caminho do XML de uma sheet write-only já fechada, apagado no fim do bloco"""
+    _check_openpyxl_internals()
+    try:
+        yield ws._writer.out
+    finally:
+        ws._writer.cleanup()
+
+def _open_sheet_part(writer, ws, zip64=False):
+    """Abrir para escrita, no zip do ExcelWriter, a parte XML da sheet"""
+    _check_openpyxl_internals()
+    return writer._archive.open(ws.path[1:], 'w', force_zip64=zip64)
+
+def _register_external_sheet(writer, ws):
+    """Acrescentar ao manifest uma sheet já escrita por fora (sem desenhos nem relações)"""
+    ws._drawing = None
+    ws._rels = RelationshipList()
+    writer.manifest.append(ws)
+
+# ═════════════════════════════════════════════════════════════════
+# ESCRITA DIRETA DO XML DAS SHEETS DE FASES (BACKEND 'direct')
+# ═════════════════════════════════════════════════════════════════
+
+# Mesmo XML que o openpyxl 3.1 escreve em modo write-only para _stream_phase_sheet (strings
+# inline, sem sharedStrings), gerado por concatenação de texto em vez de um Cell por valor.
+_SHEET_XML_HEAD = (
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetPr><outlinePr summaryBelow="1" summaryRight="1" /><pageSetUpPr /></sheetPr>'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="{split}" topLeftCell="A{top}" activePane="bottomLeft" state="frozen" />'
+    '<selection pane="bottomLeft" activeCell="A1" sqref="A1" /></sheetView></sheetViews>'
+    '<sheetFormatPr baseColWidth="8" defaultRowHeight="15" /><cols>{cols}</cols><sheetData>'
+)
+_SHEET_XML_TAIL = (
+    '</sheetData><autoFilter ref="{auto_filter}" /><mergeCells count="3">'
+    '<mergeCell ref="A1:Z1" /><mergeCell ref="A2:Z2" /><mergeCell ref="A{footer}:Z{footer}" /></mergeCells>'
+    '<pageMargins left="0.75" right="0.75" top="1" bottom="1" header="0.5" footer="0.5" /></worksheet>'
+)
+PHASE_SHEET_BACKENDS = ('openpyxl', 'direct')
+_EXCEL_ERROR_CODES = frozenset(ERROR_CODES)
+_DIRECT_BATCH_ROWS = 1000
+
+def _xml_text(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def _direct_cell(value, style_id):
+    """XML de uma célula a seguir a '<c r="..."' (mesmas regras de tipo que openpyxl.Cell)"""
+    if value is None:
+        return f' s="{style_id}" t="n" />'
+    if isinstance(value, bool):
+        return f' s="{style_id}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+            return f' s="{style_id}" t="n"><v /></c>'
+        return f' s="{style_id}" t="n"><v>{"%.16g" % value}</v></c>'
+    if not isinstance(value, str):
+        raise ValueError(f"Cannot convert {value!r} to Excel")
+    value = value[:32767]
+    if ILLEGAL_CHARACTERS_RE.search(value):
+        raise IllegalCharacterError(f"{value} cannot be used in worksheets.")
+    if not value:
+        return f' s="{style_id}" t="inlineStr" />'
+    if len(value) > 1 and value.startswith('='):
+        return f' s="{style_id}"><f>{_xml_text(value[1:])}</f><v /></c>'
+    if value in _EXCEL_ERROR_CODES:
+        return f' s="{style_id}" t="e"><v>{_xml_text(value)}</v></c>'
+    space = ' xml:space="preserve"' if value != value.strip() else ''
+    return f' s="{style_id}" t="inlineStr"><is><t{space}>{_xml_text(value)}</t></is></c>'
+
+def _phase_style_ids(wb, spec):
+    """Índices (cellXfs) dos estilos de uma sheet de fase no workbook"""
+    return {
+        'project_title': _add_cell_style(wb, _named_style(wb, 'project_title')),
+        'sheet_title': _add_cell_style(wb, _named_style(wb, 'sheet_title')),
+        'header': _add_cell_style(wb, _phase_header_style(wb, spec)),
+        'data': _add_cell_style(wb, _named_style(wb, 'data_center' if spec['center_data'] else 'data')),
+        'footer': _add_cell_style(wb, _named_style(wb, 'footer')),
+    }
+
+def _write_phase_sheet_xml(out, spec, items, project_name, lang, style_ids):
+    """
+    Escrever o XML de uma sheet de fase diretamente em out (binário), por blocos de linhas.
+    Devolve os metadados da sheet, incluindo a posição em bytes da data do rodapé.
+    """
+    sheet_name = spec['title'][lang if lang in spec['title'] else 'pt']
+    columns = spec['columns']
+    letters = [get_column_letter(col) for col in range(1, len(columns) + 1)]
+    last_row = PHASE_HEADER_ROW + len(items)
+    footer_row = last_row + 2
+    auto_filter = f"A{PHASE_HEADER_ROW}:{letters[-1]}{last_row}"
+    written = 0
+    
+    def _flush(parts):
+        nonlocal written
+        data = ''.join(parts).encode('utf-8')
+        out.write(data)
+        written += len(data)
+        parts.clear()
+    
+    cols = ''.join(
+        f'<col width="{"%.16g" % column[2]}" customWidth="1" min="{col}" max="{col}" />'
+        for col, column in enumerate(columns, 1)
+    )
+    parts = [
+        _SHEET_XML_HEAD.format(split=PHASE_HEADER_ROW, top=PHASE_HEADER_ROW + 1, cols=cols),
+        f'<row r="1" ht="24" customHeight="1"><c r="A1"{_direct_cell(project_name, style_ids["project_title"])}</row>',
+        f'<row r="2" ht="20" customHeight="1"><c r="A2"{_direct_cell(sheet_name, style_ids["sheet_title"])}</row>',
+        '<row r="3"></row>',
+        f'<row r="{PHASE_HEADER_ROW}">',
+    ]
+    header_id = style_ids['header']
+    for letter, column in zip(letters, columns):
+        parts.append(f'<c r="{letter}{PHASE_HEADER_ROW}"{_direct_cell(column[0], header_id)}')
+    parts.append('</row>')
+    
+    # Dados: o XML de cada texto distinto é gerado uma vez por coluna
+    data_id = style_ids['data']
+    memos = [{} for _ in columns]
+    row_idx = PHASE_HEADER_ROW
+    for values in _phase_rows(items, columns, lang, spec['key']):
+        row_idx += 1
+        row = str(row_idx)
+        parts.append(f'<row r="{row}">')
+        for letter, memo, value in zip(letters, memos, values):
+            if type(value) is str:
+                cell = memo.get(value)
+                if cell is None:
+                    cell = memo[value] = _direct_cell(value, data_id)
+            else:
+                cell = _direct_cell(value, data_id)
+            parts.append(f'<c r="{letter}{row}"{cell}')
+        parts.append('</row>')
+        if row_idx % _DIRECT_BATCH_ROWS == 0:
+            _flush(parts)
+    
+    _flush(parts)
+    
+    # Rodapé (a posição da data fica registada para a cache de sheets)
+    footer_text = f"Gerado em: {datetime.now().strftime(_FOOTER_TIMESTAMP_FORMAT)}"
+    footer_xml = (
+        f'<row r="{last_row + 1}"></row><row r="{footer_row}"><c r="A{footer_row}"'
+        f'{_direct_cell(footer_text, style_ids["footer"])}</row>'
+    ).encode('utf-8')
+    footer_offset = written + footer_xml.index(_FOOTER_PREFIX) + len(_FOOTER_PREFIX)
+    out.write(footer_xml)
+    out.write(_SHEET_XML_TAIL.format(auto_filter=auto_filter, footer=footer_row).encode('utf-8'))
+    
+    print(f"✓ {spec['label']} sheet written with {len(items)} items")
+    return {
+        'title': sheet_name,
+        'rows': len(items),
+        'auto_filter': auto_filter,
+        'footer_offset': footer_offset,
+    }
+
+def _attach_direct_sheet(wb, spec, items, project_name, lang='pt', index=None):
+    """Sheet vazia no workbook; o XML é escrito diretamente no zip ao gravar (_CachedSheetWriter)"""
+    sheet_name = spec['title'][lang if lang in spec['title'] else 'pt']
+    ws = wb.create_sheet(sheet_name, index)
+    ws.auto_filter.ref = f"A{PHASE_HEADER_ROW}:{get_column_letter(len(spec['columns']))}{PHASE_HEADER_ROW + len(items)}"
+    style_ids = _phase_style_ids(wb, spec)
+    _set_sheet_writer(ws, lambda out: _write_phase_sheet_xml(out, spec, items, project_name, lang, style_ids), len(items))
+    return ws
+
+# ═════════════════════════════════════════════════════════════════
+# CACHE DE SHEETS DE FASES (POR HASH DO CONTEÚDO)
+# ═════════════════════════════════════════════════════════════════
+
+# Incrementar quando mudar o conteúdo das sheets de fase ou o significado dos agregados (a forma
+# dos agregados em pickle entra na chave por _aggregates_fingerprint, sem incrementos manuais):
+#   2 registos por turbina e fase; 3 intervalos de gruas; 4 timeline por dia;
+#   5 observações sem data ficam sem data; 6 turbina dos desvios por _turbine_id;
+#   7 classificação das observações (palavras-chave pt/en, sem acentos);
+#   8 conclusão das turbinas ignora fases vazias; 9 DeviationStats guarda os valores ordenados;
+#   10 palavras-chave das observações só como palavras inteiras
+SHEET_CACHE_SCHEMA_VERSION = 10
+SHEET_CACHE_MAX_FILES = 512
+# Ficheiros mais recentes do que isto nunca são apagados por prune(): podem estar a ser escritos,
+# ou já anexados a um workbook de outro processo (--batch) e ainda por copiar ao gravar
+SHEET_CACHE_PRUNE_MIN_AGE_S = 3600
+_FOOTER_PREFIX = 'Gerado em: '.encode('utf-8')
+_FOOTER_TIMESTAMP_FORMAT = '%d/%m/%Y %H:%M:%S'
+
+def _register_phase_styles(wb):
+    """Registar os estilos das sheets de fase por ordem fixa, antes de qualquer outro estilo"""
+    for name in ('project_title', 'sheet_title', 'data', 'data_center', 'footer'):
+        _add_cell_style(wb, _named_style(wb, name))
+    for spec in PHASE_SHEETS:
+        _add_cell_style(wb, _phase_header_style(wb, spec))
+
+@lru_cache(maxsize=None)
+def _phase_styles_fingerprint():
+    """Hash da stylesheet com os estilos de fase registados: o XML em cache só é válido com os mesmos ids"""
+    wb = Workbook(write_only=True)
+    _register_phase_styles(wb)
+    stylesheet = tostring(write_stylesheet(wb))
+    return hashlib.sha256(stylesheet + openpyxl.__version__.encode('ascii')).hexdigest()
+
+def _records_digest(records):
+    """Hash dos registos de uma fase (por linha ou colunar)"""
+    if isinstance(records, ColumnarPhase):
+        records = [records.keys, [records.columns[key] for key in records.keys]]
+    text = json.dumps(records, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+# Registos fixos de uma fase de componentes e de uma fase de gruas, com todos os campos agregados
+_AGGREGATES_SAMPLE = {
+    'recepcao': [
+        {'turbinaId': 'T01', 'status': 'Concluído', 'dataPlaneada': '2024-03-01', 'dataReal': '05/03/2024',
+         'observacoes': 'Problema crítico no flange', 'data': '2024-03-05'},
+        {'turbina': 'T02', 'status': 'in progress', 'dataPrevista': '2024-03-09', 'dataAtual': '2024-03-08',
+         'observacoes': 'Open issue'},
+    ],
+    'gruasPads': [
+        {'turbinaId': 'T01', 'tipo': 'trabalho', 'gruaModelo': 'LR1750', 'dataInicio': '2024-03-05',
+         'horaInicio': '08:00', 'dataFim': '2024-03-05', 'horaFim': '12:30'},
+        {'turbinaId': 'T01', 'tipo': 'paragem', 'motivo': 'vento', 'duracao': '1h 30m',
+         'dataInicio': '2024-03-05', 'horaInicio': '11:00'},
+    ],
+}
+
+@lru_cache(maxsize=None)
+def _aggregates_fingerprint():
+    """
+    Hash do pickle dos agregados de _AGGREGATES_SAMPLE: muda quando PhaseAggregates (ou o que
+    guarda) muda de forma ou de valores, e os pickles antigos da cache deixam de ser encontrados
+    """
+    sample = [PhaseAggregates.from_records(phase_key, records) for phase_key, records in _AGGREGATES_SAMPLE.items()]
+    return hashlib.sha256(pickle.dumps(sample, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+def _cache_key(*parts):
+    return hashlib.sha256(json.dumps([SHEET_CACHE_SCHEMA_VERSION, *parts], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def _copy_bytes(src, dst, count, chunk_size=1 << 20):
+    """Copiar exatamente count bytes de src para dst, por blocos"""
+    while count > 0:
+        chunk = src.read(min(chunk_size, count))
+        if not chunk:
+            break
+        dst.write(chunk)
+        count -= len(chunk)
 
-def _add_gruas_pads_sheet(wb, gruas_data, lang='pt'):
-    """Adicionar sheet de Gruas - Pads"""
-    ws = wb.create_sheet('Gruas - Pads')
+def _render_phase_sheet_xml(spec, items, project_name, lang, xml_path, backend='openpyxl'):
+    """Escrever uma sheet de fase (workbook write-only auxiliar ou backend 'direct') e guardar o XML em xml_path"""
+    scratch = Workbook(write_only=True)
+    _register_phase_styles(scratch)
+    tmp_path = f"{xml_path}.{os.getpid()}.tmp"
+    if backend == 'direct':
+        try:
+            with open(tmp_path, 'wb') as out:
+                meta = _write_phase_sheet_xml(out, spec, items, project_name, lang, _phase_style_ids(scratch, spec))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        os.replace(tmp_path, xml_path)
+        return meta
+    
+    ws = _stream_phase_sheet(scratch, spec, items, project_name, lang)
+    ws.close()
+    
+    with _write_only_sheet_file(ws) as sheet_path:
+        # Posição da data do rodapé, perto do fim do ficheiro
+        size = os.path.getsize(sheet_path)
+        with open(sheet_path, 'rb') as f:
+            tail_start = max(0, size - 65536)
+            f.seek(tail_start)
+            footer_offset = tail_start + f.read().rindex(_FOOTER_PREFIX) + len(_FOOTER_PREFIX)
+        shutil.copyfile(sheet_path, tmp_path)
+    os.replace(tmp_path, xml_path)
+    
+    return {
+        'title': ws.title,
+        'rows': len(items),
+        'auto_filter': ws.auto_filter.ref,
+        'footer_offset': footer_offset,
+    }
+
+def _attach_rendered_sheet(wb, xml_path, meta, index=None):
+    """Sheet vazia no workbook; o conteúdo é copiado de xml_path ao gravar (_CachedSheetWriter)"""
+    ws = wb.create_sheet(meta['title'], index)
+    ws.auto_filter.ref = meta['auto_filter']
+    _set_cached_sheet(ws, xml_path, meta['footer_offset'])
+    return ws
+
+class SheetCache:
+    """
+    Cache em disco das sheets de fase já escritas e dos agregados de cada fase.
     
-    border = BORDER_ALL
-    header_fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-    header_font = Font(name='Arial', size=9, bold=True, color=COLORS['white'])
+    O XML de cada sheet fica guardado por hash dos registos + idioma + projeto + estilos; numa
+    regeneração, só as fases cujos registos mudaram são escritas de novo. A data do rodapé é
+    substituída ao copiar. Os agregados (sem dependência do idioma) ficam em pickle por hash
+    dos registos, para as sheets de resumo não voltarem a percorrer fases inalteradas.
+    """
+
+    def __init__(self, cache_dir, max_files=SHEET_CACHE_MAX_FILES, min_age_s=SHEET_CACHE_PRUNE_MIN_AGE_S):
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self.min_age_s = min_age_s
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        # Os agregados são lidos com pickle: só de uma pasta do próprio utilizador
+        if hasattr(os, 'getuid') and os.stat(cache_dir).st_uid != os.getuid():
+            raise ValueError(f"cacheDir pertence a outro utilizador: {cache_dir}")
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def _write_atomic(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def aggregates(self, phase_key, records, digest):
+        """PhaseAggregates da fase, da cache ou calculados e guardados"""
+        path = self._path(_cache_key('aggregates', phase_key, digest, _aggregates_fingerprint()), '.agg.pickle')
+        try:
+            with open(path, 'rb') as f:
+                agg = pickle.load(f)
+            os.utime(path)
+            return agg
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+        agg = PhaseAggregates.from_records(phase_key, records)
+        self._write_atomic(path, pickle.dumps(agg, protocol=pickle.HIGHEST_PROTOCOL))
+        return agg
+
+    def paths(self, spec, project_name, lang, digest):
+        """Caminhos do XML e dos metadados de uma sheet de fase"""
+        key = _cache_key('sheet', spec['key'], digest, lang, project_name, _phase_styles_fingerprint())
+        return self._path(key, '.xml'), self._path(key, '.json')
+
+    def load(self, xml_path, meta_path):
+        """Metadados de uma sheet em cache, ou None se não existir"""
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            os.utime(xml_path)
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        self.hits += 1
+        print(f"♻️ '{meta['title']}' sheet reused from cache ({meta['rows']} items)")
+        return meta
+
+    def save_meta(self, meta_path, meta):
+        """Registar uma sheet acabada de escrever (o XML já está no caminho de paths())"""
+        self._write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+        self.misses += 1
+
+    def add_phase_sheet(self, wb, spec, items, project_name, lang, digest, index=None, backend='openpyxl'):
+        """Acrescentar a sheet de fase ao workbook, reutilizando o XML em cache quando existe"""
+        xml_path, meta_path = self.paths(spec, project_name, lang, digest)
+        meta = self.load(xml_path, meta_path)
+        if meta is None:
+            meta = _render_phase_sheet_xml(spec, items, project_name, lang, xml_path, backend)
+            self.save_meta(meta_path, meta)
+        return _attach_rendered_sheet(wb, xml_path, meta, index)
+
+    def prune(self):
+        """
+        Apagar as entradas menos usadas quando a cache passa de max_files ficheiros; os .tmp (em
+        escrita) e os ficheiros usados há menos de min_age_s segundos ficam sempre
+        """
+        entries = []
+        kept = 0
+        cutoff = time.time() - self.min_age_s
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if mtime > cutoff:
+                kept += 1
+            else:
+                entries.append((mtime, path))
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) + kept - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+class _CachedSheetWriter(ExcelWriter):
+    """
+    ExcelWriter que não constrói as sheets de fase já escritas: copia o XML das que vêm de
+    SheetCache ou dos processos, e escreve as do backend 'direct' diretamente no zip.
+    """
+
+    def write_worksheet(self, ws):
+        source = _sheet_source(ws)
+        if source is None:
+            return super().write_worksheet(ws)
+        if source[0] == 'direct':
+            _, write, rows = source
+            with _open_sheet_part(self, ws, zip64=rows > 1000000) as dst:
+                write(dst)
+        else:
+            _, xml_path, footer_offset = source
+            size = os.path.getsize(xml_path)
+            timestamp = datetime.now().strftime(_FOOTER_TIMESTAMP_FORMAT).encode('ascii')
+            with open(xml_path, 'rb') as src, _open_sheet_part(self, ws, zip64=size > (1 << 30)) as dst:
+                _copy_bytes(src, dst, footer_offset)
+                dst.write(timestamp)
+                src.seek(len(timestamp), os.SEEK_CUR)
+                shutil.copyfileobj(src, dst, 1 << 20)
+        _register_external_sheet(self, ws)
+
+# ═════════════════════════════════════════════════════════════════
+# ESCRITA PARALELA DAS SHEETS DE FASES (PROCESSOS)
+# ═════════════════════════════════════════════════════════════════
+
+# Abaixo deste total de linhas o arranque dos processos custa mais do que poupa
+PARALLEL_MIN_ROWS = 20000
+
+def _resolve_workers(workers):
+    """Número de processos: None/0/1 = em série, negativo = um por CPU"""
+    if not workers:
+        return 1
+    if workers < 0:
+        return os.cpu_count() or 1
+    return workers
+
+def _render_phase_task(phase_key, items, project_name, lang, xml_path, backend='openpyxl'):
+    """Tarefa de um processo: escrever o XML de uma sheet de fase; devolve (meta, mensagens)"""
+    spec = next(spec for spec in PHASE_SHEETS if spec['key'] == phase_key)
+    # O stdout do processo pode ser o canal do protocolo (--serve): as mensagens voltam ao pai
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        meta = _render_phase_sheet_xml(spec, items, project_name, lang, xml_path, backend)
+    return meta, log.getvalue()
+
+def _add_phase_sheets_parallel(wb, jobs, project_name, lang, workers, scratch_dir, sheet_cache=None, digests=None, backend='openpyxl'):
+    """
+    Escrever as sheets de jobs [(spec, items)] num pool de processos, cada uma para o seu XML, e
+    acrescentá-las ao workbook pela ordem de jobs. Os XML ficam em scratch_dir (ou na cache) até
+    o workbook ser gravado com _CachedSheetWriter. Uma sheet cujo processo falhe é escrita de
+    novo neste processo; só um erro aí interrompe o relatório.
+    """
+    results = [None] * len(jobs)
+    pending = []
+    for position, (spec, items) in enumerate(jobs):
+        meta_path = None
+        if sheet_cache is not None:
+            xml_path, meta_path = sheet_cache.paths(spec, project_name, lang, digests[spec['key']])
+            meta = sheet_cache.load(xml_path, meta_path)
+            if meta is not None:
+                results[position] = (xml_path, meta)
+                continue
+        else:
+            xml_path = os.path.join(scratch_dir, f"sheet{position + 1}.xml")
+        pending.append((position, spec, items, xml_path, meta_path))
+    
+    if pending:
+        print(f"⚙️ A escrever {len(pending)} sheets em {min(workers, len(pending))} processos")
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            futures = {
+                pool.submit(_render_phase_task, spec['key'], items, project_name, lang, xml_path, backend): (position, xml_path, meta_path)
+                for position, spec, items, xml_path, meta_path in pending
+            }
+            for future in as_completed(futures):
+                position, xml_path, meta_path = futures[future]
+                spec, items = jobs[position]
+                try:
+                    try:
+                        meta, log = future.result()
+                    except Exception as e:
+                        # O processo falhou, ou morreu e partiu o pool (BrokenProcessPool): a sheet é
+                        # escrita neste processo, como o batch volta a tentar os pedidos
+                        print(f"⚠️ Processo falhou na sheet '{spec['title']['pt']}' ({type(e).__name__}: {e}); "
+                              f"a escrever neste processo")
+                        meta, log = _render_phase_task(spec['key'], items, project_name, lang, xml_path, backend)
+                    print(log, end='')
+                    # As linhas são escritas nos processos: o progresso (e o cancelamento) é por sheet
+                    _progress('phase', spec['key'], meta['rows'], meta['rows'])
+                except ReportCancelled:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+                if meta_path is not None:
+                    sheet_cache.save_meta(meta_path, meta)
+                results[position] = (xml_path, meta)
+    
+    for xml_path, meta in results:
+        _attach_rendered_sheet(wb, xml_path, meta)
+
+# ═════════════════════════════════════════════════════════════════
+# INSTRUMENTAÇÃO (SPANS DE TEMPO E MEMÓRIA)
+# ═════════════════════════════════════════════════════════════════
+
+class ReportTrace:
+    """
+    Spans com nome à volta de cada etapa do relatório (agregação, cada sheet, gravação): tempo
+    (wall e CPU), linhas escritas e, com memory=True, o pico de memória do tracemalloc durante o
+    span. Os spans podem estar aninhados; to_dict() devolve a árvore e write() grava-a em JSON.
+    Com profile_path, session() corre também o cProfile e grava as estatísticas nesse ficheiro.
+    """
+
+    def __init__(self, memory=True, profile_path=None):
+        self.memory = memory
+        self.profile_path = profile_path
+        self.spans = []
+        self._stack = []
+
+    def _fold_peak(self):
+        # O pico até agora pertence ao span aberto, antes de reset_peak() o apagar
+        if self._stack:
+            parent = self._stack[-1]
+            parent['_peak'] = max(parent.get('_peak', 0), tracemalloc.get_traced_memory()[1])
+
+    @contextlib.contextmanager
+    def span(self, name, rows=None):
+        """Medir o bloco; o dict do span é devolvido para acrescentar campos (ex.: rows)"""
+        record = {'name': name}
+        if rows is not None:
+            record['rows'] = rows
+        memory = self.memory and tracemalloc.is_tracing()
+        if memory:
+            self._fold_peak()
+            tracemalloc.reset_peak()
+        self._stack.append(record)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wallMs'] = round((time.perf_counter() - wall) * 1000, 2)
+            record['cpuMs'] = round((time.process_time() - cpu) * 1000, 2)
+            self._stack.pop()
+            if memory:
+                peak = max(record.pop('_peak', 0), tracemalloc.get_traced_memory()[1])
+                record['peakKiB'] = round(peak / 1024, 1)
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent['_peak'] = max(parent.get('_peak', 0), peak)
+            (self._stack[-1].setdefault('spans', []) if self._stack else self.spans).append(record)
+
+    @contextlib.contextmanager
+    def session(self, name):
+        """Span de topo; liga o tracemalloc (se ainda não estiver ligado) e o cProfile, se pedido"""
+        started_tracing = self.memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        profiler = cProfile.Profile() if self.profile_path else None
+        try:
+            if profiler is not None:
+                profiler.enable()
+            with self.span(name) as record:
+                yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(self.profile_path)
+            if started_tracing:
+                tracemalloc.stop()
+
+    def to_dict(self):
+        return {'spans': self.spans, 'memory': self.memory, 'profile': self.profile_path}
+
+    def write(self, path):
+        """Gravar o trace em JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+def _span(trace, name, rows=None):
+    """trace.span(...) ou, sem trace, um contexto que não mede nada"""
+    if trace is None:
+        return contextlib.nullcontext({})
+    return trace.span(name, rows)
+
+def _session(trace, name):
+    if trace is None:
+        return contextlib.nullcontext({})
+    return trace.session(name)
+
+# ═════════════════════════════════════════════════════════════════
+# PROGRESSO (JSON-LINES) E CANCELAMENTO COOPERATIVO
+# ═════════════════════════════════════════════════════════════════
+
+PROGRESS_CHUNK_ROWS = 1000
+
+class ReportCancelled(Exception):
+    """Geração interrompida por um pedido de cancelamento (sinal ou mensagem de controlo)"""
+
+class ReportProgress:
+    """
+    Canal de progresso de uma geração: cada evento é um dict {'stage', 'sheet', 'rowsDone',
+    'rowsTotal'} passado a emit (ex.: escrito como linha JSON). Antes de cada evento, e entre
+    blocos de PROGRESS_CHUNK_ROWS linhas, verifica cancel_event; se estiver ativo lança
+    ReportCancelled. Fica ativo durante `with progress:` (um de cada vez por processo).
+    """
+
+    def __init__(self, emit=None, cancel_event=None):
+        self.emit = emit
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def check(self):
+        if self.cancel_event.is_set():
+            raise ReportCancelled("Geração cancelada")
+
+    def report(self, stage, sheet=None, rows_done=None, rows_total=None):
+        self.check()
+        if self.emit is not None:
+            self.emit({'stage': stage, 'sheet': sheet, 'rowsDone': rows_done, 'rowsTotal': rows_total})
+
+    def __enter__(self):
+        global _ACTIVE_PROGRESS
+        self._previous, _ACTIVE_PROGRESS = _ACTIVE_PROGRESS, self
+        return self
+
+    def __exit__(self, *exc):
+        global _ACTIVE_PROGRESS
+        _ACTIVE_PROGRESS = self._previous
+        return False
+
+_ACTIVE_PROGRESS = None
+
+def _progress(stage, sheet=None, rows_done=None, rows_total=None):
+    """Reportar uma etapa ao ReportProgress ativo (se houver); lança ReportCancelled se foi cancelado"""
+    if _ACTIVE_PROGRESS is not None:
+        _ACTIVE_PROGRESS.report(stage, sheet, rows_done, rows_total)
+
+def _with_row_progress(rows, sheet, total):
+    """Repassar as linhas, reportando 'phase' no início, a cada PROGRESS_CHUNK_ROWS linhas e no fim"""
+    _progress('phase', sheet, 0, total)
+    done = 0
+    for row in rows:
+        yield row
+        done += 1
+        if done % PROGRESS_CHUNK_ROWS == 0 and done < total:
+            _progress('phase', sheet, done, total)
+    _progress('phase', sheet, done, total)
+
+def _json_lines_emitter(stream, **extra):
+    """emit que escreve cada evento como uma linha JSON em stream (com os campos de extra)"""
+    def emit(event):
+        stream.write(json.dumps({**extra, **event}, ensure_ascii=False) + '\n')
+        stream.flush()
+    return emit
+
+def _install_cancel_signals(progress):
+    """
+    SIGINT/SIGTERM (e SIGBREAK no Windows) pedem o cancelamento em vez de matar o processo;
+    um segundo sinal interrompe de imediato
+    """
+    def _handler(signum, frame):
+        if progress.cancel_event.is_set():
+            raise KeyboardInterrupt
+        progress.cancel()
+    for name in ('SIGINT', 'SIGTERM', 'SIGBREAK'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), _handler)
+
+def _watch_stdin_cancel(progress, stream=None):
+    """
+    Com o payload num ficheiro (--input), o stdin fica livre para comandos: uma linha
+    {"command": "cancel"} (ou só 'cancel') pede o cancelamento. Funciona onde os sinais não chegam
+    ao script (no Windows, terminar o processo não passa pelo handler); o fim do stdin não cancela.
+    """
+    def _reader():
+        for line in stream or sys.stdin:
+            line = line.strip()
+            try:
+                command = json.loads(line)
+            except ValueError:
+                command = line
+            if command == 'cancel' or (isinstance(command, dict) and command.get('command') == 'cancel'):
+                progress.cancel()
+                return
+    threading.Thread(target=_reader, name='stdin-cancel', daemon=True).start()
+
+# ═════════════════════════════════════════════════════════════════
+# ORÇAMENTO DE MEMÓRIA (ESCOLHA AUTOMÁTICA EM MEMÓRIA / STREAMING)
+# ═════════════════════════════════════════════════════════════════
+
+# Memória por célula de um workbook openpyxl em memória (Cell, StyleArray e valor), medida com
+# tracemalloc nas sheets de fase e de resumo (benchmark_report.py suite)
+ESTIMATED_CELL_BYTES = 360
+# Colunas das sheets de desvios e de observações (uma linha por desvio/observação)
+_SUMMARY_DETAIL_COLUMNS = 6
+DEFAULT_MEMORY_BUDGET_MB = 512
+
+def estimate_workbook_bytes(jobs, aggregates, phase_sheets_in_memory=True):
+    """
+    Memória estimada do workbook a partir do número de linhas: as células das sheets de desvios e
+    de observações e, se phase_sheets_in_memory, as das sheets de fase (jobs [(spec, items)]).
+    """
+    cells = 0
+    if aggregates is not None:
+        cells += (len(aggregates.deviations) + len(aggregates.observations)) * _SUMMARY_DETAIL_COLUMNS
+    if phase_sheets_in_memory:
+        cells += sum(len(items) * len(spec['columns']) for spec, items in jobs)
+    return cells * ESTIMATED_CELL_BYTES
+
+def _peak_rss_bytes():
+    """Pico de memória residente do processo desde o arranque (None se não for possível medir)"""
+    try:
+        import resource
+    except ImportError:
+        return _peak_working_set_bytes()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _peak_working_set_bytes():
+    """PeakWorkingSetSize do processo no Windows (GetProcessMemoryInfo)"""
+    try:
+        import ctypes
+        from ctypes import wintypes
+    except ImportError:
+        return None
     
-    headers = ['Modelo', 'Descrição', 'Tipo', 'Data Início', 'Hora Início', 'Data Fim', 'Hora Fim', 'Duração (h)', 'Motivo', 'Origem', 'Destino', 'Observações']
-    widths = [14, 16, 12, 14, 12, 14, 12, 12, 14, 14, 14, 20]
+    class _ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
     
-    for col, (header_text, width) in enumerate(zip(headers, widths), 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = header_text
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        ws.column_dimensions[get_column_letter(col)].width = width
-    
-    for row_idx, item in enumerate(gruas_data, start=2):
-        ws.cell(row=row_idx, column=1, value=item.get('gruaModelo', '')).border = border
-        ws.cell(row=row_idx, column=2, value=item.get('descricao', '')).border = border
-        ws.cell(row=row_idx, column=3, value=translate_tipo(item.get('tipo', ''), lang)).border = border
-        ws.cell(row=row_idx, column=4, value=item.get('dataInicio', '')).border = border
-        ws.cell(row=row_idx, column=5, value=item.get('horaInicio', '')).border = border
-        ws.cell(row=row_idx, column=6, value=item.get('dataFim', '')).border = border
-        ws.cell(row=row_idx, column=7, value=item.get('horaFim', '')).border = border
-        ws.cell(row=row_idx, column=8, value=item.get('duracao', '')).border = border
-        ws.cell(row=row_idx, column=9, value=translate_motivo(item.get('motivo', ''), lang)).border = border
-        ws.cell(row=row_idx, column=10, value=item.get('origem', '')).border = border
-        ws.cell(row=row_idx, column=11, value=item.get('destino', '')).border = border
-        ws.cell(row=row_idx, column=12, value=item.get('observacoes', '')).border = border
-    
-    print(f"✓ Gruas - Pads sheet created with {len(gruas_data)} items")
-
-def _add_gruas_gerais_sheet(wb, gruas_data, lang='pt'):
-    """Adicionar sheet de Gruas - Gerais"""
-    ws = wb.create_sheet('Gruas - Gerais')
-    
-    border = BORDER_ALL
-    header_fill = PatternFill(start_color=COLORS['subheader'], end_color=COLORS['subheader'], fill_type='solid')
-    header_font = Font(name='Arial', size=9, bold=True, color=COLORS['white'])
-    
-    headers = ['Modelo', 'Descrição', 'Tipo', 'Data Início', 'Hora Início', 'Data Fim', 'Hora Fim', 'Duração (h)', 'Motivo', 'Origem', 'Destino', 'Observações']
-    widths = [14, 16, 12, 14, 12, 14, 12, 12, 14, 14, 14, 20]
-    
-    for col, (header_text, width) in enumerate(zip(headers, widths), 1):
-        cell = ws.cell(row=1, column=col)
-        cell.value = header_text
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border
-        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        ws.column_dimensions[get_column_letter(col)].width = width
-    
-    for row_idx, item in enumerate(gruas_data, start=2):
-        ws.cell(row=row_idx, column=1, value=item.get('gruaModelo', '')).border = border
-        ws.cell(row=row_idx, column=2, value=item.get('descricao', '')).border = border
-        ws.cell(row=row_idx, column=3, value=translate_tipo(item.get('tipo', ''), lang)).border = border
-        ws.cell(row=row_idx, column=4, value=item.get('dataInicio', '')).border = border
-        ws.cell(row=row_idx, column=5, value=item.get('horaInicio', '')).border = border
-        ws.cell(row=row_idx, column=6, value=item.get('dataFim', '')).border = border
-        ws.cell(row=row_idx, column=7, value=item.get('horaFim', '')).border = border
-        ws.cell(row=row_idx, column=8, value=item.get('duracao', '')).border = border
-        ws.cell(row=row_idx, column=9, value=translate_motivo(item.get('motivo', ''), lang)).border = border
-        ws.cell(row=row_idx, column=10, value=item.get('origem', '')).border = border
-        ws.cell(row=row_idx, column=11, value=item.get('destino', '')).border = border
-        ws.cell(row=row_idx, column=12, value=item.get('observacoes', '')).border = border
-    
-    print(f"✓ Gruas - Gerais sheet created with {len(gruas_data)} items")
+    try:
+        counters = _ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+    except (AttributeError, OSError):
+        return None
+    return counters.PeakWorkingSetSize
 
 # ═════════════════════════════════════════════════════════════════
 # FUNÇÃO PRINCIPAL
 # ═════════════════════════════════════════════════════════════════
 
-def generate_excel_report(project_name, data_by_phase, selected_phases, output_path, language='pt', complete_report=True):
+def _add_summary_sheets(wb, project_name, aggregates, language, complete_report, trace=None):
+    """Adicionar capa, resumo, dashboard e análises (sheets que precisam de acesso aleatório às células)"""
+    if aggregates is None:
+        return
+    
+    if complete_report:
+        # FASE 1: CAPA E RESUMO EXECUTIVO
+        _progress('summary', 'cover')
+        with _span(trace, 'cover'):
+            _create_cover_sheet(wb, project_name, language)
+        _progress('summary', 'executive_summary')
+        with _span(trace, 'executive_summary'):
+            _create_executive_summary_v2(wb, project_name, aggregates, language)
+        
+        # FASE 2: DASHBOARD COM GRÁFICOS
+        _progress('summary', 'dashboard')
+        with _span(trace, 'dashboard'):
+            _create_dashboard_v3(wb, project_name, aggregates, language)
+    
+    # FASE 3: ANÁLISES AVANÇADAS
+    if aggregates.has_crane_data or complete_report:
+        _progress('summary', 'deviation_analysis', 0, len(aggregates.deviations))
+        with _span(trace, 'deviation_analysis', len(aggregates.deviations)):
+            _add_deviation_analysis_sheet(wb, aggregates, language)
+        _progress('summary', 'crane_analysis')
+        with _span(trace, 'crane_analysis', len(aggregates.crane_stats) + len(aggregates.motivo_stats)):
+            _add_crane_analysis_sheet(wb, aggregates, language)
+        if aggregates.crane_utilization:
+            _progress('summary', 'crane_concurrency')
+            with _span(trace, 'crane_concurrency', sum(crane.events for crane in aggregates.crane_utilization.values())):
+                _add_crane_concurrency_sheet(wb, aggregates, language)
+        _progress('summary', 'critical_observations', 0, len(aggregates.observations))
+        with _span(trace, 'critical_observations', len(aggregates.observations)):
+            _add_critical_observations_sheet(wb, aggregates, language)
+    
+    if complete_report and len(aggregates.turbines):
+        _progress('summary', 'turbine_drilldown', 0, len(aggregates.turbines))
+        with _span(trace, 'turbine_drilldown', len(aggregates.turbines)):
+            _add_turbine_drilldown_sheet(wb, aggregates, language)
+
+def _add_summary_sheets_write_only(wb, project_name, aggregates, language, complete_report, index=None, trace=None):
+    """Construir as sheets de resumo num workbook auxiliar e copiá-las para um workbook write-only"""
+    scratch = Workbook()
+    scratch.remove(scratch.active)
+    _add_summary_sheets(scratch, project_name, aggregates, language, complete_report, trace)
+    with _span(trace, 'copy_summary_sheets'):
+        for offset, src in enumerate(scratch.worksheets):
+            _copy_sheet_to_write_only(src, wb.create_sheet(src.title, None if index is None else index + offset))
+
+def _localized_output_path(output_path, lang):
+    """Caminho do relatório de um idioma: '{lang}' no caminho é substituído, senão acrescenta-se _<lang>"""
+    if output_path is None:
+        return None
+    if '{lang}' in output_path:
+        return output_path.replace('{lang}', lang)
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_{lang}{ext}"
+
+def _project_phase(items, columns):
+    """
+    Projeção dos registos de uma fase nas colunas da sheet (valores ainda por traduzir), em formato
+    colunar; partilhada pelos relatórios de vários idiomas, que só traduzem cada valor distinto.
+    """
+    if isinstance(items, ColumnarPhase):
+        return items
+    fields = list(dict.fromkeys(column[1] for column in columns))
+    return ColumnarPhase(fields, [[item.get(field, '') for item in items] for field in fields])
+
+def generate_excel_report(project_name, data_by_phase, selected_phases, output_path, language='pt', complete_report=True, streaming=None, cache_dir=None, workers=None, backend='openpyxl', compression='default', timings=None, languages=None, trace=None, memory_budget_mb=None):
     """
     Gera relatório Excel com dados de instalação
+    
+    Com streaming=True as sheets de fases e de gruas são escritas linha a linha num workbook
+    write-only (memória constante e tempo linear no número de linhas); as sheets de resumo são
+    construídas em memória e copiadas para o workbook final. Com streaming=None (por omissão) a
+    escolha é automática: streaming se a memória estimada do workbook em memória
+    (estimate_workbook_bytes) passar memory_budget_mb (DEFAULT_MEMORY_BUDGET_MB). O caminho
+    escolhido, a estimativa e o pico de memória medido ficam em timings['memory'].
+    
+    Com cache_dir, as sheets de fase e os agregados de cada fase são guardados em disco (SheetCache)
+    e reutilizados enquanto os registos da fase não mudarem.
+    
+    Com workers > 1 (ou negativo, um por CPU) as sheets de fase são escritas em paralelo, cada uma
+    num processo; com menos de PARALLEL_MIN_ROWS linhas ou uma só sheet, a escrita é em série.
+    
+    backend='direct' escreve o XML das sheets de fase diretamente no zip (sem objetos Cell do
+    openpyxl), com o mesmo conteúdo; capa, resumo, dashboard e análises usam sempre o openpyxl.
+    
+    compression escolhe o nível do zip (COMPRESSION_LEVELS: stored, fast, default, max); o tempo de
+    gravação, a compressão e o tamanho ficam em timings, se for passado um dict.
+    
+    Com languages (ex.: ['pt', 'en']) é gerado um relatório por idioma, em output_path com '{lang}'
+    substituído (ou _<lang> antes da extensão); os agregados e a projeção das linhas de cada fase
+    são calculados uma só vez. Devolve então {idioma: caminho}, e timings tem os tempos por idioma.
+    
+    Com trace (ReportTrace), cada etapa fica registada num span (tempo, CPU, linhas, memória).
+    
+    Com output_path=None o ficheiro não é gravado em disco: o xlsx é devolvido em bytes (ou
+    {idioma: bytes}, com languages).
     """
+    with _session(trace, 'generate_excel_report'):
+        return _generate_excel_report(project_name, data_by_phase, selected_phases, output_path, language,
+                                      complete_report, streaming, cache_dir, workers, backend, compression,
+                                      timings, languages, trace, memory_budget_mb)
+
+def _generate_excel_report(project_name, data_by_phase, selected_phases, output_path, language, complete_report, streaming, cache_dir, workers, backend, compression, timings, languages, trace, memory_budget_mb):
+    if backend not in PHASE_SHEET_BACKENDS:
+        raise ValueError(f"Backend desconhecido: {backend!r} (opções: {', '.join(PHASE_SHEET_BACKENDS)})")
+    _compression_level(compression)
     print(f"\n{'='*60}")
     print(f"🚀 INICIANDO GERAÇÃO DE RELATÓRIO EXCEL - VERSÃO 3")
     print(f"{'='*60}")
     print(f"📁 Projeto: {project_name}")
-    print(f"🌍 Idioma: {language.upper()}")
+    print(f"🌍 Idioma: {', '.join(lang.upper() for lang in languages or [language])}")
     print(f"📊 Fases selecionadas: {len(selected_phases)}")
     print(f"📋 Modo: {'Completo (com capa/resumo/dashboard)' if complete_report else 'Apenas fases'}")
+    print(f"🧱 Backend das sheets de fase: {backend}")
+    
+    # Sheets de fase a escrever, pela ordem de PHASE_SHEETS
+    jobs = []
+    for spec in PHASE_SHEETS:
+        if spec['requires_selection'] and spec['key'] not in selected_phases:
+            continue
+        items = data_by_phase.get(spec['key'], [])
+        if items:
+            if languages and len(languages) > 1:
+                items = _project_phase(items, spec['columns'])
+            jobs.append((spec, items))
+    workers = _resolve_workers(workers)
+    parallel = workers > 1 and len(jobs) > 1 and sum(len(items) for _, items in jobs) >= PARALLEL_MIN_ROWS
+    print(f"⚙️ Processos: {workers if parallel else 1}")
+    
+    sheet_cache = SheetCache(cache_dir) if cache_dir else None
+    digests = {}
+    if sheet_cache is not None:
+        print(f"♻️ Cache de sheets: {cache_dir}")
+        digests = {phase_key: _records_digest(records) for phase_key, records in data_by_phase.items()}
+    
+    # Métricas de todas as sheets de resumo numa única passagem pelos dados
+    aggregates = None
+    if complete_report or any(data_by_phase.get(key) for key in CRANE_PHASE_KEYS):
+        total_rows = sum(len(records) for records in data_by_phase.values() if records)
+        _progress('aggregation', None, 0, total_rows)
+        with _span(trace, 'aggregation', total_rows):
+            if sheet_cache is not None:
+                aggregates = ReportAggregates({
+                    phase_key: sheet_cache.aggregates(phase_key, records, digests[phase_key])
+                    for phase_key, records in data_by_phase.items()
+                })
+            else:
+                aggregates = ReportAggregates.from_data(data_by_phase)
+    
+    # Em memória ou streaming: as sheets de fase só ficam em memória com o backend openpyxl, sem
+    # cache nem processos (nos outros casos são escritas em disco de qualquer forma)
+    budget_mb = memory_budget_mb if memory_budget_mb is not None else DEFAULT_MEMORY_BUDGET_MB
+    phase_sheets_in_memory = backend == 'openpyxl' and sheet_cache is None and not parallel
+    estimated = estimate_workbook_bytes(jobs, aggregates, phase_sheets_in_memory)
+    automatic = streaming is None
+    if automatic:
+        streaming = estimated > budget_mb * 1024 * 1024
+    else:
+        streaming = bool(streaming)
+    if not streaming:
+        print(f"🌊 Streaming: Não (memória estimada {estimated / 1048576:.0f} MiB, orçamento {budget_mb} MiB)")
+    elif phase_sheets_in_memory:
+        estimated = estimate_workbook_bytes(jobs, aggregates, phase_sheets_in_memory=False)
+        print(f"🌊 Streaming: Sim ({'automático' if automatic else 'pedido'}, memória estimada {estimated / 1048576:.0f} MiB)")
+    else:
+        print(f"🌊 Streaming: Sim ({'automático' if automatic else 'pedido'})")
     
-    wb = Workbook()
-    
-    # Remover sheet padrão
-    if 'Sheet' in wb.sheetnames:
-        wb.remove(wb['Sheet'])
+    if not languages:
+        outputs = _render_report(project_name, jobs, aggregates, output_path, language, complete_report, streaming,
+                                 sheet_cache, digests, workers if parallel else 1, backend, compression, timings, trace)
+    else:
+        outputs = {}
+        per_language = {}
+        for lang in languages:
+            print(f"\n🌍 Relatório em {lang.upper()}")
+            per_language[lang] = {}
+            with _span(trace, f'render:{lang}'):
+                outputs[lang] = _render_report(project_name, jobs, aggregates, _localized_output_path(output_path, lang),
+                                               lang, complete_report, streaming, sheet_cache, digests,
+                                               workers if parallel else 1, backend, compression,
+                                               per_language[lang], trace)
+        if timings is not None:
+            timings['saveMs'] = round(sum(t['saveMs'] for t in per_language.values()), 2)
+            timings['compression'] = compression
+            timings['sizeBytes'] = sum(t['sizeBytes'] for t in per_language.values())
+            timings['languages'] = per_language
+    
+    peak = _peak_rss_bytes()
+    if peak is not None:
+        print(f"🧠 Pico de memória do processo: {peak / 1048576:.0f} MiB")
+    if timings is not None:
+        timings['memory'] = {
+            'path': 'streaming' if streaming else 'in-memory',
+            'automatic': automatic,
+            'estimatedMiB': round(estimated / 1048576, 1),
+            'budgetMiB': budget_mb,
+            'peakRssMiB': round(peak / 1048576, 1) if peak is not None else None,
+        }
     
-    if complete_report:
-        # FASE 1: CAPA E RESUMO EXECUTIVO
-        _create_cover_sheet(wb, project_name, language)
-        _create_executive_summary_v2(wb, project_name, data_by_phase, language)
+    if sheet_cache is not None:
+        print(f"♻️ Cache: {sheet_cache.hits} sheets reutilizadas, {sheet_cache.misses} escritas")
+        sheet_cache.prune()
+    return outputs
+
+def _render_report(project_name, jobs, aggregates, output_path, language, complete_report, streaming, sheet_cache, digests, workers, backend, compression, timings, trace=None):
+    """
+    Escrever e gravar o workbook de um idioma a partir das sheets de fase (jobs) e dos agregados já
+    calculados; devolve output_path ou, se for None, o xlsx em bytes
+    """
+    parallel = workers > 1
+    if streaming:
+        wb = Workbook(write_only=True)
+        if sheet_cache is not None or parallel:
+            _register_phase_styles(wb)
+        _add_summary_sheets_write_only(wb, project_name, aggregates, language, complete_report, trace=trace)
+        add_phase_sheet = _stream_phase_sheet
+    else:
+        wb = Workbook()
+        if sheet_cache is not None or parallel:
+            _register_phase_styles(wb)
         
-        # FASE 2: DASHBOARD COM GRÁFICOS
-        _create_dashboard_v3(wb, project_name, data_by_phase, language)
+        # Remover sheet padrão
+        if 'Sheet' in wb.sheetnames:
+            wb.remove(wb['Sheet'])
+        
+        _add_summary_sheets(wb, project_name, aggregates, language, complete_report, trace)
+        add_phase_sheet = _add_phase_sheet
     
-    # FASE 3: ANÁLISES AVANÇADAS
-    gruas_pads_data = data_by_phase.get('gruasPads', [])
-    gruas_gerais_data = data_by_phase.get('gruasGerais', [])
-    
-    if (gruas_pads_data or gruas_gerais_data) or complete_report:
-        _add_deviation_analysis_sheet(wb, data_by_phase, language)
-        _add_crane_analysis_sheet(wb, gruas_pads_data, gruas_gerais_data, language)
-        _add_critical_observations_sheet(wb, data_by_phase, language)
-    
-    # FASE 4: SHEETS DAS FASES
-    current_sheet_idx = 3 if complete_report else 0
-    
-    # Processar Receção
-    if 'recepcao' in selected_phases:
-        recepcao_data = data_by_phase.get('recepcao', [])
-        if recepcao_data:
-            print(f"[OK] Adding 'Receção' sheet with {len(recepcao_data)} items")
-            _add_recepcao_sheet(wb, recepcao_data, language)
-            sheet_name = 'Receção' if language == 'pt' else 'Reception'
-            ws = wb[sheet_name]
-            _add_project_header(ws, project_name, sheet_name, language)
-            _add_auto_filters(ws, 4, 7)  # Linha 1 + 3 linhas inseridas = linha 4
-            _add_footer(ws, language)
-            current_sheet_idx += 1
-    
-    # Processar Preparação
-    if 'preparacao' in selected_phases:
-        preparacao_data = data_by_phase.get('preparacao', [])
-        if preparacao_data:
-            print(f"[OK] Adding 'Preparação' sheet with {len(preparacao_data)} items")
-            _add_preparacao_sheet(wb, preparacao_data, language)
-            sheet_name = 'Preparação' if language == 'pt' else 'Preparation'
-            ws = wb[sheet_name]
-            _add_project_header(ws, project_name, sheet_name, language)
-            _add_auto_filters(ws, 4, 9)  # Linha 1 + 3 linhas inseridas = linha 4
-            _add_footer(ws, language)
-            current_sheet_idx += 1
-    
-    # Processar Pré-Assemblagem
-    if 'preAssemblagem' in selected_phases:
-        pre_assemblagem_data = data_by_phase.get('preAssemblagem', [])
-        if pre_assemblagem_data:
-            print(f"[OK] Adding 'Pré-Assemblagem' sheet with {len(pre_assemblagem_data)} items")
-            _add_pre_assemblagem_sheet(wb, pre_assemblagem_data, language)
-            sheet_name = 'Pré-Assemblagem' if language == 'pt' else 'Pre-Assembly'
-            ws = wb[sheet_name]
-            _add_project_header(ws, project_name, sheet_name, language)
-            _add_auto_filters(ws, 4, 9)  # Linha 1 + 3 linhas inseridas = linha 4
-            _add_footer(ws, language)
-            current_sheet_idx += 1
-    
-    # Processar Assemblagem
-    if 'assemblagem' in selected_phases:
-        assemblagem_data = data_by_phase.get('assemblagem', [])
-        if assemblagem_data:
-            print(f"[OK] Adding 'Assemblagem' sheet with {len(assemblagem_data)} items")
-            _add_assemblagem_sheet(wb, assemblagem_data, language)
-            sheet_name = 'Assemblagem' if language == 'pt' else 'Assembly'
-            ws = wb[sheet_name]
-            _add_project_header(ws, project_name, sheet_name, language)
-            _add_auto_filters(ws, 4, 9)  # Linha 1 + 3 linhas inseridas = linha 4
-            _add_footer(ws, language)
-            current_sheet_idx += 1
-    
-    # Processar Torque & Tensioning
-    if 'torqueTensionamento' in selected_phases:
-        torque_data = data_by_phase.get('torqueTensionamento', [])
-        if torque_data:
-            print(f"[OK] Adding 'Torque' sheet with {len(torque_data)} items")
-            _add_torque_sheet(wb, torque_data, language)
-            sheet_name = 'Torque & Tensionamento' if language == 'pt' else 'Torque & Tensioning'
-            ws = wb[sheet_name]
-            _add_project_header(ws, project_name, sheet_name, language)
-            _add_auto_filters(ws, 4, 8)  # Linha 1 + 3 linhas inseridas = linha 4
-            _add_footer(ws, language)
-            current_sheet_idx += 1
-    
-    # Processar Fases Finais
-    if 'fasesFinal' in selected_phases:
-        fases_data = data_by_phase.get('fasesFinal', [])
-        if fases_data:
-            print(f"[OK] Adding 'Fases Finais' sheet with {len(fases_data)} items")
-            _add_fases_finais_sheet(wb, fases_data, language)
-            sheet_name = 'Fases Finais' if language == 'pt' else 'Final Phases'
-            ws = wb[sheet_name]
-            _add_project_header(ws, project_name, sheet_name, language)
-            _add_auto_filters(ws, 4, 9)  # Linha 1 + 3 linhas inseridas = linha 4
-            _add_footer(ws, language)
-            current_sheet_idx += 1
-    
-    # Processar Gruas Pads
-    if gruas_pads_data:
-        print(f"[OK] Adding 'Gruas - Pads' sheet with {len(gruas_pads_data)} items")
-        _add_gruas_pads_sheet(wb, gruas_pads_data, language)
-        ws = wb['Gruas - Pads']
-        _add_project_header(ws, project_name, 'Gruas - Pads', language)
-        _add_auto_filters(ws, 4, 12)  # Linha 1 + 3 linhas inseridas = linha 4
-        _add_footer(ws, language)
-        current_sheet_idx += 1
-    
-    # Processar Gruas Gerais
-    if gruas_gerais_data:
-        print(f"[OK] Adding 'Gruas - Gerais' sheet with {len(gruas_gerais_data)} items")
-        _add_gruas_gerais_sheet(wb, gruas_gerais_data, language)
-        ws = wb['Gruas - Gerais']
-        _add_project_header(ws, project_name, 'Gruas - Gerais', language)
-        _add_auto_filters(ws, 4, 12)  # Linha 1 + 3 linhas inseridas = linha 4
-        _add_footer(ws, language)
+    # FASE 4: SHEETS DAS FASES E DE GRUAS
+    scratch_dir = tempfile.mkdtemp(prefix='asbuilt_sheets_') if parallel else None
+    try:
+        if parallel:
+            with _span(trace, 'phase_sheets_parallel', sum(len(items) for _, items in jobs)):
+                _add_phase_sheets_parallel(wb, jobs, project_name, language, workers, scratch_dir, sheet_cache, digests, backend)
+        else:
+            for spec, items in jobs:
+                print(f"[OK] Adding '{spec['title']['pt']}' sheet with {len(items)} items")
+                # Com o backend 'direct' as linhas só são escritas ao gravar (span 'save')
+                with _span(trace, f"phase:{spec['key']}", len(items)):
+                    if sheet_cache is not None:
+                        sheet_cache.add_phase_sheet(wb, spec, items, project_name, language, digests[spec['key']], backend=backend)
+                    elif backend == 'direct':
+                        _attach_direct_sheet(wb, spec, items, project_name, language)
+                    else:
+                        add_phase_sheet(wb, spec, items, project_name, language)
+        
+        target = io.BytesIO() if output_path is None else output_path
+        with _span(trace, 'save'):
+            _save_workbook(wb, target, compression, timings)
+    finally:
+        if scratch_dir is not None:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+    return target.getvalue() if output_path is None else output_path
+
+# Níveis de compressão do zip: (método, nível)
+COMPRESSION_LEVELS = {
+    'stored': (zipfile.ZIP_STORED, None),
+    'fast': (zipfile.ZIP_DEFLATED, 1),
+    'default': (zipfile.ZIP_DEFLATED, None),
+    'max': (zipfile.ZIP_DEFLATED, 9),
+}
+
+def _compression_level(compression):
+    """(método, nível) do zip para um nome de COMPRESSION_LEVELS; ValueError se não existir"""
+    try:
+        return COMPRESSION_LEVELS[compression]
+    except (KeyError, TypeError):
+        raise ValueError(f"Compressão desconhecida: {compression!r} (opções: {', '.join(COMPRESSION_LEVELS)})") from None
+
+def _save_workbook(wb, output_path, compression='default', timings=None):
+    """
+    Gravar o workbook final com o nível de compressão pedido (as sheets vindas de SheetCache,
+    dos processos ou do backend 'direct' são copiadas/escritas diretamente no zip).
+    output_path pode ser um caminho ou um ficheiro binário aberto (ex.: io.BytesIO).
+    Se timings for um dict, regista saveMs, compression e sizeBytes.
+    """
+    method, level = _compression_level(compression)
     
     # 📝 SALVAR
     print(f"\n{'─'*60}")
-    print(f"💾 Salvando relatório em: {output_path}")
-    wb.save(output_path)
+    in_file = isinstance(output_path, (str, os.PathLike))
+    print(f"💾 Salvando relatório em: {output_path if in_file else '(memória)'}")
+    _progress('save')
+    started = time.perf_counter()
+    if wb.write_only and not wb.worksheets:
+        wb.create_sheet()
+    wb.properties.modified = datetime.now(timezone.utc).replace(tzinfo=None)
+    try:
+        with zipfile.ZipFile(output_path, 'w', method, allowZip64=True, compresslevel=level) as archive:
+            _CachedSheetWriter(wb, archive).write_data()
+    except BaseException:
+        # Cancelado ou com erro a meio: não deixar um xlsx incompleto
+        if in_file and os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(output_path) if in_file else output_path.tell()
+    print(f"💾 Gravado em {elapsed:.2f} s (compressão: {compression}, {size / 1024:.0f} KiB)")
+    if timings is not None:
+        timings['saveMs'] = round(elapsed * 1000, 2)
+        timings['compression'] = compression
+        timings['sizeBytes'] = size
     print(f"✅ RELATÓRIO GERADO COM SUCESSO!")
     print(f"{'='*60}\n")
+    return output_path
+
+def generate_from_payload(input_data, timings=None, trace=None):
+    """
+    Gerar relatório a partir do payload JSON enviado pela app (report_service.dart).
+    
+    Sem outputPath, devolve o xlsx em bytes (ver generate_excel_report). Com 'inputPath', o
+    payload é lido desse ficheiro (mmap), com os outros campos do pedido por cima.
+    
+    Com 'trace': true, 'tracePath' ou 'profilePath' no payload (ou um ReportTrace em trace), os
+    spans ficam em timings['trace'] e, com tracePath, num ficheiro JSON; profilePath grava o cProfile.
+    Só 'trace'/'tracePath' ligam o tracemalloc: com apenas profilePath, os spans não medem memória.
+    """
+    input_data = _resolve_input_path(input_data)
+    if trace is None and (input_data.get('trace') or input_data.get('tracePath') or input_data.get('profilePath')):
+        trace = ReportTrace(memory=bool(input_data.get('trace') or input_data.get('tracePath')),
+                            profile_path=input_data.get('profilePath'))
+    output_path = generate_excel_report(
+        input_data['projectName'],
+        decode_columnar_payload(input_data),
+        input_data['selectedPhases'],
+        input_data.get('outputPath'),
+        input_data.get('language', 'pt'),
+        input_data.get('completeReport', True),
+        input_data.get('streaming'),
+        input_data.get('cacheDir'),
+        input_data.get('workers'),
+        input_data.get('backend', 'openpyxl'),
+        input_data.get('compression', 'default'),
+        timings,
+        input_data.get('languages'),
+        trace,
+        input_data.get('memoryBudgetMb'),
+    )
+    if trace is not None:
+        if timings is not None:
+            timings['trace'] = trace.to_dict()
+        if input_data.get('tracePath'):
+            trace.write(input_data['tracePath'])
+    return output_path
 
 # ═════════════════════════════════════════════════════════════════
-# PONTO DE ENTRADA
+# LEITURA INCREMENTAL DO PAYLOAD (UMA FASE DE CADA VEZ)
 # ═════════════════════════════════════════════════════════════════
 
-if __name__ == '__main__':
-    input_data = json.loads(sys.stdin.read())
+# Campos que têm de chegar antes de uma fase para que possa ser escrita logo que é lida
+_INCREMENTAL_REQUIRED_FIELDS = ('projectName', 'selectedPhases', 'language')
+
+class _IncrementalPayloadReader:
+    """
+    Ler o objeto JSON do payload por blocos, sem carregar o texto completo.
     
-    project_name = input_data['projectName']
-    data_by_phase = input_data['dataByPhase']
-    selected_phases = input_data['selectedPhases']
-    output_path = input_data['outputPath']
-    language = input_data.get('language', 'pt')
-    complete_report = input_data.get('completeReport', True)
+    events() produz ('field', chave, valor) para cada campo de topo, ('phases', None, None) ao
+    começar dataByPhase e ('phase', fase, valor) para cada um dos seus membros, à medida que são
+    lidos; o buffer guarda no máximo um valor (uma fase) mais um bloco.
+    """
+    CHUNK_SIZE = 1 << 16
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, size):
+        """Descartar o texto já consumido e ler mais um bloco"""
+        chunk = self._stream.read(size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        """Próximo carácter que não seja espaço (None no fim do payload)"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill(self.CHUNK_SIZE):
+                return None
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char is None or char not in chars:
+            raise ValueError(f"Payload JSON inválido: esperado {' ou '.join(repr(c) for c in chars)}, encontrado {char!r}")
+        self._pos += 1
+        return char
+
+    def _value(self):
+        """Descodificar o próximo valor completo, lendo blocos até estar todo no buffer"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # Um número no fim do buffer pode continuar no bloco seguinte
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            # Ler pelo menos tanto quanto já está em espera, para o custo total ficar linear
+            self._fill(max(self.CHUNK_SIZE, len(self._buffer) - self._pos))
+
+    def _keys(self):
+        """Chaves de um objeto; o valor de cada chave tem de ser consumido antes da seguinte"""
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            if not isinstance(key, str):
+                raise ValueError(f"Payload JSON inválido: chave {key!r} não é texto")
+            self._expect(':')
+            yield key
+            if self._expect(',}') == '}':
+                return
+
+    def events(self):
+        for key in self._keys():
+            if key == 'dataByPhase':
+                yield 'phases', None, None
+                for phase_key in self._keys():
+                    yield 'phase', phase_key, self._value()
+            else:
+                yield 'field', key, self._value()
+
+def generate_from_stream(stream, timings=None, trace=None, in_memory=False, require_output_path=False):
+    """
+    Gerar relatório lendo o payload JSON de forma incremental (opção --incremental).
+    
+    Cada fase de dataByPhase é descodificada, agregada e escrita num workbook write-only assim
+    que termina de chegar, e descartada a seguir; as sheets de resumo são construídas no fim a
+    partir dos agregados por fase. Fases que chegam antes de projectName, selectedPhases,
+    language (e strings, no formato colunar) ficam em espera até ao fim do payload. Com cacheDir
+    (antes de dataByPhase), as fases inalteradas vêm de SheetCache; backend (antes de dataByPhase)
+    escolhe como são escritas as sheets de fase. As fases são escritas à medida que chegam, num só
+    processo: workers > 1 é rejeitado. Com trace (ReportTrace), cada fase, as sheets de resumo e a
+    gravação ficam registadas em spans. Sem outputPath, ou com in_memory=True (outputPath
+    ignorado), devolve o xlsx em bytes; com require_output_path=True, a falta de outputPath é
+    um erro (ValueError), antes das sheets de resumo e da gravação.
+    """
+    # XML das sheets do backend 'direct' sem cache, até o workbook ser gravado
+    scratch_dir = tempfile.mkdtemp(prefix='asbuilt_sheets_')
+    wb = Workbook(write_only=True)
+    try:
+        with _session(trace, 'generate_from_stream'):
+            return _generate_from_stream(stream, timings, trace, in_memory, require_output_path, wb, scratch_dir)
+    except BaseException:
+        # Fechar as sheets já abertas: os geradores de linhas não ficam pendurados num ficheiro fechado
+        for ws in wb.worksheets:
+            if not ws.closed:
+                ws.close()
+        raise
+    finally:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+def _generate_from_stream(stream, timings, trace, in_memory, require_output_path, wb, scratch_dir):
+    print(f"\n{'='*60}")
+    print(f"🚀 INICIANDO GERAÇÃO DE RELATÓRIO EXCEL - VERSÃO 3 (leitura incremental)")
+    print(f"{'='*60}")
     
-    generate_excel_report(project_name, data_by_phase, selected_phases, output_path, language, complete_report)
+    _register_phase_styles(wb)
+    sheet_cache = None
+    fields = {'backend': 'openpyxl'}
+    pending = []
+    phase_aggregates = {}
+    rendered = []  # posições em PHASE_SHEETS das sheets de fase já escritas
+    spec_by_key = {spec['key']: (order, spec) for order, spec in enumerate(PHASE_SHEETS)}
+    
+    def _ready(payload):
+        if any(field not in fields for field in _INCREMENTAL_REQUIRED_FIELDS):
+            return False
+        return 'strings' in fields or not isinstance(payload, dict)
+    
+    def _process(phase_key, payload):
+        with _span(trace, f'phase:{phase_key}') as record:
+            _process_phase(phase_key, payload, record)
+    
+    def _process_phase(phase_key, payload, record):
+        if isinstance(payload, dict):
+            payload = ColumnarPhase.decode(payload, fields.get('strings', []))
+        digest = _records_digest(payload) if sheet_cache is not None else None
+        if digest is not None:
+            phase_aggregates[phase_key] = sheet_cache.aggregates(phase_key, payload, digest)
+        else:
+            phase_aggregates[phase_key] = PhaseAggregates.from_records(phase_key, payload)
+        record['rows'] = len(payload) if isinstance(payload, (list, ColumnarPhase)) else 0
+        
+        order, spec = spec_by_key.get(phase_key, (None, None))
+        if spec is None or not payload:
+            return
+        if spec['requires_selection'] and phase_key not in fields['selectedPhases']:
+            return
+        # Manter a ordem de PHASE_SHEETS qualquer que seja a ordem de chegada
+        index = sum(1 for other in rendered if other < order)
+        rendered.append(order)
+        print(f"[OK] Adding '{spec['title']['pt']}' sheet with {len(payload)} items")
+        if digest is not None:
+            sheet_cache.add_phase_sheet(wb, spec, payload, fields['projectName'], fields['language'], digest,
+                                        index=index, backend=fields['backend'])
+        elif fields['backend'] == 'direct':
+            # Escrito já para disco: a fase não fica em memória até à gravação
+            xml_path = os.path.join(scratch_dir, f"sheet{order + 1}.xml")
+            meta = _render_phase_sheet_xml(spec, payload, fields['projectName'], fields['language'], xml_path, 'direct')
+            _attach_rendered_sheet(wb, xml_path, meta, index)
+        else:
+            _stream_phase_sheet(wb, spec, payload, fields['projectName'], fields['language'], index=index)
+    
+    for kind, key, value in _IncrementalPayloadReader(stream).events():
+        if kind == 'phases':
+            continue
+        if kind == 'field':
+            if key == 'backend':
+                value = value or 'openpyxl'
+                if value not in PHASE_SHEET_BACKENDS:
+                    raise ValueError(f"Backend desconhecido: {value!r} (opções: {', '.join(PHASE_SHEET_BACKENDS)})")
+                if rendered and value != fields['backend']:
+                    raise ValueError("backend tem de vir antes de dataByPhase com --incremental")
+                print(f"🧱 Backend das sheets de fase: {value}")
+            elif key == 'compression':
+                _compression_level(value)
+            elif key == 'workers' and value is not None and value > 1:
+                raise ValueError("workers > 1 não é suportado com --incremental (usar o modo normal)")
+            fields[key] = value
+            if key == 'projectName':
+                print(f"📁 Projeto: {value}")
+            elif key == 'cacheDir' and value:
+                sheet_cache = SheetCache(value)
+            elif key == 'languages' and value:
+                raise ValueError("languages não é suportado com --incremental (usar o modo normal)")
+        elif _ready(value):
+            _process(key, value)
+        else:
+            pending.append((key, value))
+    
+    fields.setdefault('language', 'pt')
+    if require_output_path and not in_memory and not fields.get('outputPath'):
+        raise ValueError("outputPath é obrigatório sem --stdout")
+    for phase_key, payload in pending:
+        _process(phase_key, payload)
+    
+    complete_report = fields.get('completeReport', True)
+    aggregates = ReportAggregates(phase_aggregates)
+    if not (complete_report or aggregates.has_crane_data):
+        aggregates = None
+    _add_summary_sheets_write_only(wb, fields['projectName'], aggregates, fields['language'], complete_report, index=0, trace=trace)
+    
+    output_path = None if in_memory else fields.get('outputPath')
+    target = io.BytesIO() if output_path is None else output_path
+    with _span(trace, 'save'):
+        _save_workbook(wb, target, fields.get('compression', 'default'), timings)
+    peak = _peak_rss_bytes()
+    if timings is not None:
+        timings['memory'] = {
+            'path': 'streaming',
+            'automatic': False,
+            'peakRssMiB': round(peak / 1048576, 1) if peak is not None else None,
+        }
+    if sheet_cache is not None:
+        sheet_cache.prune()
+    return target.getvalue() if output_path is None else output_path
+
+# ═════════════════════════════════════════════════════════════════
+# PAYLOAD EM FICHEIRO (MMAP)
+# ═════════════════════════════════════════════════════════════════
+
+@contextlib.contextmanager
+def _mapped_file(path):
+    """Mapear o ficheiro só para leitura (o conteúdo é lido pelo SO por páginas, sem pipe)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"Ficheiro de input vazio: {path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
 
+class _MappedTextReader:
+    """Texto UTF-8 lido por blocos diretamente de um mmap (interface read() de um ficheiro de texto)"""
+
+    def __init__(self, mapped):
+        self._mapped = mapped
+        self._pos = 0
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def read(self, size=-1):
+        # Um bloco só com parte de um caráter multibyte não produz texto: ler o seguinte
+        text = ''
+        while not text and self._pos < len(self._mapped):
+            end = len(self._mapped) if size is None or size < 0 else min(self._pos + size, len(self._mapped))
+            chunk = self._mapped[self._pos:end]
+            self._pos = end
+            text = self._decoder.decode(chunk, final=end >= len(self._mapped))
+        return text
+
+def read_payload_file(path):
+    """
+    Ler um payload JSON de um ficheiro mapeado em memória, por blocos (_IncrementalPayloadReader):
+    além dos objetos descodificados, só o valor em leitura e um bloco de texto ficam em memória
+    """
+    payload = {}
+    with _mapped_file(path) as mapped:
+        for kind, key, value in _IncrementalPayloadReader(_MappedTextReader(mapped)).events():
+            if kind == 'phases':
+                payload['dataByPhase'] = {}
+            elif kind == 'phase':
+                payload['dataByPhase'][key] = value
+            else:
+                payload[key] = value
+    return payload
+
+def _resolve_input_path(input_data):
+    """
+    Pedido com 'inputPath': o payload vem desse ficheiro; os restantes campos do pedido (id,
+    progress, outputPath...) sobrepõem-se aos do ficheiro. Sem inputPath, o pedido é o payload.
+    """
+    if not isinstance(input_data, dict) or not input_data.get('inputPath'):
+        return input_data
+    payload = read_payload_file(input_data['inputPath'])
+    payload.update((key, value) for key, value in input_data.items() if key != 'inputPath')
+    return payload
+
+# ═════════════════════════════════════════════════════════════════
+# MODO RESIDENTE (SERVIDOR JSON-LINES)
+# ═════════════════════════════════════════════════════════════════
+
+@lru_cache(maxsize=None)
+def _stderr_log_stream():
+    """stderr em UTF-8 com flush por linha (as mensagens de progresso têm emojis); um por processo,
+    porque fechar o wrapper fecharia também sys.stderr"""
+    return io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', line_buffering=True)
+
+def _run_request(request, log_stream, started, progress=None):
+    """
+    Gerar o relatório de um pedido já lido; devolve a resposta (ok, cancelled ou erro), sem lançar
+    exceções. Com progress (ReportProgress), reporta o progresso e pode ser cancelado.
+    """
+    request_id = request.get('id') if isinstance(request, dict) else None
+    try:
+        request = _resolve_input_path(request)
+        if not request.get('outputPath'):
+            # As respostas são JSON: o xlsx tem de ir para um ficheiro
+            raise ValueError("outputPath é obrigatório neste modo")
+        parsed = time.perf_counter()
+        timings = {}
+        with contextlib.redirect_stdout(log_stream), progress or contextlib.nullcontext():
+            output_path = generate_from_payload(request, timings)
+        finished = time.perf_counter()
+        return {
+            'id': request_id,
+            'status': 'ok',
+            'outputPath': output_path,
+            'timings': {
+                'parseMs': round((parsed - started) * 1000, 2),
+                'generateMs': round((finished - parsed) * 1000, 2),
+                'totalMs': round((finished - started) * 1000, 2),
+                **timings,
+            },
+        }
+    except ReportCancelled as e:
+        print(f"⛔ {e}", file=log_stream)
+        return {'id': request_id, 'status': 'cancelled'}
+    except Exception as e:
+        traceback.print_exc(file=log_stream)
+        return {'id': request_id, 'status': 'error', 'error': str(e)}
+
+def serve(input_stream=None, output_stream=None, log_stream=None):
+    """
+    Manter o processo ativo e gerar um relatório por cada linha JSON recebida.
+    
+    Cada pedido é o mesmo payload do modo normal, com um 'id' opcional; a resposta é uma linha
+    JSON com id, status, outputPath ({idioma: caminho} se o pedido tiver 'languages') e tempos em
+    ms (mais compressão e tamanho do ficheiro; queueMs é a espera atrás de outros pedidos, fora
+    de parseMs e totalMs). Um pedido pode trazer só {"inputPath": ...} e os
+    campos de controlo (id, progress): o payload é lido do ficheiro. Com 'progress': true, antes da resposta
+    chegam linhas {"id", "status": "progress", "stage", "sheet", "rowsDone", "rowsTotal"}.
+    
+    Mensagens de controlo: {"command": "cancel", "id": ...} cancela esse pedido (o que está a ser
+    gerado pára no próximo bloco de linhas; um pedido em espera é respondido logo) com a resposta
+    {"id", "status": "cancelled"}; {"command": "shutdown"} termina o servidor. O stdin é lido
+    numa thread, para o cancelamento chegar durante a geração. As mensagens de progresso em texto
+    vão para log_stream (stderr), para não misturar com o protocolo em output_stream (stdout).
+    """
+    if input_stream is None:
+        input_stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    if output_stream is None:
+        output_stream = sys.stdout
+    if log_stream is None:
+        log_stream = _stderr_log_stream()
+    
+    def _reply(response):
+        output_stream.write(json.dumps(response, ensure_ascii=False) + '\n')
+        output_stream.flush()
+    
+    requests = Queue()
+    cancelled = set()  # ids de pedidos cancelados antes de começarem
+    lock = threading.Lock()
+    current = {}  # id -> ReportProgress do pedido em geração
+    
+    def _read():
+        for line in input_stream:
+            line = line.strip()
+            if not line:
+                continue
+            read_at = time.perf_counter()
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                requests.put((read_at, read_at, e))
+                continue
+            if isinstance(request, dict) and request.get('command') == 'cancel':
+                with lock:
+                    progress = current.get(request.get('id'))
+                    if progress is not None:
+                        progress.cancel()
+                    else:
+                        cancelled.add(request.get('id'))
+                continue
+            requests.put((read_at, time.perf_counter(), request))
+            if isinstance(request, dict) and request.get('command') == 'shutdown':
+                return
+        requests.put(None)
+    
+    threading.Thread(target=_read, name='serve-stdin', daemon=True).start()
+    _reply({'status': 'ready'})
+    
+    while True:
+        item = requests.get()
+        if item is None:
+            break
+        read_at, parsed_at, request = item
+        # Os tempos do pedido contam a partir de agora (mais a leitura do JSON na thread)
+        dequeued = time.perf_counter()
+        started = dequeued - (parsed_at - read_at)
+        if isinstance(request, Exception):
+            print(f"JSON inválido: {request}", file=log_stream)
+            _reply({'id': None, 'status': 'error', 'error': str(request)})
+            continue
+        request_id = request.get('id') if isinstance(request, dict) else None
+        if isinstance(request, dict) and request.get('command') == 'shutdown':
+            _reply({'id': request_id, 'status': 'bye'})
+            break
+        emit = None
+        if isinstance(request, dict) and request.get('progress'):
+            emit = _json_lines_emitter(output_stream, id=request_id, status='progress')
+        progress = ReportProgress(emit)
+        with lock:
+            if request_id in cancelled:
+                cancelled.discard(request_id)
+                progress.cancel()
+            current[request_id] = progress
+        try:
+            response = _run_request(request, log_stream, started, progress)
+            if 'timings' in response:
+                response['timings']['queueMs'] = round((dequeued - parsed_at) * 1000, 2)
+            _reply(response)
+        finally:
+            with lock:
+                current.pop(request_id, None)
+
+# ═════════════════════════════════════════════════════════════════
+# MODO BATCH (VÁRIOS RELATÓRIOS, POOL DE PROCESSOS)
+# ═════════════════════════════════════════════════════════════════
+
+def _batch_task(line_number, line):
+    """Tarefa de um processo do batch: ler e gerar um pedido; devolve a linha de resultado"""
+    started = time.perf_counter()
+    log_stream = _stderr_log_stream()
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        response = {'id': None, 'status': 'error', 'error': f"JSON inválido: {e}"}
+    else:
+        if isinstance(request, dict):
+            # O paralelismo do batch é entre relatórios: cada um é escrito em série no seu processo
+            request['workers'] = None
+        response = _run_request(request, log_stream, started)
+    log_stream.flush()
+    response['line'] = line_number
+    if response['status'] == 'ok':
+        response['sizeBytes'] = response['timings'].get('sizeBytes')
+    return response
+
+def run_batch(input_stream=None, output_stream=None, workers=None, log_stream=None):
+    """
+    Gerar um relatório por cada linha JSON de input_stream (mesmo payload do modo normal, com
+    'id' opcional), num pool de processos (workers; None = um por CPU).
+    
+    Por cada relatório é escrita uma linha JSON em output_stream, pela ordem em que terminam, com
+    id, line, status, outputPath, sizeBytes e timings (ou error). Um pedido que falhe, ou um
+    processo que termine abruptamente, só afeta a sua linha. Devolve (ok, erros).
+    """
+    if input_stream is None:
+        input_stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    if output_stream is None:
+        output_stream = sys.stdout
+    if log_stream is None:
+        log_stream = _stderr_log_stream()
+    workers = _resolve_workers(-1 if workers is None else workers)
+    max_in_flight = 2 * workers
+    started = time.perf_counter()
+    counts = {'ok': 0, 'error': 0}
+    
+    def _emit(response):
+        counts['ok' if response['status'] == 'ok' else 'error'] += 1
+        output_stream.write(json.dumps(response, ensure_ascii=False) + '\n')
+        output_stream.flush()
+    
+    pool = ProcessPoolExecutor(max_workers=workers)
+    in_flight = {}  # future -> (nº da linha, linha, tentativa)
+    
+    def _submit(line_number, line, attempt=1):
+        nonlocal pool
+        try:
+            future = pool.submit(_batch_task, line_number, line)
+        except BrokenProcessPool:
+            # Um processo morreu: os pedidos seguintes vão para um pool novo
+            pool.shutdown(wait=False)
+            pool = ProcessPoolExecutor(max_workers=workers)
+            future = pool.submit(_batch_task, line_number, line)
+        in_flight[future] = (line_number, line, attempt)
+    
+    def _collect():
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            line_number, line, attempt = in_flight.pop(future)
+            try:
+                _emit(future.result())
+            except BrokenProcessPool as e:
+                # Pedidos que estavam no pool quando outro processo morreu: uma nova tentativa
+                if attempt == 1:
+                    _submit(line_number, line, attempt + 1)
+                else:
+                    _emit({'id': None, 'line': line_number, 'status': 'error', 'error': f"Processo falhou: {e}"})
+            except Exception as e:
+                _emit({'id': None, 'line': line_number, 'status': 'error', 'error': f"Processo falhou: {e}"})
+    
+    try:
+        for line_number, line in enumerate(input_stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            # Limitar os pedidos em memória: esperar que um termine antes de ler mais
+            while len(in_flight) >= max_in_flight:
+                _collect()
+            _submit(line_number, line)
+        while in_flight:
+            _collect()
+    finally:
+        pool.shutdown()
+    
+    print(f"📦 Batch: {counts['ok']} relatórios gerados, {counts['error']} com erro "
+          f"em {time.perf_counter() - started:.2f} s ({workers} processos)", file=log_stream)
+    return counts['ok'], counts['error']
+
+# ═════════════════════════════════════════════════════════════════
+# XLSX NO STDOUT (FRAMES BINÁRIOS)
+# ═════════════════════════════════════════════════════════════════
+
+# Cada frame: magic (4 bytes), tamanho do nome (uint16 big-endian), nome em UTF-8 (idioma, ou
+# vazio), tamanho do xlsx (uint64 big-endian) e o xlsx. Um frame por relatório, pela ordem de
+# 'languages'; o fim do stdout marca o fim dos frames.
+_FRAME_MAGIC = b'ASBX'
+_FRAME_HEADER = struct.Struct('>4sH')
+_FRAME_LENGTH = struct.Struct('>Q')
+
+def write_workbook_frames(stream, result):
+    """Escrever em stream (binário) o xlsx em bytes, ou {idioma: bytes}, um frame por relatório"""
+    reports = result.items() if isinstance(result, dict) else [('', result)]
+    for name, data in reports:
+        name = name.encode('utf-8')
+        stream.write(_FRAME_HEADER.pack(_FRAME_MAGIC, len(name)) + name + _FRAME_LENGTH.pack(len(data)))
+        stream.write(data)
+    stream.flush()
+
+def read_workbook_frames(stream):
+    """Ler os frames de write_workbook_frames; devolve [(nome, bytes)]"""
+    frames = []
+    while True:
+        header = stream.read(_FRAME_HEADER.size)
+        if not header:
+            return frames
+        magic, name_size = _FRAME_HEADER.unpack(header)
+        if magic != _FRAME_MAGIC:
+            raise ValueError(f"Frame inválido: {magic!r}")
+        name = stream.read(name_size).decode('utf-8')
+        size, = _FRAME_LENGTH.unpack(stream.read(_FRAME_LENGTH.size))
+        data = stream.read(size)
+        if len(data) != size:
+            raise ValueError(f"Frame '{name}' incompleto: {len(data)} de {size} bytes")
+        frames.append((name, data))
+
+# ═════════════════════════════════════════════════════════════════
+# PONTO DE ENTRADA
+# ═════════════════════════════════════════════════════════════════
+
+if __name__ == '__main__':
+    # Ensure UTF-8 encoding for stdout on Windows (só como script: quem importa o módulo mantém o seu stdout)
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    
+    parser = argparse.ArgumentParser(description='Gerador de relatórios Excel As-Built (payload JSON via stdin)')
+    parser.add_argument('--serve', action='store_true',
+                        help='modo residente: um pedido JSON por linha no stdin, uma resposta JSON por linha no stdout')
+    parser.add_argument('--incremental', action='store_true',
+                        help='ler o payload do stdin uma fase de cada vez, escrevendo cada sheet assim que a fase chega')
+    parser.add_argument('--batch', action='store_true',
+                        help='vários relatórios: um pedido JSON por linha no stdin, uma linha de resultado por relatório no stdout')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processos do modo --batch (por omissão, um por CPU)')
+    parser.add_argument('--input', metavar='FICHEIRO',
+                        help='ler o payload deste ficheiro (mmap) em vez do stdin (modo normal e --incremental); '
+                             'o stdin aceita então {"command": "cancel"}')
+    parser.add_argument('--stdout', action='store_true',
+                        help='escrever o xlsx no stdout em frames binários (sem outputPath); as mensagens vão para o stderr')
+    parser.add_argument('--progress', action='store_true',
+                        help='progresso em linhas JSON no stdout (stage, sheet, rowsDone, rowsTotal); as mensagens vão para o stderr')
+    parser.add_argument('--trace', metavar='FICHEIRO',
+                        help='gravar em JSON os spans de tempo e memória (tracemalloc) de cada etapa (modo normal e '
+                             '--incremental; em --serve/--batch, usar tracePath em cada pedido)')
+    parser.add_argument('--profile', metavar='FICHEIRO',
+                        help='gravar as estatísticas do cProfile, sem tracemalloc (modo normal e --incremental; '
+                             'em --serve/--batch, usar profilePath em cada pedido)')
+    args = parser.parse_args()
+    if (args.stdout or args.progress or args.input) and (args.serve or args.batch):
+        parser.error('--stdout, --progress e --input só se aplicam ao modo normal e a --incremental')
+    if (args.trace or args.profile) and (args.serve or args.batch):
+        parser.error('--trace e --profile só se aplicam ao modo normal e a --incremental; '
+                     'em --serve/--batch, usar tracePath/profilePath em cada pedido')
+    if args.stdout and args.progress:
+        parser.error('--stdout e --progress usam ambos o stdout')
+    # --profile sozinho não liga o tracemalloc, que distorceria os tempos do cProfile
+    trace = ReportTrace(memory=bool(args.trace), profile_path=args.profile) if args.trace or args.profile else None
+    
+    if args.serve:
+        serve()
+    elif args.batch:
+        _, failed = run_batch(workers=args.workers)
+        sys.exit(1 if failed else 0)
+    else:
+        # Modo normal e --incremental: um sinal cancela a geração no próximo bloco de linhas
+        progress = ReportProgress(_json_lines_emitter(sys.stdout) if args.progress else None)
+        _install_cancel_signals(progress)
+        if args.input:
+            _watch_stdin_cancel(progress)
+        # Com --stdout ou --progress, o stdout fica reservado: as mensagens vão para o stderr
+        log_stream = _stderr_log_stream() if args.stdout or args.progress else sys.stdout
+        try:
+            with contextlib.redirect_stdout(log_stream), progress, contextlib.ExitStack() as stack:
+                if args.incremental:
+                    # Com --input, o leitor incremental trabalha diretamente sobre o ficheiro mapeado
+                    stream = _MappedTextReader(stack.enter_context(_mapped_file(args.input))) if args.input else sys.stdin
+                    # Sem --stdout, o xlsx em bytes perder-se-ia: outputPath é obrigatório
+                    result = generate_from_stream(stream, trace=trace, in_memory=args.stdout, require_output_path=True)
+                else:
+                    input_data = read_payload_file(args.input) if args.input else json.loads(sys.stdin.read())
+                    input_data = _resolve_input_path(input_data)
+                    if args.stdout:
+                        input_data['outputPath'] = None
+                    elif not input_data.get('outputPath'):
+                        parser.error('outputPath é obrigatório no payload sem --stdout')
+                    result = generate_from_payload(input_data, trace=trace)
+        except ReportCancelled as e:
+            print(f"⛔ {e}", file=_stderr_log_stream())
+            if progress.emit is not None:
+                progress.emit({'stage': 'cancelled', 'sheet': None, 'rowsDone': None, 'rowsTotal': None})
+            sys.exit(130)
+        if args.stdout:
+            sys.stdout.flush()
+            write_workbook_frames(sys.stdout.buffer, result)
+        elif progress.emit is not None:
+            progress.emit({'stage': 'done', 'sheet': None, 'rowsDone': None, 'rowsTotal': None, 'outputPath': result})
+    if trace is not None and args.trace:
+        trace.write(args.trace)
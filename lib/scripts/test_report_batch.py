@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Modo batch (--batch): um relatório por linha JSON, num pool de processos"""
+
+import io
+import json
+import multiprocessing
+import os
+
+import pytest
+
+import excel_report_generator as gen
+from test_report_progress import payload
+
+
+def run_batch(lines, workers=2):
+    output, log = io.StringIO(), io.StringIO()
+    counts = gen.run_batch(io.StringIO(''.join(line + '\n' for line in lines)), output, workers, log)
+    responses = {r['line']: r for r in map(json.loads, output.getvalue().splitlines())}
+    return counts, responses, log.getvalue()
+
+
+def test_batch_reports_each_line(tmp_path):
+    counts, responses, log = run_batch([
+        json.dumps({**payload(5, str(tmp_path / 'a.xlsx')), 'id': 'a'}),
+        '',
+        json.dumps({**payload(5), 'id': 'sem-saida'}),
+        '{"id": ',
+        json.dumps({**payload(5, str(tmp_path / 'b.xlsx')), 'id': 'b', 'workers': 4}),
+    ])
+    assert counts == (2, 2)
+    assert sorted(responses) == [1, 3, 4, 5]
+    assert responses[1]['id'] == 'a' and responses[1]['status'] == 'ok'
+    assert responses[1]['sizeBytes'] == os.path.getsize(tmp_path / 'a.xlsx')
+    assert responses[5]['status'] == 'ok' and (tmp_path / 'b.xlsx').exists()
+    assert responses[3]['id'] == 'sem-saida' and 'outputPath' in responses[3]['error']
+    assert responses[4]['status'] == 'error' and 'JSON inválido' in responses[4]['error']
+    assert '2 relatórios gerados, 2 com erro' in log
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='precisa de fork')
+def test_batch_retries_after_a_process_dies(tmp_path, monkeypatch):
+    # Os processos herdam a função substituída (fork); o primeiro a gerar o relatório 1 morre
+    crashed = tmp_path / 'crashed'
+    original = gen.generate_from_payload
+
+    def dying_once(request, *args):
+        if request['outputPath'].endswith('1.xlsx') and not crashed.exists():
+            crashed.touch()
+            os._exit(1)
+        return original(request, *args)
+    monkeypatch.setattr(gen, 'generate_from_payload', dying_once)
+
+    lines = [json.dumps(payload(5, str(tmp_path / f'{n}.xlsx'))) for n in range(3)]
+    counts, responses, _ = run_batch(lines)
+    assert crashed.exists()
+    assert counts == (3, 0)
+    assert all(responses[n]['status'] == 'ok' for n in (1, 2, 3))
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""SheetCache: regeneração a frio e a quente, chave dos agregados em pickle e limpeza"""
+
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import excel_report_generator as gen
+from test_report_payloads import PHASES, render, sparse_data_by_phase
+
+
+def render_cached(data, cache_dir):
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        values = render(data, cache_dir=str(cache_dir))
+    return values, log.getvalue().count('reused from cache')
+
+
+@pytest.fixture
+def fresh_fingerprint():
+    gen._aggregates_fingerprint.cache_clear()
+    yield
+    gen._aggregates_fingerprint.cache_clear()
+
+
+def test_cold_then_warm_cache(tmp_path):
+    data = sparse_data_by_phase()
+    expected = render(data)
+    cold, cold_hits = render_cached(data, tmp_path)
+    warm, warm_hits = render_cached(data, tmp_path)
+    assert cold == warm == expected
+    assert cold_hits == 0
+    assert warm_hits == sum(1 for records in data.values() if records)
+    
+    # Só a fase alterada volta a ser escrita
+    data['recepcao'][0]['status'] = 'Concluído'
+    changed, changed_hits = render_cached(data, tmp_path)
+    assert changed == render(data)
+    assert changed_hits == warm_hits - 1
+
+
+def test_aggregates_are_read_back(tmp_path, monkeypatch):
+    cache = gen.SheetCache(str(tmp_path))
+    records = sparse_data_by_phase()['recepcao']
+    digest = gen._records_digest(records)
+    first = cache.aggregates('recepcao', records, digest)
+    calls = []
+    monkeypatch.setattr(gen.PhaseAggregates, 'from_records',
+                        classmethod(lambda cls, *args: calls.append(args) or gen.PhaseAggregates(args[0])))
+    second = cache.aggregates('recepcao', records, digest)
+    assert not calls
+    assert vars(second).keys() == vars(first).keys() and second.deviations == first.deviations
+
+
+def test_aggregates_layout_change_misses_old_entries(tmp_path, monkeypatch, fresh_fingerprint):
+    cache = gen.SheetCache(str(tmp_path))
+    records = sparse_data_by_phase()['recepcao']
+    digest = gen._records_digest(records)
+    cache.aggregates('recepcao', records, digest)
+    before = gen._aggregates_fingerprint()
+    
+    # Um campo novo nos agregados muda a chave: o pickle antigo (sem o campo) não é lido
+    original_init = gen.PhaseAggregates.__init__
+    def init_with_new_field(self, phase_key):
+        original_init(self, phase_key)
+        self.new_field = 0
+    monkeypatch.setattr(gen.PhaseAggregates, '__init__', init_with_new_field)
+    gen._aggregates_fingerprint.cache_clear()
+    assert gen._aggregates_fingerprint() != before
+    assert cache.aggregates('recepcao', records, digest).new_field == 0
+
+
+def test_aggregates_fingerprint_is_stable_across_processes():
+    script = 'import excel_report_generator as gen; print(gen._aggregates_fingerprint())'
+    fingerprints = {
+        subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                       cwd=os.path.dirname(os.path.abspath(gen.__file__)),
+                       env={**os.environ, 'PYTHONHASHSEED': seed}).stdout.strip()
+        for seed in ('1', '2')
+    }
+    assert fingerprints == {gen._aggregates_fingerprint()}
+
+
+def test_corrupt_aggregates_are_recomputed(tmp_path):
+    cache = gen.SheetCache(str(tmp_path))
+    records = sparse_data_by_phase()['recepcao']
+    digest = gen._records_digest(records)
+    cache.aggregates('recepcao', records, digest)
+    for name in os.listdir(tmp_path):
+        with open(tmp_path / name, 'wb') as f:
+            f.write(b'not a pickle')
+    assert cache.aggregates('recepcao', records, digest).total == len(records)
+
+
+def test_prune_keeps_recent_and_temporary_files(tmp_path):
+    old = time.time() - 2 * gen.SHEET_CACHE_PRUNE_MIN_AGE_S
+    names = {}
+    for n in range(6):
+        name = f'old{n}.xml'
+        (tmp_path / name).write_bytes(b'x')
+        os.utime(tmp_path / name, (old + n, old + n))
+        names[name] = old + n
+    (tmp_path / 'in_flight.xml.123.tmp').write_bytes(b'x')
+    os.utime(tmp_path / 'in_flight.xml.123.tmp', (old - 10, old - 10))
+    for n in range(3):
+        (tmp_path / f'recent{n}.xml').write_bytes(b'x')
+    
+    gen.SheetCache(str(tmp_path), max_files=5).prune()
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        ['in_flight.xml.123.tmp', 'old4.xml', 'old5.xml', 'recent0.xml', 'recent1.xml', 'recent2.xml'])
+    
+    # Acima do limite só com ficheiros recentes: nada é apagado
+    gen.SheetCache(str(tmp_path), max_files=1).prune()
+    assert sorted(os.listdir(tmp_path)) == ['in_flight.xml.123.tmp', 'recent0.xml', 'recent1.xml', 'recent2.xml']
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid') or os.getuid() != 0, reason='precisa de root para mudar o dono')
+def test_cache_dir_of_another_user_is_rejected(tmp_path):
+    os.chown(tmp_path, 12345, 12345)
+    with pytest.raises(ValueError, match='outro utilizador'):
+        gen.SheetCache(str(tmp_path))
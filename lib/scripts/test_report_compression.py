@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Níveis de compressão do zip ao gravar"""
+
+import contextlib
+import io
+import json
+import zipfile
+
+import pytest
+
+import excel_report_generator as gen
+
+DATA = {'recepcao': [{'turbinaId': f'T{n}', 'componentId': f'C{n}', 'status': 'Concluído'} for n in range(50)]}
+
+
+def generate(compression, timings=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return gen.generate_excel_report('Proj', DATA, ['recepcao'], None, 'pt', True, compression=compression, timings=timings)
+
+
+@pytest.mark.parametrize('compression', gen.COMPRESSION_LEVELS)
+def test_compression_levels(compression):
+    timings = {}
+    content = generate(compression, timings)
+    method, _ = gen.COMPRESSION_LEVELS[compression]
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        assert archive.testzip() is None
+        assert {info.compress_type for info in archive.infolist()} == {method}
+    assert timings['compression'] == compression and timings['sizeBytes'] == len(content)
+
+
+def test_unknown_compression_is_rejected_before_rendering():
+    log = io.StringIO()
+    with pytest.raises(ValueError, match='Compressão desconhecida'), contextlib.redirect_stdout(log):
+        gen.generate_excel_report('Proj', DATA, ['recepcao'], None, 'pt', True, compression='zstd')
+    assert 'sheet' not in log.getvalue()
+    payload = {'projectName': 'Proj', 'selectedPhases': ['recepcao'], 'language': 'pt', 'compression': 'zstd', 'dataByPhase': DATA}
+    with pytest.raises(ValueError, match='Compressão desconhecida'), contextlib.redirect_stdout(log):
+        gen.generate_from_stream(io.StringIO(json.dumps(payload)))
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Utilização de gruas e concorrência da frota (sweep-line) comparadas com força bruta"""
+
+import random
+from datetime import datetime
+
+import pytest
+
+import excel_report_generator as gen
+
+
+def test_interval_hours():
+    day, next_day = datetime(2024, 3, 5), datetime(2024, 3, 6)
+    assert gen._interval_hours(day, '08:00', day, '10:30') == 2.5
+    assert gen._interval_hours(day, '22:00', next_day, '02:00') == 4
+    assert gen._interval_hours(day, '08:00:00', day, '08:15:36') == pytest.approx(0.26)
+    assert gen._interval_hours(day, '10:00', day, '08:00') == 0
+    assert gen._interval_hours(day, None, next_day, None) == 24
+    assert gen._interval_hours(None, '08:00', day, '10:00') == 0
+
+
+def random_intervals(rng, count, horizon=60):
+    intervals = []
+    for _ in range(count):
+        start = rng.randrange(horizon)
+        intervals.append((float(start), float(start + rng.randint(1, 12))))
+    return intervals
+
+
+def coverage(intervals, horizon):
+    """Horas inteiras [t, t+1) cobertas por algum intervalo"""
+    return {t for t in range(horizon) if any(start <= t < end for start, end in intervals)}
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_crane_utilization_matches_brute_force(seed):
+    rng = random.Random(seed)
+    intervals = random_intervals(rng, rng.randint(1, 10))
+    work_intervals = [interval for interval in intervals if rng.random() < 0.6]
+    crane = gen.CraneUtilization(intervals, work_intervals)
+    
+    covered = coverage(intervals, 80)
+    assert crane.logged_hours == len(covered)
+    assert crane.work_hours == len(coverage(work_intervals, 80))
+    assert crane.overlap_hours == sum(end - start for start, end in intervals) - len(covered)
+    assert crane.first_start == min(start for start, _ in intervals)
+    assert crane.last_end == max(end for _, end in intervals)
+    assert crane.idle_hours == crane.span_hours - len(covered)
+    ordered = sorted(intervals)
+    assert crane.overlapping_events == sum(
+        1 for i, (start, _) in enumerate(ordered) if i and start < max(end for _, end in ordered[:i]))
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_fleet_concurrency_matches_brute_force(seed):
+    rng = random.Random(seed)
+    by_crane = [gen.CraneUtilization(intervals, intervals).work_intervals
+                for intervals in (random_intervals(rng, rng.randint(0, 6)) for _ in range(rng.randint(1, 5)))]
+    fleet = gen.FleetConcurrency(by_crane)
+    
+    bounds = [value for intervals in by_crane for interval in intervals for value in interval]
+    if not bounds:
+        assert (fleet.peak, fleet.peak_start, fleet.span_hours, fleet.busy_hours) == (0, None, 0, 0)
+        return
+    first, last = int(min(bounds)), int(max(bounds))
+    levels = [sum(1 for intervals in by_crane if any(start <= t < end for start, end in intervals))
+              for t in range(first, last)]
+    peak = max(levels)
+    assert fleet.peak == peak
+    assert fleet.peak_start == first + levels.index(peak)
+    assert fleet.level_hours == [float(levels.count(k)) for k in range(peak + 1)]
+    assert fleet.span_hours == last - first
+    assert fleet.idle_hours == levels.count(0)
+    assert fleet.busy_hours == len(levels) - levels.count(0)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Percentis dos desvios (rank mais próximo) e sheet de análise de desvios"""
+
+import contextlib
+import io
+import math
+import random
+
+import pytest
+from openpyxl import load_workbook
+
+import excel_report_generator as gen
+
+
+def nearest_rank(values, pct):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+def stats_of(values):
+    stats = gen.DeviationStats()
+    for days in values:
+        stats.add(days)
+    return stats
+
+
+def test_percentiles_of_one_to_ten():
+    stats = stats_of(range(1, 11))
+    assert [stats.percentile(pct) for pct in (0, 10, 50, 90, 99, 100)] == [1, 1, 5, 9, 10, 10]
+    assert stats.worst == 10 and stats.late == 10
+
+
+def test_percentiles_without_deviations():
+    stats = gen.DeviationStats()
+    assert stats.percentile(50) is None and stats.worst is None
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_percentiles_match_sorted_list(seed):
+    rng = random.Random(seed)
+    values = [rng.randint(-15, 40) for _ in range(rng.randint(1, 300))]
+    stats = stats_of(values)
+    for pct in (1, 25, 50, 90, 99, 100):
+        assert stats.percentile(pct) == nearest_rank(values, pct)
+    # Um add depois de uma consulta volta a ordenar
+    stats.add(1000)
+    assert stats.percentile(100) == 1000
+    assert stats.percentile(50) == nearest_rank(values + [1000], 50)
+
+
+def test_deviation_sheet_freezes_detail_header():
+    rows = [{'turbinaId': f'T{n % 4}', 'componentId': f'C{n}', 'status': 'Concluído',
+             'dataPlaneada': '2024-03-01', 'dataReal': f'2024-03-{n % 20 + 1:02d}'} for n in range(40)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        content = gen.generate_excel_report('Proj', {'recepcao': rows}, ['recepcao'], None, 'pt', True)
+    ws = load_workbook(io.BytesIO(content))['Análise de Desvios']
+    header_row = next(row for row in range(1, ws.max_row + 1)
+                      if (ws.cell(row, 1).value, ws.cell(row, 2).value) == ('Turbina', 'Fase'))
+    assert header_row > 3
+    assert ws.freeze_panes == f'A{header_row + 1}'
+    assert ws.auto_filter.ref == f'A{header_row}:F{header_row + 40}'
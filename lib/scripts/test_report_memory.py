@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Escolha automática entre workbook em memória e streaming, pela memória estimada"""
+
+import excel_report_generator as gen
+from test_report_payloads import PHASES, render, sparse_data_by_phase, workbook_values
+
+
+def generate(**kwargs):
+    timings = {}
+    content = gen.generate_excel_report('Proj', sparse_data_by_phase(), PHASES, None, 'pt', True,
+                                        timings=timings, **kwargs)
+    return workbook_values(content), timings['memory']
+
+
+def test_small_report_stays_in_memory():
+    _, memory = generate()
+    assert memory['path'] == 'in-memory' and memory['automatic']
+    assert memory['budgetMiB'] == gen.DEFAULT_MEMORY_BUDGET_MB
+    assert 0 < memory['estimatedMiB'] < memory['budgetMiB']
+
+
+def test_budget_below_estimate_switches_to_streaming():
+    values, memory = generate(memory_budget_mb=0)
+    assert memory['path'] == 'streaming' and memory['automatic']
+    assert values == render(sparse_data_by_phase(), streaming=False)
+
+
+def test_explicit_choice_ignores_budget():
+    _, memory = generate(memory_budget_mb=0, streaming=False)
+    assert memory['path'] == 'in-memory' and not memory['automatic']
+    _, memory = generate(streaming=True)
+    assert memory['path'] == 'streaming' and not memory['automatic']
+
+
+def test_estimate_counts_phase_cells_only_in_memory():
+    jobs = [({'columns': ['a', 'b', 'c']}, [{}] * 10)]
+    in_memory = gen.estimate_workbook_bytes(jobs, None)
+    assert in_memory == 30 * gen.ESTIMATED_CELL_BYTES
+    assert gen.estimate_workbook_bytes(jobs, None, phase_sheets_in_memory=False) == 0
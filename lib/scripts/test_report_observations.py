@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Classificação das observações de campo (palavras inteiras pt/en, com e sem acentos)"""
+
+import pytest
+
+import excel_report_generator as gen
+
+CRITICAL, PROBLEM, ATTENTION, INFO = '⚠️ Crítico', '🔴 Problema', '🟡 Atenção', 'ℹ️ Info'
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('CRÍTICO: flange danificado', (CRITICAL, 'Resolvido')),
+    ('critico, sem acento', (CRITICAL, 'Resolvido')),
+    ('Situações críticas', (CRITICAL, 'Resolvido')),
+    ('Problem; critical!', (CRITICAL, 'Resolvido')),
+    ('Problemas em aberto', (PROBLEM, 'Aberto')),
+    ('problem found', (PROBLEM, 'Resolvido')),
+    ('Atencao ao binário', (ATTENTION, 'Resolvido')),
+    ('ATENÇÃO', (ATTENTION, 'Resolvido')),
+    ('Issue still open', (INFO, 'Aberto')),
+    ('Porta ABERTA', (INFO, 'Aberto')),
+    ('Reopened after inspection', (INFO, 'Resolvido')),
+    ('Opening the hatch', (INFO, 'Resolvido')),
+    ('Problematic bolt', (INFO, 'Resolvido')),
+    ('Hypercritical path', (INFO, 'Resolvido')),
+    ('', (INFO, 'Resolvido')),
+])
+def test_classify_observation(text, expected):
+    assert gen._classify_observation(text) == expected
+
+
+def test_every_keyword_and_accent_variant_is_found():
+    for key, words in gen.OBSERVATION_KEYWORDS.items():
+        for word in words:
+            for variant in gen._accent_variants(word):
+                for text in (variant, variant.upper(), f'x {variant}s.', f'({variant})'):
+                    assert gen._OBSERVATION_PATTERN.findall(text.lower()) == [variant], text
+                    assert gen._OBSERVATION_KEYS[variant] == key
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""xlsx em bytes: frames binários do --stdout e outputPath obrigatório sem --stdout"""
+
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import excel_report_generator as gen
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'excel_report_generator.py')
+PAYLOAD = {'projectName': 'Proj', 'selectedPhases': ['recepcao'], 'language': 'pt', 'completeReport': True,
+           'dataByPhase': {'recepcao': [{'turbinaId': 'T01', 'componentId': 'C1', 'status': 'Concluído'}]}}
+
+
+def test_workbook_frames_round_trip():
+    for result, expected in ((b'PK\x03\x04xlsx', [('', b'PK\x03\x04xlsx')]),
+                             ({'pt': b'pt' * 100, 'en': b'', 'Português': b'x'},
+                              [('pt', b'pt' * 100), ('en', b''), ('Português', b'x')])):
+        stream = io.BytesIO()
+        gen.write_workbook_frames(stream, result)
+        stream.seek(0)
+        assert gen.read_workbook_frames(stream) == expected
+    assert gen.read_workbook_frames(io.BytesIO()) == []
+
+
+def test_workbook_frames_reject_corrupt_streams():
+    stream = io.BytesIO()
+    gen.write_workbook_frames(stream, {'pt': b'0123456789'})
+    content = stream.getvalue()
+    with pytest.raises(ValueError, match='incompleto'):
+        gen.read_workbook_frames(io.BytesIO(content[:-1]))
+    with pytest.raises(ValueError, match='inválido'):
+        gen.read_workbook_frames(io.BytesIO(b'XXXX' + content[4:]))
+
+
+def test_generate_from_stream_can_require_output_path():
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert gen.generate_from_stream(io.StringIO(json.dumps(PAYLOAD)))[:2] == b'PK'
+        with pytest.raises(ValueError, match='outputPath'):
+            gen.generate_from_stream(io.StringIO(json.dumps(PAYLOAD)), require_output_path=True)
+
+
+@pytest.mark.parametrize('flags', [[], ['--incremental']])
+def test_script_without_output_path_fails(tmp_path, flags):
+    payload_path = tmp_path / 'payload.json'
+    payload_path.write_text(json.dumps(PAYLOAD), encoding='utf-8')
+    result = subprocess.run([sys.executable, SCRIPT, *flags, '--input', str(payload_path)],
+                            stdin=subprocess.DEVNULL, capture_output=True)
+    assert result.returncode != 0
+    assert b'outputPath' in result.stderr
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Sheets de fase escritas num pool de processos: mesmo resultado que em série, mesmo com falhas"""
+
+import contextlib
+import io
+import multiprocessing
+import os
+
+import pytest
+
+import excel_report_generator as gen
+from test_report_payloads import PHASES, sparse_data_by_phase
+from test_report_sheet_xml import sheet_cells
+
+
+def render(**kwargs):
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        content = gen.generate_excel_report('Proj', sparse_data_by_phase(), PHASES, None, 'pt', True, **kwargs)
+    return sheet_cells(content), log.getvalue()
+
+
+@pytest.fixture
+def always_parallel(monkeypatch):
+    monkeypatch.setattr(gen, 'PARALLEL_MIN_ROWS', 0)
+
+
+@pytest.mark.parametrize('backend', gen.PHASE_SHEET_BACKENDS)
+def test_parallel_matches_serial(always_parallel, tmp_path, backend):
+    serial, _ = render(backend=backend)
+    parallel, log = render(workers=2, backend=backend)
+    assert 'processos' in log
+    assert parallel == serial
+    cached, _ = render(workers=2, backend=backend, cache_dir=str(tmp_path))
+    assert cached == serial
+
+
+# Os processos do pool herdam a função substituída no pai (fork): falham só fora do processo principal
+fork_only = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='precisa de fork')
+
+
+@fork_only
+@pytest.mark.parametrize('failure', ['exception', 'exit'])
+def test_failed_worker_falls_back_to_this_process(always_parallel, monkeypatch, failure):
+    expected, _ = render()
+    parent = os.getpid()
+    original = gen._render_phase_sheet_xml
+
+    def failing_in_worker(spec, *args):
+        if os.getpid() != parent and spec['key'] == 'gruasPads':
+            if failure == 'exit':
+                os._exit(1)
+            raise RuntimeError('falha no processo')
+        return original(spec, *args)
+    monkeypatch.setattr(gen, '_render_phase_sheet_xml', failing_in_worker)
+
+    result, log = render(workers=2)
+    assert result == expected
+    assert 'a escrever neste processo' in log
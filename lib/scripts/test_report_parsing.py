@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Conversão memorizada das datas e das durações do payload"""
+
+from datetime import datetime
+
+import pytest
+
+import excel_report_generator as gen
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2024-03-05', datetime(2024, 3, 5)),
+    ('05/03/2024', datetime(2024, 3, 5)),
+    ('2024-03-05 14:30', datetime(2024, 3, 5)),
+    ('2024-03-05T14:30:00.000', datetime(2024, 3, 5)),
+    ('05/03/2024 08:00', datetime(2024, 3, 5)),
+    (' 2024-03-05', datetime(2024, 3, 5)),
+    ('2024-3-5', datetime(2024, 3, 5)),
+    (datetime(2024, 3, 5, 10), datetime(2024, 3, 5, 10)),
+    ('2024-02-30', None),
+    ('31/02/2024', None),
+    ('05-03-2024', None),
+    ('abc', None),
+    ('', None),
+    (None, None),
+])
+def test_parse_date(value, expected):
+    assert gen._parse_date(value) == expected
+
+
+def test_parse_date_column_converts_each_value():
+    values = ['2024-03-05', None, '05/03/2024', 'abc', '2024-03-05', datetime(2024, 1, 1)]
+    assert gen._parse_date_column(values) == [gen._parse_date(value) for value in values]
+
+
+@pytest.mark.parametrize('value, hours', [
+    ('3h 25m', 3 + 25 / 60),
+    ('3h', 3),
+    ('40m', 40 / 60),
+    ('2,5', 2.5),
+    ('2.5h', 2.5),
+    ('1h30', 1.5),
+    ('1 hora 30 min', 1.5),
+    (' 3H ', 3),
+    ('02:30', 2.5),
+    (2, 2.0),
+    (1.25, 1.25),
+    ('', 0),
+    (None, 0),
+    (0, 0),
+    ('abc', 0),
+    ('3h x', 0),
+])
+def test_parse_duration(value, hours):
+    assert gen.parse_duration(value) == pytest.approx(hours)
+
+
+def test_parse_duration_column_matches_parse_duration():
+    values = ['3h 25m', '40m', None, '3h 25m', 2, ['lista']]
+    assert gen._parse_duration_column(values) == [gen.parse_duration(value) for value in values]
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Equivalência entre os formatos de payload aceites pelo gerador (por linha, colunar, incremental)"""
+
+import contextlib
+import io
+import json
+import re
+
+import pytest
+
+from openpyxl import load_workbook
+
+import excel_report_generator as gen
+
+PHASES = ['recepcao', 'preparacao', 'preAssemblagem', 'assemblagem', 'torqueTensionamento', 'fasesFinal']
+
+
+def sparse_data_by_phase():
+    """Registos em que algumas chaves só existem em parte das linhas (observações sem data, gruas sem modelo)"""
+    recepcao = []
+    for n in range(8):
+        row = {'turbinaId': f'T{n % 3:02d}', 'componentId': f'C{n}', 'vui': f'V{n}',
+               'status': 'Concluído' if n % 2 else 'Em Progresso',
+               'dataReal': f'2024-03-{n + 1:02d}', 'dataPlaneada': '2024-03-02'}
+        if n % 3 == 0:
+            row['observacoes'] = 'Problema aberto no flange'
+        if n % 4 == 0:
+            row['data'] = '2024-03-05'
+        recepcao.append(row)
+    gruas = []
+    for n in range(6):
+        row = {'turbinaId': 'T00', 'tipo': ('trabalho', 'paragem', 'mobilizacao')[n % 3],
+               'dataInicio': '01/03/2024', 'horaInicio': f'{8 + n:02d}:00',
+               'dataFim': '01/03/2024', 'horaFim': f'{10 + n:02d}:30'}
+        if n % 2:
+            row['gruaModelo'] = 'LR1750'
+            row['duracao'] = '2h 30m'
+        if n == 1:
+            row['motivo'] = 'vento'
+        gruas.append(row)
+    return {'recepcao': recepcao, 'preparacao': [], 'gruasPads': gruas, 'gruasGerais': []}
+
+
+def columnar_payload(data_by_phase):
+    """Payload colunar como o gerado por report_service.dart (_serializeDataForPython)"""
+    strings, string_index, phases = [], {}, {}
+    for phase_key, rows in data_by_phase.items():
+        keys = list(dict.fromkeys(key for row in rows for key in row))
+        columns, encoded = [], []
+        for key in keys:
+            column = [row.get(key) for row in rows]
+            if all(value is None or isinstance(value, str) for value in column) and len(set(column)) * 2 <= len(column):
+                encoded.append(key)
+                encoded_column = []
+                for value in column:
+                    if value is not None and value not in string_index:
+                        string_index[value] = len(strings)
+                        strings.append(value)
+                    encoded_column.append(None if value is None else string_index[value])
+                column = encoded_column
+            columns.append(column)
+        phases[phase_key] = {'keys': keys, 'columns': columns, 'encoded': encoded}
+    return {'format': 'columnar', 'strings': strings, 'dataByPhase': phases}
+
+
+# Hora de geração (capa e rodapés), diferente entre duas gerações
+_GENERATED_AT = re.compile(r'(Gerado em: )?\d{2}/\d{2}/\d{4} \d{2}:\d{2}(:\d{2})?')
+
+
+def _cell_value(value):
+    if value == '':
+        return None
+    if isinstance(value, str) and _GENERATED_AT.fullmatch(value):
+        return '<timestamp>'
+    return value
+
+
+def workbook_values(content):
+    """{sheet: linhas de valores} de um xlsx em bytes ('' e células vazias são iguais, sem a hora de geração)"""
+    wb = load_workbook(io.BytesIO(content))
+    return {ws.title: [tuple(map(_cell_value, row)) for row in ws.iter_rows(values_only=True)] for ws in wb.worksheets}
+
+
+def render(data_by_phase, language='pt', **kwargs):
+    return workbook_values(gen.generate_excel_report('Proj', data_by_phase, PHASES, None, language, True, **kwargs))
+
+
+def render_incremental(payload, language='pt', **fields):
+    """Mesmo relatório por generate_from_stream (payload JSON lido de uma vez só, metadados primeiro)"""
+    meta = {'projectName': 'Proj', 'selectedPhases': PHASES, 'language': language, 'completeReport': True, **fields}
+    stream = io.StringIO(json.dumps({**meta, **payload}, ensure_ascii=False))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return workbook_values(gen.generate_from_stream(stream, in_memory=True))
+
+
+def test_sparse_columnar_matches_rows():
+    data = sparse_data_by_phase()
+    columnar = gen.decode_columnar_payload(columnar_payload(data))
+    for language in ('pt', 'en'):
+        assert render(columnar, language) == render(data, language)
+
+
+@pytest.mark.parametrize('backend', gen.PHASE_SHEET_BACKENDS)
+def test_incremental_matches_rows(backend):
+    data = sparse_data_by_phase()
+    for language in ('pt', 'en'):
+        expected = render(data, language)
+        assert render_incremental({'dataByPhase': data}, language, backend=backend) == expected
+        assert render_incremental(columnar_payload(data), language, backend=backend) == expected
+
+
+def test_columnar_record_treats_missing_cells_as_absent():
+    phase = gen.decode_columnar_payload(columnar_payload({'p': [{'a': 'x', 'b': 1}, {'a': 'y'}]}))['p']
+    first, second = list(phase)
+    assert first.get('b', 0) == 1 and 'b' in first
+    assert second.get('b', 0) == 0 and 'b' not in second
+    assert phase.column('b', '') == [1, '']
+
+
+def test_turbine_completion_ignores_empty_phase_keys():
+    data = {'recepcao': [{'turbinaId': 'T1', 'status': 'Concluído'}],
+            'preparacao': [{'turbinaId': 'T1', 'status': 'completed'}, {'turbinaId': 'T2', 'status': 'Em Progresso'}]}
+    with_empty = dict(data, preAssemblagem=[], fasesFinal=[])
+    for payload in (data, with_empty):
+        aggregates = gen.ReportAggregates.from_data(payload)
+        assert aggregates.turbines.status('T1') == 'completed'
+        assert aggregates.turbines.status('T2') == 'in_progress'
+        assert aggregates.completed_turbines == 1
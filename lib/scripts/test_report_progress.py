@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Protocolo de progresso (linhas JSON) e cancelamento cooperativo"""
+
+import contextlib
+import io
+import json
+
+import pytest
+
+import excel_report_generator as gen
+
+PHASES = ['recepcao', 'preparacao']
+
+
+def payload(rows, output_path=None, **fields):
+    data = {'recepcao': [{'turbinaId': f'T{n % 7:02d}', 'componentId': f'C{n}', 'status': 'Concluído',
+                          'dataReal': '2024-03-05', 'dataPlaneada': '2024-03-01'} for n in range(rows)]}
+    return {'projectName': 'Proj', 'selectedPhases': PHASES, 'language': 'pt', 'completeReport': True,
+            'outputPath': output_path, 'dataByPhase': data, **fields}
+
+
+def generate(data, progress):
+    with contextlib.redirect_stdout(io.StringIO()), progress:
+        return gen.generate_from_payload(data)
+
+
+def test_progress_events_count_rows():
+    events = []
+    generate(payload(2 * gen.PROGRESS_CHUNK_ROWS + 3), gen.ReportProgress(events.append))
+    assert {'stage', 'sheet', 'rowsDone', 'rowsTotal'} == set(events[0])
+    phase = [(e['rowsDone'], e['rowsTotal']) for e in events if e['stage'] == 'phase' and e['sheet'] == 'recepcao']
+    total = 2 * gen.PROGRESS_CHUNK_ROWS + 3
+    assert phase[0] == (0, total) and phase[-1] == (total, total)
+    assert [done for done, _ in phase] == sorted(done for done, _ in phase)
+
+
+def test_cancel_during_generation():
+    def emit(event):
+        if event['stage'] == 'phase' and event['rowsDone']:
+            progress.cancel()
+    progress = gen.ReportProgress(emit)
+    with pytest.raises(gen.ReportCancelled):
+        generate(payload(3 * gen.PROGRESS_CHUNK_ROWS), progress)
+
+
+def test_stdin_cancel_command():
+    progress = gen.ReportProgress()
+    gen._watch_stdin_cancel(progress, io.StringIO('ping\n{"command": "other"}\n{"command": "cancel"}\n'))
+    assert progress.cancel_event.wait(5)
+    idle = gen.ReportProgress()
+    gen._watch_stdin_cancel(idle, io.StringIO('ping\n'))
+    assert not idle.cancel_event.wait(0.2)
+
+
+def serve(lines):
+    output, log = io.StringIO(), io.StringIO()
+    gen.serve(io.StringIO(''.join(json.dumps(line) + '\n' for line in lines)), output, log)
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_serve_cancels_waiting_request_and_reports_queue_time(tmp_path):
+    responses = serve([
+        {**payload(2000, str(tmp_path / 'a.xlsx')), 'id': 'a'},
+        {'command': 'cancel', 'id': 'b'},
+        {**payload(10, str(tmp_path / 'b.xlsx')), 'id': 'b'},
+        {**payload(10, str(tmp_path / 'c.xlsx')), 'id': 'c', 'progress': True},
+    ])
+    by_id = {}
+    for response in responses:
+        by_id.setdefault(response.get('id'), []).append(response)
+    assert by_id['a'][-1]['status'] == 'ok'
+    assert by_id['b'] == [{'id': 'b', 'status': 'cancelled'}]
+    assert not (tmp_path / 'b.xlsx').exists()
+    *progress, done = by_id['c']
+    assert progress and all(line['status'] == 'progress' for line in progress)
+    # A espera atrás do pedido 'a' conta em queueMs, não no parse nem no total de 'c'
+    timings = done['timings']
+    assert timings['queueMs'] >= by_id['a'][-1]['timings']['generateMs'] / 2
+    assert timings['parseMs'] < timings['queueMs']
+    assert timings['totalMs'] == pytest.approx(timings['parseMs'] + timings['generateMs'], abs=0.05)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Processo residente (--serve): pedidos e respostas em linhas JSON"""
+
+import io
+import json
+
+import openpyxl
+
+import excel_report_generator as gen
+from test_report_progress import payload, serve
+
+
+def test_serve_replies_per_request_and_survives_errors(tmp_path):
+    output_path = str(tmp_path / 'ok.xlsx')
+    input_path = tmp_path / 'payload.json'
+    input_path.write_text(json.dumps(payload(5, str(tmp_path / 'file.xlsx'))), encoding='utf-8')
+    responses = serve([
+        {**payload(5, output_path), 'id': 1},
+        {**payload(5), 'id': 2},
+        {'id': 3, 'inputPath': str(input_path)},
+    ])
+    assert responses[0] == {'status': 'ready'}
+    ok, missing_output, from_file = responses[1:]
+    assert ok['id'] == 1 and ok['status'] == 'ok' and ok['outputPath'] == output_path
+    assert {'parseMs', 'generateMs', 'totalMs', 'queueMs'} <= set(ok['timings'])
+    assert openpyxl.load_workbook(output_path).sheetnames
+    # Um pedido com erro tem a sua resposta e o servidor continua
+    assert missing_output['id'] == 2 and missing_output['status'] == 'error'
+    assert 'outputPath' in missing_output['error']
+    assert from_file['status'] == 'ok' and (tmp_path / 'file.xlsx').exists()
+
+
+def test_serve_reports_invalid_json():
+    output, log = io.StringIO(), io.StringIO()
+    gen.serve(io.StringIO('{"id": 1,\n\n'), output, log)
+    ready, error = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert ready == {'status': 'ready'}
+    assert error['id'] is None and error['status'] == 'error'
+    assert 'JSON inválido' in log.getvalue()
+
+
+def test_serve_shutdown_ignores_later_requests(tmp_path):
+    responses = serve([
+        {'command': 'shutdown', 'id': 'fim'},
+        {**payload(5, str(tmp_path / 'late.xlsx')), 'id': 1},
+    ])
+    assert responses == [{'status': 'ready'}, {'id': 'fim', 'status': 'bye'}]
+    assert not (tmp_path / 'late.xlsx').exists()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""XML das sheets de fase escritas por fora do openpyxl (backend 'direct', cache) comparado com o do próprio openpyxl"""
+
+import contextlib
+import io
+import re
+import zipfile
+
+import pytest
+from openpyxl import load_workbook
+
+import excel_report_generator as gen
+from test_report_payloads import PHASES, sparse_data_by_phase
+
+_TIMESTAMP = re.compile(rb'\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}')
+_MERGE_CELLS = re.compile(rb'<mergeCells count="\d+">(.*?)</mergeCells>')
+
+
+def _canonical(xml):
+    """Sem a hora do rodapé e com as mergeCell ordenadas (o openpyxl guarda-as num set)"""
+    xml = _TIMESTAMP.sub(b'<timestamp>', xml)
+    return _MERGE_CELLS.sub(lambda m: b''.join(sorted(re.findall(rb'<mergeCell [^>]*/>', m.group(1)))), xml)
+
+
+def sheet_parts(language='pt', **kwargs):
+    """{parte do zip: XML} das sheets de um relatório só com as fases"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        content = gen.generate_excel_report('Proj', sparse_data_by_phase(), PHASES, None, language, False, **kwargs)
+    archive = zipfile.ZipFile(io.BytesIO(content))
+    parts = {name: archive.read(name) for name in archive.namelist()
+             if name.startswith('xl/worksheets/') or name == 'xl/styles.xml'}
+    return {name: _canonical(xml) for name, xml in parts.items()}
+
+
+@pytest.mark.parametrize('language', ['pt', 'en'])
+def test_direct_backend_matches_openpyxl_writer(language):
+    assert sheet_parts(language, streaming=True, backend='direct') == sheet_parts(language, streaming=True)
+
+
+def sheet_cells(content):
+    """Valores, estilos resolvidos, filtros, painéis e células unidas de cada sheet (independente dos ids de estilo)"""
+    wb = load_workbook(io.BytesIO(content))
+    sheets = {}
+    for ws in wb.worksheets:
+        cells = [(cell.coordinate, None if isinstance(cell.value, str) and cell.value.startswith('Gerado em') else cell.value,
+                  cell.font.b, cell.font.sz, cell.font.color.rgb if cell.font.color else None,
+                  cell.fill.fgColor.rgb if cell.fill.fill_type else None,
+                  cell.alignment.horizontal, cell.border.left.style)
+                 for row in ws.iter_rows() for cell in row]
+        sheets[ws.title] = (cells, ws.auto_filter.ref, ws.freeze_panes, sorted(map(str, ws.merged_cells.ranges)),
+                            {key: dim.width for key, dim in ws.column_dimensions.items()})
+    return sheets
+
+
+def render_phase_sheets(**kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return gen.generate_excel_report('Proj', sparse_data_by_phase(), PHASES, None, 'pt', False, **kwargs)
+
+
+@pytest.mark.parametrize('backend', gen.PHASE_SHEET_BACKENDS)
+def test_cached_sheets_match_openpyxl_writer(tmp_path, backend):
+    expected = sheet_cells(render_phase_sheets(streaming=True))
+    cold = render_phase_sheets(streaming=True, cache_dir=str(tmp_path), backend=backend)
+    warm = render_phase_sheets(streaming=True, cache_dir=str(tmp_path), backend=backend)
+    assert sheet_cells(cold) == sheet_cells(warm) == expected
+    # A quente, o XML copiado da cache é o mesmo da primeira vez (só muda a hora do rodapé)
+    cold_parts, warm_parts = (zipfile.ZipFile(io.BytesIO(content)) for content in (cold, warm))
+    for name in cold_parts.namelist():
+        if name.startswith('xl/worksheets/'):
+            assert _canonical(cold_parts.read(name)) == _canonical(warm_parts.read(name))
+
+
+def test_missing_openpyxl_internals_fail_clearly(monkeypatch):
+    class WriterWithoutArchive:
+        def __init__(self, wb, archive):
+            self.manifest = []
+    monkeypatch.setattr(gen, 'ExcelWriter', WriterWithoutArchive)
+    gen._check_openpyxl_internals.cache_clear()
+    try:
+        with pytest.raises(RuntimeError, match=r'ExcelWriter\._archive.*openpyxl 3\.1'):
+            gen._add_cell_style(gen.Workbook(write_only=True), gen._named_style(gen.Workbook(write_only=True), 'data'))
+    finally:
+        gen._check_openpyxl_internals.cache_clear()
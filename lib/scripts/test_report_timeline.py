@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Timeline por dia, semana ISO (com o ano) ou mês, curva S e rótulos"""
+
+import contextlib
+import io
+import random
+import re
+from datetime import date, datetime
+
+import pytest
+from openpyxl import load_workbook
+
+import excel_report_generator as gen
+
+
+def day(year, month, day_of_month):
+    return date(year, month, day_of_month).toordinal()
+
+
+@pytest.mark.parametrize('first, last, expected', [
+    (day(2024, 3, 1), day(2024, 3, 1), 'day'),
+    (day(2024, 3, 1), day(2024, 3, 14), 'day'),
+    (day(2024, 3, 1), day(2024, 3, 15), 'week'),
+    (day(2024, 3, 4), day(2024, 6, 9), 'week'),
+    (day(2024, 3, 4), day(2024, 6, 10), 'month'),
+    (day(2023, 1, 1), day(2025, 12, 31), 'month'),
+])
+def test_timeline_granularity(first, last, expected):
+    assert gen.timeline_granularity(first, last) == expected
+
+
+def test_weeks_across_year_boundary_stay_apart():
+    counts = {day(2020, 12, 28): 1, day(2021, 1, 3): 2, day(2021, 1, 4): 4, day(2022, 1, 2): 8}
+    rows = gen.bucket_timeline(counts, 'week')
+    assert rows[0] == (day(2020, 12, 28), 3, 3)
+    assert rows[1] == (day(2021, 1, 4), 4, 7)
+    assert rows[-1] == (day(2021, 12, 27), 8, 15)
+    assert len(rows) == 53
+    assert [gen.timeline_label(start, 'week', 'pt') for start, _, _ in (rows[0], rows[1], rows[-1])] == \
+        ['2020-S53', '2021-S01', '2021-S52']
+    assert gen.timeline_label(rows[1][0], 'week', 'en') == '2021-W01'
+
+
+def test_months_fill_gaps_and_accumulate():
+    counts = {day(2023, 11, 30): 1, day(2023, 11, 1): 2, day(2024, 2, 29): 5}
+    assert gen.bucket_timeline(counts, 'month') == [
+        (day(2023, 11, 1), 3, 3), (day(2023, 12, 1), 0, 3), (day(2024, 1, 1), 0, 3), (day(2024, 2, 1), 5, 8)]
+    assert gen.timeline_label(day(2023, 12, 1), 'month', 'pt') == 'Dez 2023'
+    assert gen.timeline_label(day(2023, 12, 1), 'month', 'en') == 'Dec 2023'
+
+
+def test_days_and_empty_timeline():
+    counts = {day(2024, 3, 1): 2, day(2024, 3, 3): 1}
+    assert gen.bucket_timeline(counts, 'day') == [(day(2024, 3, 1), 2, 2), (day(2024, 3, 2), 0, 2), (day(2024, 3, 3), 1, 3)]
+    assert gen.timeline_label(day(2024, 3, 2), 'day') == '2024-03-02'
+    assert gen.bucket_timeline({}, 'week') == []
+
+
+def random_day_counts(seed):
+    rng = random.Random(seed)
+    first = day(2019, 12, 1)
+    return {first + rng.randrange(900): rng.randint(1, 5) for _ in range(rng.randint(1, 200))}
+
+
+@pytest.mark.parametrize('granularity', gen.TIMELINE_GRANULARITIES)
+def test_bucketing_without_numpy_matches_day_by_day(monkeypatch, granularity):
+    monkeypatch.setattr(gen, 'np', None)
+    for seed in range(10):
+        counts = random_day_counts(seed)
+        expected = {}
+        for ordinal, count in counts.items():
+            start = gen._period_start(ordinal, granularity)
+            expected[start] = expected.get(start, 0) + count
+        assert dict(gen._bucket_days(counts, granularity)) == expected
+
+
+@pytest.mark.parametrize('granularity', gen.TIMELINE_GRANULARITIES)
+def test_bucketing_with_numpy_matches_standard_library(monkeypatch, granularity):
+    numpy = pytest.importorskip('numpy')
+    for seed in range(10):
+        counts = random_day_counts(seed)
+        monkeypatch.setattr(gen, 'np', numpy)
+        vectorized = gen.bucket_timeline(counts, granularity)
+        monkeypatch.setattr(gen, 'np', None)
+        assert vectorized == gen.bucket_timeline(counts, granularity)
+
+
+def test_dashboard_without_dates_labels_current_period():
+    with contextlib.redirect_stdout(io.StringIO()):
+        content = gen.generate_excel_report('Proj', {'recepcao': [{'turbinaId': 'T01'}]}, ['recepcao'], None, 'pt', True)
+    ws = load_workbook(io.BytesIO(content))['Dashboard']
+    labels = [cell.value for row in ws.iter_rows() for cell in row
+              if isinstance(cell.value, str) and re.fullmatch(r'\d{4}-S\d{2}|Semana 1', cell.value)]
+    current = gen._period_start(datetime.now().toordinal(), 'week')
+    assert labels == [gen.timeline_label(current, 'week', 'pt')]
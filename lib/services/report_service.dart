@@ -1,17 +1,68 @@
+import 'dart:async';
 import 'dart:convert';
 import 'dart:io';
 import 'package:cloud_firestore/cloud_firestore.dart';
 import 'package:flutter_riverpod/flutter_riverpod.dart';
+import 'package:path_provider/path_provider.dart';
 
 /// Provider do serviço de relatórios
 final reportServiceProvider = Provider<ReportService>((ref) {
-  return ReportService();
+  final service = ReportService();
+  ref.onDispose(service.dispose);
+  return service;
 });
 
+/// Progresso da geração do Excel, enviado pelo script Python em linhas JSON
+class ReportProgress {
+  /// Etapa: aggregation, summary, phase, save
+  final String stage;
+
+  /// Sheet em escrita (chave da fase ou da sheet de resumo), se houver
+  final String? sheet;
+  final int? rowsDone;
+  final int? rowsTotal;
+
+  const ReportProgress({
+    required this.stage,
+    this.sheet,
+    this.rowsDone,
+    this.rowsTotal,
+  });
+
+  factory ReportProgress.fromJson(Map<String, dynamic> json) {
+    return ReportProgress(
+      stage: json['stage'] as String? ?? '',
+      sheet: json['sheet'] as String?,
+      rowsDone: json['rowsDone'] as int?,
+      rowsTotal: json['rowsTotal'] as int?,
+    );
+  }
+}
+
+/// A geração do relatório foi cancelada (ReportService.cancelReport)
+class ReportCancelledException implements Exception {
+  @override
+  String toString() => 'Relatório cancelado';
+}
+
 /// Serviço para gerar relatórios (Excel)
 class ReportService {
   final FirebaseFirestore _firestore = FirebaseFirestore.instance;
 
+  /// Processo Python residente (excel_report_generator.py --serve), reutilizado entre relatórios
+  _ReportServer? _reportServer;
+
+  /// Cancela a geração em curso (null se não houver nenhuma)
+  void Function()? _cancelCurrent;
+
+  /// Terminar o processo Python residente (se houver); um relatório em curso
+  /// acaba primeiro, a não ser que o processo não saia a tempo
+  Future<void> dispose() async {
+    final server = _reportServer;
+    _reportServer = null;
+    await server?.shutdown();
+  }
+
   Future<String> _getTurbineName(String turbinaId) async {
     try {
       final turbinaDoc =
@@ -77,6 +128,7 @@ class ReportService {
     required bool completeReport,
     required List<String> selectedPhases,
     required String language,
+    void Function(ReportProgress progress)? onProgress,
   }) async {
     print('═══════════════════════════════════════════════════════════');
     print(' GERANDO RELATÓRIO');
@@ -129,6 +181,7 @@ class ReportService {
       selectedPhases,
       completeReport,
       language,
+      onProgress,
     );
     print('Ficheiro gerado: $filePath');
 
@@ -371,12 +424,19 @@ class ReportService {
   // MÉTODOS DE GERAÇÃO (MANTÉM-SE IGUAL)
   // ═══════════════════════════════════════════════════════════════════════
 
+  /// Cancelar a geração do Excel em curso; o script pára no próximo bloco de
+  /// linhas e generateAndSendReport termina com ReportCancelledException
+  void cancelReport() {
+    _cancelCurrent?.call();
+  }
+
   Future<String> _generateExcelReport(
     String projectName,
     Map<String, List<Map<String, dynamic>>> dataByPhase,
     List<String> selectedPhases,
     bool completeReport,
     String language,
+    void Function(ReportProgress progress)? onProgress,
   ) async {
     final timestamp = DateTime.now().millisecondsSinceEpoch;
     final documentsPath = Platform.environment['USERPROFILE'] ?? '';
@@ -395,81 +455,215 @@ class ReportService {
       throw Exception('Script Python não encontrado: $scriptPath');
     }
 
+    final supportDir = await getApplicationSupportDirectory();
+
+    // Metadados antes de dataByPhase: com --incremental o script escreve cada
+    // fase assim que a lê, sem esperar pelo fim do payload
     final inputData = {
       'projectName': projectName,
-      'dataByPhase': _serializeDataForPython(dataByPhase),
       'selectedPhases': selectedPhases,
       'outputPath': outputPath,
       'completeReport': completeReport,
       'language': language,
+      // Sheets de fases inalteradas são reutilizadas entre regenerações; a cache
+      // (com pickles dos agregados) fica na pasta da app do utilizador, não no temp
+      'cacheDir': '${supportDir.path}\\asbuilt_report_cache',
+      // XML das sheets de fases escrito diretamente (mesmo conteúdo, sem objetos Cell)
+      'backend': 'direct',
+      // Relatório aberto logo a seguir no próprio PC: compressão rápida
+      'compression': 'fast',
+      // Linhas JSON de progresso (etapa, sheet, linhas) antes da resposta
+      'progress': true,
+      ..._serializeDataForPython(dataByPhase),
     };
 
-    final jsonInput = json.encode(inputData);
+    // Payload escrito uma vez num ficheiro temporário (UTF-8 direto, sem String
+    // intermédia); o script lê-o por mmap em vez de pelo pipe do stdin
+    final payloadFile =
+        File('${Directory.systemTemp.path}\\asbuilt_payload_$timestamp.json');
+    await payloadFile.writeAsBytes(JsonUtf8Encoder().convert(inputData));
+
+    // Preferir o processo residente: evita o arranque do Python e o import do openpyxl
+    try {
+      final server = await _getReportServer(scriptPath);
+      final request = server.request(
+        {'inputPath': payloadFile.path, 'progress': true},
+        onProgress: onProgress,
+      );
+      _cancelCurrent = request.cancel;
+      final response = await request.response;
+      if (response['status'] == 'cancelled') {
+        throw ReportCancelledException();
+      }
+      if (response['status'] != 'ok') {
+        throw Exception('Erro ao gerar Excel: ${response['error']}');
+      }
+      print('Excel gerado pelo servidor Python em ${response['timings']}');
+    } on _ReportServerException catch (e) {
+      print('[WARN] Servidor Python indisponível ($e), a usar processo único');
+      // Um servidor que deixou de responder ainda pode estar vivo: terminá-lo
+      _reportServer?.kill();
+      _reportServer = null;
+      await _runReportScript(scriptPath, payloadFile.path, onProgress);
+    } finally {
+      _cancelCurrent = null;
+      try {
+        await payloadFile.delete();
+      } catch (e) {
+        print('[WARN] Payload temporário não apagado: $e');
+      }
+    }
+
+    final outputFile = File(outputPath);
+    if (!await outputFile.exists()) {
+      throw Exception('Ficheiro Excel não foi gerado: $outputPath');
+    }
+
+    return outputPath;
+  }
 
+  Future<_ReportServer> _getReportServer(String scriptPath) async {
+    final current = _reportServer;
+    if (current != null && !current.isClosed) return current;
+    final server = await _ReportServer.start(scriptPath);
+    _reportServer = server;
+    return server;
+  }
+
+  /// Executar o script num processo único (um relatório por processo)
+  Future<void> _runReportScript(
+    String scriptPath,
+    String payloadPath,
+    void Function(ReportProgress progress)? onProgress,
+  ) async {
     print('Executando script Python Excel...');
     print('   Script: $scriptPath');
-    print('   Output: $outputPath');
+    print('   Payload: $payloadPath');
 
+    // Sem shell: o processo é o próprio python, que recebe o cancelamento
     final process = await Process.start(
       'python',
-      [scriptPath],
-      runInShell: true,
+      [scriptPath, '--incremental', '--progress', '--input', payloadPath],
     );
 
-    process.stdin.write(jsonInput);
-    await process.stdin.close();
+    // Ler stdout (progresso em linhas JSON) e stderr (mensagens) desde já e em
+    // paralelo: um pipe cheio bloquearia o script
+    final stderr = StringBuffer();
+    final stdoutDone = process.stdout
+        .transform(utf8.decoder)
+        .transform(const LineSplitter())
+        .listen((line) => _onScriptProgress(line, onProgress))
+        .asFuture<void>();
+    final stderrDone = process.stderr
+        .transform(utf8.decoder)
+        .listen(stderr.write)
+        .asFuture<void>();
+
+    // Cancelamento pelo stdin (o payload vem de --input): o script cancela no
+    // próximo bloco de linhas e sai com 130, também no Windows, onde um sinal
+    // terminaria o processo sem passar pelo cancelamento
+    process.stdin.done.catchError((_) {});
+    _cancelCurrent = () {
+      try {
+        process.stdin.add(utf8.encode('${json.encode({'command': 'cancel'})}\n'));
+      } catch (e) {
+        print('[WARN] Cancelamento não enviado: $e');
+      }
+    };
 
-    final stdout = await process.stdout.transform(utf8.decoder).join();
-    final stderr = await process.stderr.transform(utf8.decoder).join();
+    await Future.wait([stdoutDone, stderrDone]);
     final exitCode = await process.exitCode;
+    await process.stdin.close().catchError((_) {});
 
-    print('Python stdout: $stdout');
     if (stderr.isNotEmpty) print('[WARN] Python stderr: $stderr');
     print('Exit code: $exitCode');
 
+    if (exitCode == 130) {
+      throw ReportCancelledException();
+    }
     if (exitCode != 0) {
       throw Exception('Erro ao gerar Excel: $stderr');
     }
+  }
 
-    final outputFile = File(outputPath);
-    if (!await outputFile.exists()) {
-      throw Exception('Ficheiro Excel não foi gerado: $outputPath');
+  void _onScriptProgress(
+    String line,
+    void Function(ReportProgress progress)? onProgress,
+  ) {
+    if (line.trim().isEmpty) return;
+    try {
+      final event = json.decode(line) as Map<String, dynamic>;
+      onProgress?.call(ReportProgress.fromJson(event));
+    } catch (_) {
+      print('Python: $line');
     }
-
-    return outputPath;
   }
 
+  /// Serializar dataByPhase em formato colunar para o script Python.
+  ///
+  /// Cada fase envia a lista de chaves uma vez e um array por coluna. Colunas
+  /// de texto com poucos valores distintos (turbina, status, tipo, datas...)
+  /// guardam índices para um dicionário de strings partilhado por todas as fases.
   Map<String, dynamic> _serializeDataForPython(
     Map<String, List<Map<String, dynamic>>> dataByPhase,
   ) {
-    final serialized = <String, dynamic>{};
+    final strings = <String>[];
+    final stringIndex = <String, int>{};
+    final phases = <String, dynamic>{};
 
     for (var entry in dataByPhase.entries) {
-      serialized[entry.key] = entry.value.map((item) {
-        final Map<String, dynamic> serializedItem = {};
+      final rows = entry.value;
 
-        for (var itemEntry in item.entries) {
-          final value = itemEntry.value;
+      final keys = <String>[];
+      final seenKeys = <String>{};
+      for (var item in rows) {
+        for (var key in item.keys) {
+          if (seenKeys.add(key)) keys.add(key);
+        }
+      }
 
-          if (value is DateTime) {
-            serializedItem[itemEntry.key] = value.toIso8601String();
-          } else {
-            serializedItem[itemEntry.key] = value;
-          }
+      final columns = <List<dynamic>>[];
+      final encoded = <String>[];
+
+      for (var key in keys) {
+        final column = rows.map((item) {
+          final value = item[key];
+          return value is DateTime ? value.toIso8601String() : value;
+        }).toList();
+
+        final isText = column.every((value) => value == null || value is String);
+        if (isText && column.toSet().length * 2 <= column.length) {
+          encoded.add(key);
+          columns.add(column.map((value) {
+            if (value == null) return null;
+            return stringIndex.putIfAbsent(value as String, () {
+              strings.add(value);
+              return strings.length - 1;
+            });
+          }).toList());
+        } else {
+          columns.add(column);
         }
+      }
 
-        return serializedItem;
-      }).toList();
+      phases[entry.key] = {
+        'keys': keys,
+        'columns': columns,
+        'encoded': encoded,
+      };
     }
 
-    return serialized;
+    return {
+      'format': 'columnar',
+      'strings': strings,
+      'dataByPhase': phases,
+    };
   }
 
   Future<void> _openFile(String filePath) async {
     try {
       if (Platform.isWindows) {
-        await Process.run('cmd', ['/c', 'start', '', filePath],
-            runInShell: true);
+        await Process.run('cmd', ['/c', 'start', '', filePath]);
       } else if (Platform.isMacOS) {
         await Process.run('open', [filePath]);
       } else if (Platform.isLinux) {
@@ -481,3 +675,170 @@ class ReportService {
     }
   }
 }
+
+/// Falha de comunicação com o processo Python residente
+class _ReportServerException implements Exception {
+  final String message;
+
+  _ReportServerException(this.message);
+
+  @override
+  String toString() => message;
+}
+
+/// Pedido enviado ao processo Python residente (_ReportServer.request)
+class _ReportRequest {
+  /// Resposta final do script (status ok, error ou cancelled)
+  final Future<Map<String, dynamic>> response;
+
+  /// Cancelar só este pedido; responde com `status: cancelled`
+  final void Function() cancel;
+
+  _ReportRequest(this.response, this.cancel);
+}
+
+/// Processo Python residente que gera relatórios por pedidos JSON-lines.
+///
+/// Cada pedido é uma linha JSON no stdin com um `id`; a resposta chega como
+/// uma linha JSON no stdout com o mesmo `id`, antecedida das linhas de
+/// progresso (`status: progress`) desse pedido. As mensagens de texto do
+/// script chegam pelo stderr.
+class _ReportServer {
+  /// Tempo máximo sem resposta nem progresso de um pedido: um servidor parado
+  /// falha o pedido com _ReportServerException (e o relatório usa o processo único)
+  static const requestTimeout = Duration(minutes: 2);
+
+  /// Espera pela saída do processo depois de `shutdown`, antes de o matar
+  static const shutdownTimeout = Duration(seconds: 5);
+
+  final Process _process;
+  final Map<int, Completer<Map<String, dynamic>>> _pending = {};
+  final Map<int, void Function(ReportProgress progress)> _onProgress = {};
+  final Map<int, Timer> _timeouts = {};
+  final Completer<void> _ready = Completer<void>();
+  int _nextId = 0;
+  bool _closed = false;
+
+  _ReportServer._(this._process) {
+    _process.stdout
+        .transform(utf8.decoder)
+        .transform(const LineSplitter())
+        .listen(_onLine, onDone: _onDone, onError: (_) => _onDone());
+    _process.stderr
+        .transform(utf8.decoder)
+        .listen((data) => print('Python: $data'));
+    // Escritas num processo já terminado são tratadas em _onDone
+    _process.stdin.done.catchError((_) {});
+  }
+
+  bool get isClosed => _closed;
+
+  static Future<_ReportServer> start(String scriptPath) async {
+    print('A iniciar servidor Python de relatórios: $scriptPath');
+    final Process process;
+    try {
+      process = await Process.start('python', [scriptPath, '--serve']);
+    } on ProcessException catch (e) {
+      throw _ReportServerException(e.message);
+    }
+    final server = _ReportServer._(process);
+    await server._ready.future;
+    return server;
+  }
+
+  _ReportRequest request(
+    Map<String, dynamic> payload, {
+    void Function(ReportProgress progress)? onProgress,
+  }) {
+    if (_closed) {
+      return _ReportRequest(
+        Future.error(_ReportServerException('servidor terminado')),
+        () {},
+      );
+    }
+    final id = _nextId++;
+    final completer = Completer<Map<String, dynamic>>();
+    _pending[id] = completer;
+    if (onProgress != null) _onProgress[id] = onProgress;
+    _restartTimeout(id);
+    _send({...payload, 'id': id});
+    return _ReportRequest(completer.future, () => _cancel(id));
+  }
+
+  /// Terminar o servidor: pedir `shutdown` e, se não sair a tempo, matá-lo
+  Future<void> shutdown() async {
+    if (!_closed) _send({'command': 'shutdown'});
+    try {
+      await _process.exitCode.timeout(shutdownTimeout);
+    } on TimeoutException {
+      print('[WARN] Servidor Python não terminou, a matar o processo');
+      kill();
+    }
+  }
+
+  /// Terminar o processo já, sem esperar pelo pedido em curso
+  void kill() {
+    _process.kill();
+  }
+
+  void _cancel(int id) {
+    if (_closed || !_pending.containsKey(id)) return;
+    _send({'command': 'cancel', 'id': id});
+  }
+
+  void _send(Map<String, dynamic> message) {
+    _process.stdin.add(utf8.encode('${json.encode(message)}\n'));
+  }
+
+  /// (Re)iniciar o prazo do pedido; cada linha de progresso conta como resposta
+  void _restartTimeout(int id) {
+    _timeouts.remove(id)?.cancel();
+    _timeouts[id] = Timer(requestTimeout, () {
+      _timeouts.remove(id);
+      _onProgress.remove(id);
+      _pending.remove(id)?.completeError(_ReportServerException(
+          'sem resposta em ${requestTimeout.inSeconds} s'));
+    });
+  }
+
+  void _onLine(String line) {
+    if (line.trim().isEmpty) return;
+    final Map<String, dynamic> response;
+    try {
+      response = json.decode(line) as Map<String, dynamic>;
+    } catch (_) {
+      print('Python: $line');
+      return;
+    }
+    if (response['status'] == 'ready') {
+      if (!_ready.isCompleted) _ready.complete();
+      return;
+    }
+    if (response['status'] == 'progress') {
+      if (_timeouts.containsKey(response['id'])) {
+        _restartTimeout(response['id'] as int);
+      }
+      _onProgress[response['id']]?.call(ReportProgress.fromJson(response));
+      return;
+    }
+    _timeouts.remove(response['id'])?.cancel();
+    _onProgress.remove(response['id']);
+    final completer = _pending.remove(response['id']);
+    completer?.complete(response);
+  }
+
+  void _onDone() {
+    _closed = true;
+    final error = _ReportServerException('processo Python terminou');
+    if (!_ready.isCompleted) _ready.completeError(error);
+    for (final completer in _pending.values) {
+      completer.completeError(error);
+    }
+    _pending.clear();
+    _onProgress.clear();
+    for (final timer in _timeouts.values) {
+      timer.cancel();
+    }
+    _timeouts.clear();
+  }
+}